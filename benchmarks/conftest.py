@@ -0,0 +1,93 @@
+"""
+Fixtures for the benchmarks: synthetic manifests of each benchmarked size, written once per
+session.
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+import os
+
+import pytest
+import yaml
+
+from dagrules import core
+from dagrules.index import ManifestIndex
+from dagrules.loader import load_manifest
+from dagrules.rules import compile_rules
+
+from .generate import write_manifest
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BENCHMARK_DIR, "dagrules.yml")
+
+# Manifest sizes benchmarked by default; 100000 and 500000 are worth running before releases
+DEFAULT_SIZES = "1000,10000"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("dagrules benchmarks")
+    group.addoption(
+        "--bench-sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated numbers of manifest nodes to benchmark (default: {DEFAULT_SIZES})",
+    )
+    group.addoption(
+        "--bench-tag-density",
+        type=float,
+        default=0.3,
+        help="Average number of extra tags per generated node (default: 0.3)",
+    )
+    group.addoption(
+        "--bench-fan-out",
+        type=int,
+        default=3,
+        help="Maximum number of parents per generated model (default: 3)",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "n_nodes" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("--bench-sizes", default=DEFAULT_SIZES)
+        metafunc.parametrize(
+            "n_nodes", [int(size) for size in sizes.split(",")], scope="session", ids=str
+        )
+
+
+def load_config():
+    "Returns the validated benchmarks/dagrules.yml configuration"
+
+    with open(CONFIG_PATH, encoding="utf-8") as rules_file:
+        config = yaml.safe_load(rules_file)
+    core.validate(config)
+    return config
+
+
+@pytest.fixture(scope="session")
+def config():
+    return load_config()
+
+
+@pytest.fixture(scope="session")
+def rules(config):
+    return compile_rules(config)
+
+
+@pytest.fixture(scope="session")
+def manifest_path(request, tmp_path_factory, n_nodes):
+    path = tmp_path_factory.mktemp("manifests") / f"manifest_{n_nodes}.json"
+    write_manifest(
+        path,
+        n_nodes,
+        tag_density=request.config.getoption("--bench-tag-density", default=0.3),
+        fan_out=request.config.getoption("--bench-fan-out", default=3),
+    )
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def manifest(manifest_path):
+    return load_manifest(manifest_path)
+
+
+@pytest.fixture(scope="session")
+def index(manifest):
+    return ManifestIndex(manifest)
@@ -0,0 +1,207 @@
+"""
+Generates synthetic, layered dbt manifests for benchmarking dagrules.
+
+The manifests follow the source->snapshot->base->staging->intermediate->dim/fct flow of the
+example project in tests/, and follow the structural rules in benchmarks/dagrules.yml:
+
+* every source has exactly one snapshot, and every snapshot one base model
+* staging models depend on base (or other staging) models
+* intermediate models depend on staging, intermediate or core models
+* dimension models depend on staging or intermediate models, and fact models on staging,
+  intermediate or dimension models
+
+Some core models depend on PII base models, so the transitive rule on those has violations
+to report.  Nodes carry the compiled SQL, docs and column metadata that make real manifests
+large, so that loading them is representative too.
+
+Usage:
+
+    python benchmarks/generate.py --nodes 100000 --output target/manifest.json
+"""
+
+import argparse
+import json
+import random
+
+# Share of the nodes in each layer
+LAYERS = (
+    ("source", 0.14),
+    ("snapshot", 0.14),
+    ("base", 0.14),
+    ("staging", 0.2),
+    ("intermediate", 0.16),
+    ("dim", 0.1),
+    ("fct", 0.12),
+)
+
+# The layers each layer's models may depend on (besides their main parent layer)
+PARENT_LAYERS = {
+    "staging": ("base", "staging"),
+    "intermediate": ("staging", "intermediate", "dim", "fct"),
+    "dim": ("staging", "intermediate"),
+    "fct": ("staging", "intermediate", "dim"),
+}
+
+LAYER_TAGS = {
+    "source": [],
+    "snapshot": [],
+    "base": ["base", "staging"],
+    "staging": ["staging"],
+    "intermediate": ["intermediate"],
+    "dim": ["core", "dim"],
+    "fct": ["core", "fct"],
+}
+
+PREFIXES = {
+    "snapshot": "snap",
+    "base": "base",
+    "staging": "stg",
+    "intermediate": "int",
+    "dim": "dim",
+    "fct": "fct",
+}
+
+MATERIALIZATIONS = {
+    "snapshot": ["snapshot"],
+    "base": ["view", "ephemeral"],
+    "staging": ["view", "table"],
+    "intermediate": ["ephemeral", "view", "table"],
+    "dim": ["table"],
+    "fct": ["table", "incremental"],
+}
+
+DOMAINS = ("finance", "marketing", "sales", "product", "support", "hr", "ops", "legal")
+EXTRA_TAGS = ("pii", "daily", "hourly", "certified", "deprecated", "experimental")
+PACKAGES = ("analytics", "analytics", "analytics", "salesforce", "stripe")
+
+
+def _layer_sizes(n_nodes):
+    sizes = [max(1, int(n_nodes * share)) for _, share in LAYERS]
+    sizes[-1] += n_nodes - sum(sizes)
+    return dict(zip((layer for layer, _ in LAYERS), sizes))
+
+
+def _node(layer, idx, rng, tag_density):
+    domain = DOMAINS[idx % len(DOMAINS)]
+    name = f"{domain}_{idx}"
+    if layer in PREFIXES:
+        name = f"{PREFIXES[layer]}_{name}"
+
+    tags = list(LAYER_TAGS[layer])
+    for tag in DOMAINS + EXTRA_TAGS:
+        if rng.random() < tag_density / len(DOMAINS + EXTRA_TAGS):
+            tags.append(tag)
+    if layer != "source" and rng.random() < tag_density:
+        tags.append(domain)
+
+    package = rng.choice(PACKAGES)
+    resource_type = layer if layer in ("source", "snapshot") else "model"
+    sql = f"select * from {{{{ ref('{name}') }}}} where updated_at > current_date - 7\n" * 8
+    return {
+        "resource_type": resource_type,
+        "name": name,
+        "unique_id": f"{resource_type}.{package}.{name}",
+        "package_name": package,
+        "path": f"{layer}/{domain}/{name}.sql",
+        "original_file_path": f"models/{layer}/{domain}/{name}.sql",
+        "tags": tags,
+        "config": {
+            "enabled": True,
+            "materialized": rng.choice(MATERIALIZATIONS.get(layer, ["table"])),
+            "tags": tags,
+            "meta": {},
+        },
+        "raw_sql": sql,
+        "compiled_sql": sql.replace("{{", "").replace("}}", ""),
+        "description": f"The {name} {layer} node of the {domain} domain.",
+        "columns": {
+            f"column_{col}": {"name": f"column_{col}", "description": "", "meta": {}, "tags": []}
+            for col in range(rng.randrange(2, 12))
+        },
+        "depends_on": {"macros": ["macro.dbt.run_query"], "nodes": []},
+    }
+
+
+def _parents(layer, idx, layers, rng, fan_out):
+    # Snapshots and base models each have a single parent in the layer below
+    if layer in ("snapshot", "base"):
+        below = layers["source" if layer == "snapshot" else "snapshot"]
+        return below[idx : idx + 1]
+    if layer in PARENT_LAYERS:
+        candidates = [node for parents in PARENT_LAYERS[layer] for node in layers[parents]]
+        if candidates:
+            return sorted({rng.choice(candidates) for _ in range(rng.randint(1, fan_out))})
+    return []
+
+
+def _child_map(sources, nodes):
+    child_map = {node_id: [] for node_id in (*sources, *nodes)}
+    for node_id, node in nodes.items():
+        for parent in node["depends_on"]["nodes"]:
+            child_map[parent].append(node_id)
+    return child_map
+
+
+def generate_manifest(n_nodes, tag_density=0.3, fan_out=3, seed=0):
+    """
+    Returns a synthetic dbt manifest dict
+
+    Args:
+        n_nodes (int): Total number of sources and nodes
+        tag_density (float): Average number of extra (non-layer) tags per node
+        fan_out (int): Maximum number of parents of each staging, intermediate and core
+            model (and so the average number of children of the nodes they depend on)
+        seed (int): Random seed, so that the same arguments give the same manifest
+    """
+
+    rng = random.Random(seed)
+    sizes = _layer_sizes(n_nodes)
+    layers = {layer: [] for layer, _ in LAYERS}
+    sources, nodes = {}, {}
+
+    for layer, _ in LAYERS:
+        for idx in range(sizes[layer]):
+            node = _node(layer, idx, rng, tag_density)
+            node["depends_on"]["nodes"] = _parents(layer, idx, layers, rng, fan_out)
+            (sources if layer == "source" else nodes)[node["unique_id"]] = node
+            layers[layer].append(node["unique_id"])
+
+    return {
+        "metadata": {"dbt_schema_version": "https://schemas.getdbt.com/dbt/manifest/v4.json"},
+        "nodes": nodes,
+        "sources": sources,
+        "macros": {},
+        "docs": {},
+        "exposures": {},
+        "selectors": {},
+        "disabled": [],
+        "parent_map": {node_id: node["depends_on"]["nodes"] for node_id, node in nodes.items()},
+        "child_map": _child_map(sources, nodes),
+    }
+
+
+def write_manifest(path, n_nodes, **kwargs):
+    "Writes a synthetic manifest (see `generate_manifest`) to `path`"
+
+    with open(path, "w", encoding="utf-8") as manifest_file:
+        json.dump(generate_manifest(n_nodes, **kwargs), manifest_file)
+
+
+def main():
+    "Entry point for generating a manifest from the command line"
+
+    parser = argparse.ArgumentParser(description="Generates a synthetic dbt manifest")
+    parser.add_argument("--nodes", type=int, default=10000, help="Number of nodes")
+    parser.add_argument("--tag-density", type=float, default=0.3, help="Extra tags per node")
+    parser.add_argument("--fan-out", type=int, default=3, help="Maximum parents per model")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default="manifest.json", help="Path to write to")
+    args = parser.parse_args()
+
+    write_manifest(
+        args.output, args.nodes, tag_density=args.tag_density, fan_out=args.fan_out, seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
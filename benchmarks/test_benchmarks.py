@@ -0,0 +1,190 @@
+"""
+Benchmarks of each phase of a dagrules run, on synthetic manifests of increasing size.
+
+Run them with `invoke bench`, or `pytest benchmarks --bench-sizes=1000,10000,100000` (needs
+pytest-benchmark).  `--benchmark-save` and `--benchmark-compare` catch regressions between
+releases.
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+import os
+
+import pytest
+
+from dagrules import core, parallel
+from dagrules.columnar import SubjectMemo
+from dagrules.index import ManifestIndex
+from dagrules.loader import load_manifest
+from dagrules.parallel import MIN_SHARD_SIZE, check_rules
+from dagrules.parsers import PARSERS, json_parser, load_yaml
+from dagrules.planner import fused_violations
+from dagrules.results import ResultStore
+from dagrules.rules import TRANSITIVE_RELATIONSHIPS, compile_rules
+
+from .conftest import CONFIG_PATH, load_config
+
+pytest.importorskip("pytest_benchmark")
+
+# Ancestor and descendant bitsets take memory quadratic in the number of nodes, so transitive
+# musts are only benchmarked up to this size
+MAX_TRANSITIVE_NODES = 20000
+
+# Number of worker processes parallel checks are benchmarked with
+PARALLEL_JOBS = 4
+
+
+MUSTS = [(rule, must) for rule in compile_rules(load_config()) for must in rule.musts]
+
+
+def _is_transitive(rule):
+    return any(relationship in TRANSITIVE_RELATIONSHIPS for relationship in rule.relationships)
+
+
+def _skip_transitive(rule, n_nodes):
+    if _is_transitive(rule) and n_nodes > MAX_TRANSITIVE_NODES:
+        pytest.skip(f"Transitive musts are only benchmarked up to {MAX_TRANSITIVE_NODES} nodes")
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_load_manifest(benchmark, manifest_path, parser):
+    try:
+        json_parser(parser)
+    except ImportError:
+        pytest.skip(f"The {parser} parser is not installed")
+    manifest = benchmark(load_manifest, manifest_path, parser=parser)
+    assert len(manifest["nodes"]) > 0
+
+
+@pytest.mark.parametrize("parser", ["auto", "stdlib"])
+def test_load_config(benchmark, parser, n_nodes):  # pylint: disable=unused-argument
+    with open(CONFIG_PATH, encoding="utf-8") as config_file:
+        text = config_file.read()
+    assert "rules" in benchmark(load_yaml, text, parser)
+
+
+def test_build_index(benchmark, manifest):
+    index = benchmark(ManifestIndex, manifest)
+    assert len(index) == len(manifest["sources"]) + len(manifest["nodes"])
+
+
+def test_validate(benchmark, config, n_nodes):  # pylint: disable=unused-argument
+    benchmark(core.validate, config)
+
+
+def test_compile_rules(benchmark, config, n_nodes):  # pylint: disable=unused-argument
+    assert len(benchmark(compile_rules, config)) == len(config["rules"])
+
+
+def test_build_table(benchmark, manifest):
+    def build_table(index):
+        return index.table
+
+    benchmark.pedantic(build_table, setup=lambda: ((ManifestIndex(manifest),), {}), rounds=5)
+
+
+def test_graph_metrics(benchmark, manifest):
+    def build_metrics(index):
+        return index.metrics
+
+    benchmark.pedantic(build_metrics, setup=lambda: ((ManifestIndex(manifest),), {}), rounds=5)
+
+
+def test_reachability(benchmark, manifest, n_nodes):
+    if n_nodes > MAX_TRANSITIVE_NODES:
+        pytest.skip(f"Reachability is only benchmarked up to {MAX_TRANSITIVE_NODES} nodes")
+
+    def build_reachability(index):
+        return index.reachability
+
+    benchmark.pedantic(build_reachability, setup=lambda: ((ManifestIndex(manifest),), {}), rounds=3)
+
+
+def test_select_subjects(benchmark, index, rules):
+    def select_subjects():
+        return [rule.subject.select(index) for rule in rules]
+
+    def clear_memo():
+        # Measure selecting the subjects, rather than looking up memoized selections
+        index.table.memo = SubjectMemo(index.table.memo.max_size)
+
+    subjects = benchmark.pedantic(select_subjects, setup=clear_memo, rounds=20)
+    assert all(len(positions) > 0 for positions in subjects)
+
+
+@pytest.mark.parametrize(
+    "rule,must",
+    MUSTS,
+    ids=[f"{must_idx}-{must.must_type}" for must_idx, (_, must) in enumerate(MUSTS)],
+)
+def test_must(benchmark, index, n_nodes, rule, must):
+    _skip_transitive(rule, n_nodes)
+    subjects = rule.subject.select(index)
+
+    # Graph metrics and transitive relations are built once per run, and benchmarked above
+    if _is_transitive(rule):
+        assert index.reachability is not None
+    assert index.metrics is not None
+
+    benchmark(lambda: list(must.violations(index, subjects)))
+
+
+def test_check_rules(benchmark, manifest, rules, n_nodes):
+    rules = [rule for rule in rules if n_nodes <= MAX_TRANSITIVE_NODES or not _is_transitive(rule)]
+
+    def check(index):
+        return [violations for _, violations in check_rules(index, rules)]
+
+    benchmark.pedantic(check, setup=lambda: ((ManifestIndex(manifest),), {}), rounds=3)
+
+
+def test_check_rules_with_results(  # pylint: disable=too-many-arguments
+    benchmark, monkeypatch, tmp_path, manifest, rules, n_nodes
+):
+    rules = [rule for rule in rules if n_nodes <= MAX_TRANSITIVE_NODES or not _is_transitive(rule)]
+    path = str(tmp_path / "results.pickle")
+
+    def check(index, results=None):
+        checked = [violations for _, violations in check_rules(index, rules, results=results)]
+        if results is not None:
+            results.save(rules)
+        return checked
+
+    uncached = check(ManifestIndex(manifest))
+    assert check(ManifestIndex(manifest), ResultStore(path)) == uncached
+
+    evaluated = []
+
+    def counting_fused_violations(index, fused_rules, positions):
+        evaluated.extend(positions)
+        return fused_violations(index, fused_rules, positions)
+
+    monkeypatch.setattr(parallel, "fused_violations", counting_fused_violations)
+
+    # A warm run reuses the results recorded by the previous one, without evaluating any rule
+    warm = benchmark.pedantic(
+        lambda index: check(index, ResultStore(path)),
+        setup=lambda: ((ManifestIndex(manifest),), {}),
+        rounds=3,
+    )
+    assert warm == uncached
+    assert not evaluated
+
+
+def test_check_transitive_rules_in_parallel(benchmark, manifest, rules, n_nodes):
+    rules = [rule for rule in rules if _is_transitive(rule)]
+    _skip_transitive(rules[0], n_nodes)
+    if n_nodes < 10 * MIN_SHARD_SIZE:
+        pytest.skip("Too few subjects to split into shards")
+    if (os.cpu_count() or 1) < PARALLEL_JOBS:
+        pytest.skip(f"Parallel checks are only benchmarked with {PARALLEL_JOBS} CPUs or more")
+
+    def check(index, jobs):
+        return [violations for _, violations in check_rules(index, rules, jobs=jobs)]
+
+    serial = check(ManifestIndex(manifest), 1)
+    # Workers inherit the graph structures built once before forking, instead of each
+    # building them again
+    parallel = benchmark.pedantic(
+        check, setup=lambda: ((ManifestIndex(manifest), PARALLEL_JOBS), {}), rounds=3
+    )
+    assert parallel == serial
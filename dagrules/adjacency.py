@@ -0,0 +1,80 @@
+"""
+Memory-mapped parent/child adjacency in compressed sparse row (CSR) form.
+
+The adjacency file is written once from a `ManifestIndex` and read back with `mmap`, so the
+edges of even very large DAGs are never held as Python objects, and every process mapping
+the same file shares the same pages.  The file holds a fixed header followed by four
+native-endian int64 arrays: parent offsets, parent targets, child offsets and child targets.
+"""
+
+import mmap
+import struct
+import sys
+
+from dagrules.index import ADJACENCY_FIELDS
+
+MAGIC = b"DAGCSR" + (b"LE" if sys.byteorder == "little" else b"BE")
+
+# magic, manifest sha256 digest, number of nodes, number of parent edges, number of child edges
+HEADER = struct.Struct("=8s32sQQQ")
+
+ITEM_SIZE = struct.calcsize("q")
+
+
+class AdjacencyFormatError(ValueError):
+    "Indicates that an adjacency file is invalid or was written for another manifest"
+
+
+def write_adjacency(index, adjacency_file, digest):
+    """
+    Writes the adjacency of `index` to a binary file
+
+    Args:
+        index (ManifestIndex): Index to write the adjacency of
+        adjacency_file: Binary file object to write to
+        digest (str): sha256 hex digest of the manifest the index was built from
+    """
+
+    adjacency_file.write(
+        HEADER.pack(
+            MAGIC,
+            bytes.fromhex(digest),
+            len(index),
+            len(index.parent_targets),
+            len(index.child_targets),
+        )
+    )
+    for field in ADJACENCY_FIELDS:
+        adjacency_file.write(memoryview(getattr(index, field)).cast("B"))
+
+
+class MappedAdjacency:  # pylint: disable=too-few-public-methods
+    """
+    Adjacency arrays mapped from an adjacency file.  The arrays are `memoryview`s over the
+    mapped file, and remain valid as long as this object (or any of the arrays) is alive.
+
+    Args:
+        path (str): Path of the adjacency file
+        digest (str): sha256 hex digest the file must have been written with
+    """
+
+    def __init__(self, path, digest):
+        with open(path, "rb") as adjacency_file:
+            self.mmap = mmap.mmap(adjacency_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.mmap) < HEADER.size:
+            raise AdjacencyFormatError(f"Truncated adjacency file: {path}")
+        magic, file_digest, n_nodes, n_parent_edges, n_child_edges = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or file_digest.hex() != digest:
+            raise AdjacencyFormatError(f"Adjacency file was not written for this manifest: {path}")
+
+        lengths = (n_nodes + 1, n_parent_edges, n_nodes + 1, n_child_edges)
+        if len(self.mmap) != HEADER.size + ITEM_SIZE * sum(lengths):
+            raise AdjacencyFormatError(f"Truncated adjacency file: {path}")
+
+        self.n_nodes = n_nodes
+        view = memoryview(self.mmap)
+        offset = HEADER.size
+        for field, length in zip(ADJACENCY_FIELDS, lengths):
+            setattr(self, field, view[offset : offset + ITEM_SIZE * length].cast("q"))
+            offset += ITEM_SIZE * length
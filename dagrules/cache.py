@@ -0,0 +1,180 @@
+"""
+On-disk cache of the manifest index.
+
+The slimmed `ManifestIndex` built from manifest.json is pickled to a cache directory next to
+the manifest (`target/.dagrules_cache` by default), except for its parent/child adjacency,
+which is written to a separate file that is memory-mapped when the cache is read (see
+`dagrules.adjacency`).  The cache is keyed on the manifest's size,
+modification time and content hash: when the size and mtime are unchanged the cache is used
+without reading the manifest at all, and when only the mtime changed (e.g. dbt recompiled
+without changing anything) the content hash decides.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from dagrules.adjacency import AdjacencyFormatError, MappedAdjacency, write_adjacency
+from dagrules.index import ManifestIndex
+from dagrules.loader import load_manifest
+from dagrules.version import __version__
+
+CACHE_DIR = ".dagrules_cache"
+CACHE_FORMAT = 4
+
+KEY_FILE = "manifest.key"
+INDEX_FILE = "index.pickle"
+ADJACENCY_FILE = "adjacency.csr"
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def default_cache_dir(manifest_path):
+    "Returns the default cache directory for the manifest at `manifest_path`"
+    return os.path.join(os.path.dirname(os.path.abspath(manifest_path)), CACHE_DIR)
+
+
+def manifest_digest(manifest_path):
+    "Returns the sha256 hex digest of the manifest contents"
+
+    digest = hashlib.sha256()
+    with open(manifest_path, "rb") as manifest_file:
+        for chunk in iter(lambda: manifest_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    """
+    Calls `write` with a binary file object, which is moved to `path` once written, so that
+    readers never see a partially written file
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            write(tmp_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_key(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, KEY_FILE), encoding="utf-8") as key_file:
+            key = json.load(key_file)
+    except (OSError, ValueError):
+        return None
+
+    if key.get("format") != CACHE_FORMAT or key.get("dagrules") != __version__:
+        return None
+    return key
+
+
+class ManifestCache:
+    """
+    Reads and writes the cached index for one manifest.json file
+
+    Args:
+        manifest_path (str): Path to manifest.json
+        cache_dir (str): Directory holding the cache (default: `.dagrules_cache` next to
+            the manifest)
+        parser (str): JSON parser to read the manifest with on a cache miss, see
+            `dagrules.parsers.PARSERS`
+    """
+
+    def __init__(self, manifest_path, cache_dir=None, parser="auto"):
+        self.manifest_path = manifest_path
+        self.cache_dir = cache_dir or default_cache_dir(manifest_path)
+        self.parser = parser
+
+    def load_index(self):
+        "Returns the index of the manifest, from the cache when it is still valid"
+
+        stat = os.stat(self.manifest_path)
+        key = _read_key(self.cache_dir)
+        digest = None
+
+        if key is not None and key["size"] == stat.st_size:
+            if key["mtime_ns"] != stat.st_mtime_ns:
+                digest = manifest_digest(self.manifest_path)
+
+            if digest is None or digest == key["sha256"]:
+                index = self.read_index(key["sha256"])
+                if index is not None:
+                    if digest is not None:
+                        self._save_key({**key, "mtime_ns": stat.st_mtime_ns})
+                    return index
+
+        index = ManifestIndex(load_manifest(self.manifest_path, parser=self.parser))
+        self.write_index(index, stat, digest or manifest_digest(self.manifest_path))
+        return index
+
+    def read_index(self, digest):
+        "Returns the cached index of the manifest with `digest`, or None if it cannot be read"
+
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "rb") as index_file:
+                cached = pickle.load(index_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        # The digest is stored with the index, so an index written without its key is never used
+        if not isinstance(cached, dict) or cached.get("sha256") != digest:
+            return None
+
+        index = cached["index"]
+        try:
+            index.attach_adjacency(
+                MappedAdjacency(os.path.join(self.cache_dir, ADJACENCY_FILE), digest)
+            )
+        except (OSError, ValueError, AdjacencyFormatError):
+            return None
+        return index
+
+    def write_index(self, index, stat, digest):
+        "Caches `index` under the key of a manifest with the given stat and digest"
+
+        key = {
+            "format": CACHE_FORMAT,
+            "dagrules": __version__,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+        }
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_atomic(
+                os.path.join(self.cache_dir, ADJACENCY_FILE),
+                lambda adjacency_file: write_adjacency(index, adjacency_file, digest),
+            )
+            _write_atomic(
+                os.path.join(self.cache_dir, INDEX_FILE),
+                lambda index_file: pickle.dump(
+                    {"sha256": digest, "index": index.without_adjacency()},
+                    index_file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                ),
+            )
+        except OSError:
+            # The cache is only an optimization, e.g. the target directory may be read-only
+            return
+        self._save_key(key)
+
+    def _save_key(self, key):
+        try:
+            _write_atomic(
+                os.path.join(self.cache_dir, KEY_FILE),
+                lambda key_file: key_file.write(json.dumps(key).encode("utf-8")),
+            )
+        except OSError:
+            pass
+
+
+def load_index(manifest_path, cache_dir=None, parser="auto"):
+    "Returns the index of the manifest at `manifest_path`, using the on-disk cache"
+    return ManifestCache(manifest_path, cache_dir, parser).load_index()
@@ -3,17 +3,42 @@ The dagrules cli
 """
 
 import os
+import sys
+import contextlib
 import argparse
-import json
 
-import yaml
+from dagrules.parsers import PARSERS, load_yaml
 
-import dagrules.core
+# The rest of dagrules, and its dependencies, are imported where they are used, so that the
+# cli starts quickly (e.g. in pre-commit hooks run for many dbt projects) and `--help` or a
+# usage error do not wait for them
 
-DBT_ROOT = os.getcwd()
-if "DBT_ROOT" in os.environ:
-    DBT_ROOT = os.environ["DBT_ROOT"]
-DAGRULES_YAML = os.path.join(DBT_ROOT, "dagrules.yml")
+
+def dbt_root():
+    "Returns the dbt project root: `DBT_ROOT` if set, or else the working directory"
+    return os.environ.get("DBT_ROOT", os.getcwd())
+
+
+def dagrules_yaml():
+    "Returns the path of dagrules.yml: `DAGRULES_YAML` if set, or else in the dbt project root"
+    return os.environ.get("DAGRULES_YAML", os.path.join(dbt_root(), "dagrules.yml"))
+
+
+def manifest_json():
+    "Returns the path of the dbt manifest.json, in the dbt project's target directory"
+    return os.path.join(dbt_root(), "target", "manifest.json")
+
+
+def _positive_int(value):
+    "Parses a command line argument that must be a whole number of at least 1"
+
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, not {value!r}")
+    return number
 
 
 def _parse_args():
@@ -28,32 +53,246 @@ def _parse_args():
         help="Runs dagrules define in dagrules.yml",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help=(
+            "Always re-read manifest.json and re-check every rule, ignoring (and not updating) "
+            "the manifest and rule result caches"
+        ),
+    )
+
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes to check rules in (default: 1)",
+    )
+
+    parser.add_argument(
+        "--max-violations",
+        dest="max_violations",
+        type=_positive_int,
+        default=None,
+        help="Stop checking after this many violations (default: report all violations)",
+    )
+
+    parser.add_argument(
+        "--fail-fast",
+        dest="fail_fast",
+        action="store_true",
+        help="Stop checking at the first violation",
+    )
+
+    parser.add_argument(
+        "--state",
+        dest="state",
+        default=None,
+        help=(
+            "Path to a previous manifest.json; the results of the last run are reused, except "
+            "for nodes that changed since (or whose parents or children changed)"
+        ),
+    )
+
+    parser.add_argument(
+        "--watch",
+        dest="watch",
+        action="store_true",
+        help=(
+            "Keep running, and re-check whenever manifest.json or dagrules.yml change "
+            "(implies --check; not with --format, --output or --state)"
+        ),
+    )
+
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        default="text",
+        choices=["text", "jsonl", "junit", "sarif"],
+        help=(
+            "Format to report results in: colourized text (default), JSON lines, JUnit XML or "
+            "SARIF; results are written as each rule finishes"
+        ),
+    )
+
+    parser.add_argument(
+        "--output",
+        "-o",
+        dest="output",
+        default=None,
+        metavar="PATH",
+        help="File to write the results to (default: stdout)",
+    )
+
+    parser.add_argument(
+        "--parser",
+        dest="parser",
+        default="auto",
+        choices=PARSERS,
+        help=(
+            "Library to parse manifest.json with (default: msgspec if installed, else the "
+            "standard library's json, streamed to use little memory); stdlib also reads "
+            "dagrules.yml without libyaml"
+        ),
+    )
+
+    parser.add_argument(
+        "--timings",
+        dest="timings",
+        nargs="?",
+        const="table",
+        default=None,
+        choices=["table", "json"],
+        help=(
+            "Print the time, nodes and edges visited, and peak memory of each phase and rule "
+            "to stderr, as a table (default) or as JSON (not with --watch)"
+        ),
+    )
+
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        default=None,
+        metavar="PATH",
+        help="Profile the run with cProfile, writing the stats to PATH (e.g. out.prof)",
+    )
+
+    args = parser.parse_args()
+    if args.watch:
+        # The watcher always reports in colourized text to stdout, and re-checks every node
+        unsupported = [
+            flag
+            for flag, given in (
+                ("--format", args.output_format != "text"),
+                ("--output", args.output is not None),
+                ("--state", args.state is not None),
+            )
+            if given
+        ]
+        if unsupported:
+            parser.error(f"--watch cannot be combined with {', '.join(unsupported)}")
+    return args
 
 
 def main():
     "Entry point for the command line interface"
     args = _parse_args()
 
-    config = _read_config()
-    manifest = _read_manifest()
+    profiler = None
+    if args.profile is not None:
+        import cProfile  # pylint: disable=import-outside-toplevel
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    timings = None
+    if args.timings is not None and not args.watch:
+        import dagrules.timings  # pylint: disable=import-outside-toplevel
+
+        timings = dagrules.timings.Timings()
+
+    try:
+        _run(args, timings)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if timings is not None:
+            timings.close()
+            print(timings.table() if args.timings == "table" else timings.json(), file=sys.stderr)
+
+
+def _run(args, timings=None):
+    "Runs dagrules as specified by the command line arguments"
+
+    # pylint: disable=import-outside-toplevel
+    import dagrules.core
+    import dagrules.loader
+    import dagrules.results
+    import dagrules.timings
+
+    if timings is None:
+        timings = dagrules.timings.NullTimings()
+
+    if args.watch:
+        import dagrules.watch
+
+        watcher = dagrules.watch.Watcher(
+            dagrules_yaml(),
+            manifest_json(),
+            use_cache=args.use_cache,
+            jobs=args.jobs,
+            max_violations=dagrules.core.violation_limit(args.max_violations, args.fail_fast),
+            parser=args.parser,
+        )
+        watcher.run()
+        return
+
+    with timings.phase("read config"):
+        config = _read_config(args.parser)
+    with timings.phase("read manifest"):
+        manifest = _read_manifest(use_cache=args.use_cache, parser=args.parser)
+        state = None
+        if args.state is not None and args.use_cache:
+            # Only compared node by node, so neither indexed nor cached
+            state = dagrules.loader.load_manifest(args.state, parser=args.parser)
+
+    results = None
+    if args.use_cache:
+        results = dagrules.results.ResultStore.for_manifest(manifest_json())
+    elif args.state is not None:
+        print("No cached results for --state to reuse, checking every node", file=sys.stderr)
 
     if args.check:
-        dagrules.core.validate(config)
-        dagrules.core.check(config, manifest)
+        with timings.phase("validate"):
+            dagrules.core.validate(config)
+        with _open_output(args.output) as output:
+            dagrules.core.check(
+                config,
+                manifest,
+                jobs=args.jobs,
+                max_violations=args.max_violations,
+                fail_fast=args.fail_fast,
+                state=state,
+                results=results,
+                timings=timings,
+                output_format=args.output_format,
+                output=output,
+            )
+
 
+def _open_output(output_path=None):
+    "Opens the file to write results to, or returns a context manager for stdout"
 
-def _read_config():
+    if output_path is None:
+        return contextlib.nullcontext(sys.stdout)
+    return open(output_path, "w", encoding="utf-8")
+
+
+def _read_config(parser="auto"):
     "Read yaml rules file"
 
-    with open(DAGRULES_YAML, encoding="utf-8") as rules_file:
-        config = yaml.safe_load(rules_file)
+    with open(dagrules_yaml(), encoding="utf-8") as rules_file:
+        config = load_yaml(rules_file, parser)
     return config
 
 
-def _read_manifest():
-    "Read the dbt manifest.json file"
+def _read_manifest(manifest_path=None, use_cache=True, parser="auto"):
+    """
+    Read the fields dagrules uses from the dbt manifest.json file, returning an index of
+    the manifest (from the cache in `.dagrules_cache` next to it when it is still valid)
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import dagrules.cache
+    import dagrules.core
+    import dagrules.loader
 
-    with open(os.path.join(DBT_ROOT, "target", "manifest.json"), encoding="utf-8") as manifest_file:
-        manifest = json.load(manifest_file)
-    return manifest
+    if manifest_path is None:
+        manifest_path = manifest_json()
+    if use_cache:
+        return dagrules.cache.load_index(manifest_path, parser=parser)
+    return dagrules.core.manifest_index(dagrules.loader.load_manifest(manifest_path, parser=parser))
@@ -0,0 +1,245 @@
+"""
+Columnar table of node attributes used to select rule subjects.
+
+When NumPy is installed, each subject selector of a large manifest is evaluated as a single
+boolean mask over all nodes at once.  Otherwise a pure-Python scan gives the same results.
+NumPy is only imported once a table uses it, as importing it takes longer than scanning the
+nodes of smaller manifests does.
+
+Rules often share a subject selector, so each table memoizes its selections, keyed on the
+canonical form of the selector, and shares them read-only (as tuples) between rules.
+"""
+
+import sys
+from collections import OrderedDict
+
+# NumPy, once imported by `_import_numpy`
+numpy = None  # pylint: disable=invalid-name
+
+# By default, tables of fewer nodes use the pure-Python engine, unless NumPy is already imported
+NUMPY_MIN_NODES = 50000
+
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+# How many selected positions the subject memo of a table holds at most (each selection also
+# counts as one), before evicting the least recently used selections
+MEMO_SIZE = 1 << 22
+
+
+def _encode(values):
+    "Returns a dict of distinct values to integer codes, and the list of codes for `values`"
+
+    codes = {}
+    return codes, [codes.setdefault(value, len(codes)) for value in values]
+
+
+def _as_tuple(values):
+    if values is None or isinstance(values, (list, tuple, set, frozenset)):
+        return values
+    return (values,)
+
+
+def _canonical(values):
+    values = _as_tuple(values)
+    return None if values is None else tuple(sorted(set(values), key=str))
+
+
+def selection_key(node_type="model", tags=None, package=None, materialized=None):
+    """
+    Returns the canonical, hashable form of a subject selector: selectors that select the same
+    nodes, whatever the order or repetition of their tags, packages and materializations,
+    have equal keys
+
+    Args:
+        node_type (str): Resource type of the nodes to select
+        tags (TagMatcher): Compiled tag selector the nodes must match
+        package (str, list): Package name(s) the nodes must belong to
+        materialized (str, list): Materialization(s) the nodes must have
+    """
+
+    return (
+        node_type,
+        None if tags is None else tags.key,
+        _canonical(package),
+        _canonical(materialized),
+    )
+
+
+def _import_numpy():
+    "Imports NumPy on first use, returning it (or None if it is not installed)"
+
+    global numpy  # pylint: disable=global-statement,invalid-name
+    if numpy is None:
+        try:
+            import numpy as module  # pylint: disable=import-outside-toplevel
+        except ImportError:  # pragma: no cover - depends on the environment
+            return None
+        numpy = module
+    return numpy
+
+
+class SubjectMemo:
+    """
+    Least recently used memo of subject selections by `selection_key`, holding at most
+    `max_size` selected positions (each selection also counting as one)
+
+    Args:
+        max_size (int): Size bound of the memo
+    """
+
+    def __init__(self, max_size=MEMO_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._selections = OrderedDict()
+
+    def __len__(self):
+        return len(self._selections)
+
+    def get(self, key, select):
+        """
+        Returns the selection memoized for `key`, or else selects it by calling `select` and
+        memoizes it (as a tuple)
+        """
+
+        selection = self._selections.get(key)
+        if selection is not None:
+            self._selections.move_to_end(key)
+            self.hits += 1
+            return selection
+
+        self.misses += 1
+        selection = tuple(select())
+        if len(selection) + 1 <= self.max_size:
+            self._selections[key] = selection
+            self.size += len(selection) + 1
+            while self.size > self.max_size:
+                _, evicted = self._selections.popitem(last=False)
+                self.size -= len(evicted) + 1
+        return selection
+
+
+class NodeTable:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """
+    Holds one column per node attribute dagrules can select on: resource type, tag bitmask,
+    package and materialization.  String attributes are dictionary encoded to integer codes.
+
+    Args:
+        index (ManifestIndex): The index to build the table from
+        use_numpy (bool): Use the NumPy engine (default: whenever NumPy is installed, and
+            either already imported or the index has at least `NUMPY_MIN_NODES` nodes)
+        memo_size (int): Size bound of the memo of selections (see `SubjectMemo`)
+    """
+
+    def __init__(self, index, use_numpy=None, memo_size=MEMO_SIZE):
+        if use_numpy is None:
+            use_numpy = (
+                "numpy" in sys.modules or len(index.nodes) >= NUMPY_MIN_NODES
+            ) and _import_numpy() is not None
+        if use_numpy and _import_numpy() is None:
+            raise ImportError("The NumPy columnar engine requires numpy to be installed")
+
+        self.index = index
+        self.use_numpy = use_numpy
+        self.memo = SubjectMemo(memo_size)
+
+        self.type_codes, type_column = _encode(node.resource_type for node in index.nodes)
+        self.package_codes, package_column = _encode(node.package_name for node in index.nodes)
+        self.materialized_codes, materialized_column = _encode(
+            node.materialized for node in index.nodes
+        )
+
+        if use_numpy:
+            n_words = max(1, -(-len(index.tags) // WORD_BITS))
+            self.types = numpy.array(type_column, dtype=numpy.int32)
+            self.packages = numpy.array(package_column, dtype=numpy.int32)
+            self.materializations = numpy.array(materialized_column, dtype=numpy.int32)
+            self.tag_words = self._split_words(index.tag_masks, n_words).reshape(-1, n_words)
+        else:
+            self.types = type_column
+            self.packages = package_column
+            self.materializations = materialized_column
+            self.tag_words = None
+
+    @staticmethod
+    def _split_words(masks, n_words):
+        "Splits arbitrary precision bitmasks into an array of 64 bit words"
+
+        return numpy.array(
+            [(mask >> (WORD_BITS * word)) & WORD_MASK for mask in masks for word in range(n_words)],
+            dtype=numpy.uint64,
+        )
+
+    def select(self, node_type="model", tags=None, package=None, materialized=None):
+        """
+        Returns a tuple of the (ascending) positions of the nodes matching a subject selector,
+        shared by all equivalent selectors.
+
+        Args:
+            node_type (str): Resource type of the nodes to select
+            tags (TagMatcher): Compiled tag selector the nodes must match
+            package (str, list): Package name(s) the nodes must belong to
+            materialized (str, list): Materialization(s) the nodes must have
+        """
+
+        return self.memo.get(
+            selection_key(node_type, tags, package, materialized),
+            lambda: self._select(node_type, tags, package, materialized),
+        )
+
+    def _select(self, node_type, tags, package, materialized):
+        if node_type not in self.type_codes:
+            return []
+        package_codes = self._lookup(self.package_codes, package)
+        materialized_codes = self._lookup(self.materialized_codes, materialized)
+
+        if self.use_numpy:
+            return self._select_numpy(node_type, tags, package_codes, materialized_codes)
+        return self._select_python(node_type, tags, package_codes, materialized_codes)
+
+    @staticmethod
+    def _lookup(codes, values):
+        values = _as_tuple(values)
+        if values is None:
+            return None
+        return [codes[value] for value in values if value in codes]
+
+    def _select_numpy(self, node_type, tags, package_codes, materialized_codes):
+        selected = self.types == self.type_codes[node_type]
+        if package_codes is not None:
+            selected &= numpy.isin(self.packages, package_codes)
+        if materialized_codes is not None:
+            selected &= numpy.isin(self.materializations, materialized_codes)
+        if tags is not None and tags.clauses is not None:
+            selected &= self._tag_mask(tags)
+        return numpy.flatnonzero(selected).tolist()
+
+    def _tag_mask(self, tags):
+        vocabulary = self.index.tags
+        n_words = self.tag_words.shape[1]
+
+        matched = numpy.zeros(len(self.tag_words), dtype=bool)
+        for include, exclude in tags.clauses:
+            if not vocabulary.knows(include):
+                continue
+            include = self._split_words([vocabulary.mask(include)], n_words)
+            exclude = self._split_words([vocabulary.mask(exclude)], n_words)
+            matched |= numpy.all((self.tag_words & include) == include, axis=1) & numpy.all(
+                (self.tag_words & exclude) == 0, axis=1
+            )
+        return matched
+
+    def _select_python(self, node_type, tags, package_codes, materialized_codes):
+        # Filters are chained lazily, so only the final selection is materialized
+        selected = iter(self.index.of_type(node_type))
+        if package_codes is not None:
+            selected = (pos for pos in selected if self.packages[pos] in package_codes)
+        if materialized_codes is not None:
+            selected = (pos for pos in selected if self.materializations[pos] in materialized_codes)
+        if tags is not None and tags.clauses is not None:
+            has_tags = tags.bind(self.index.tags)
+            tag_masks = self.index.tag_masks
+            selected = (pos for pos in selected if has_tags(tag_masks[pos]))
+        return list(selected)
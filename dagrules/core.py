@@ -2,25 +2,28 @@
 Core dagrules functionality.
 """
 
-import re
-
-from colorama import Fore, Style
-
-
-class ParseError(BaseException):
-    "Indicates a dagrules.yml parsing error"
-
-
-class ParserAllowedValueError(ParseError):
-    "Indicates when a non-allowed value is found in a dagrules.yml config file"
-
-
-class ParserRequiredValueError(ParseError):
-    "Indicates when a required value is not found in a dagrules.yml config file"
-
-
-class RuleError(BaseException):
-    "Indicates that a specified dagrules rule was violated"
+import sys
+
+from dagrules.exceptions import (  # pylint: disable=unused-import
+    ParseError,
+    ParserAllowedValueError,
+    ParserRequiredValueError,
+    RuleError,
+)
+from dagrules.index import ManifestIndex, SubjectView
+from dagrules.parallel import check_rules
+from dagrules.rules import (
+    TRANSITIVE_RELATIONSHIPS,
+    HaveRelationship,
+    HaveTagsAny,
+    MatchName,
+    Subject,
+    compile_rule,
+    compile_rules,
+)
+from dagrules.state import modified_positions
+from dagrules.tags import TagMatcher
+from dagrules.timings import NullTimings
 
 
 def match_tags(tags, include=None, exclude=None):
@@ -52,14 +55,6 @@ def match_tags(tags, include=None, exclude=None):
     return include.issubset(tags) and len(exclude & tags) == 0
 
 
-def _sanitize_tag_matcher(matcher):
-    if isinstance(matcher, str):
-        return {"include": matcher}
-    if isinstance(matcher, dict):
-        return {"include": matcher.get("include"), "exclude": matcher.get("exclude")}
-    return None
-
-
 def match_tags_any(tags, matchers=None):
     """
     Loops through a (possible) list of tags to match and returns true if any match
@@ -78,38 +73,38 @@ def match_tags_any(tags, matchers=None):
             match_tags_any(['a', 'b'], {'include': 'a', 'exclude': 'b'} # => False
             match_tags_any(['a', 'b', 'c'], [{'include': 'a', 'exclude': 'b'}, 'c'] # => True ('c' matches)
 
+    When the same matchers are applied to many nodes, compile them once with
+    `dagrules.tags.TagMatcher` instead.
     """
 
-    if matchers is None:
-        return True
-
-    if isinstance(tags, str):
-        tags = {tags}
-    tags = set(tags)
-
-    if isinstance(matchers, (str, dict)):
-        matchers = [_sanitize_tag_matcher(matchers)]
-    else:
-        matchers = [_sanitize_tag_matcher(matcher) for matcher in matchers]
-
-    for matcher in matchers:
-        if match_tags(tags, **matcher):
-            return True
-    return False
+    return TagMatcher.compile(matchers).match(tags)
 
 
 def validate(config):
     "Validates the dagrules.yml configuration files conforms to specs"
 
+    validate_shape(config, dict, "dagrules.yml configuration")
     validate_root(config)
+    validate_shape(config["rules"], list, "dagrules.yml rules")
     for idx, rule in enumerate(config["rules"]):
+        validate_shape(rule, dict, f"Rule at index {idx}")
         validate_rule_name(idx, rule)
         validate_rule(rule["name"], rule)
         if "subject" in rule:
+            validate_shape(rule["subject"], dict, f'Subject of rule "{rule["name"]}"')
             validate_rule_subject(rule["name"], rule["subject"])
+        validate_shape(rule["must"], dict, f'Must of rule "{rule["name"]}"')
         validate_rule_must(rule["name"], rule["must"])
 
 
+def validate_shape(value, expected_type, description):
+    "Validates that a part of the dagrules.yml configuration is a mapping (`dict`) or `list`"
+
+    if not isinstance(value, expected_type):
+        kind = "mapping" if expected_type is dict else expected_type.__name__
+        raise ParserAllowedValueError(f"{description} must be a {kind}, not {value!r}")
+
+
 def validate_values(values, allowed_values=None, required_values=None):
     """
     Checks a list of `values` against valid values.
@@ -175,7 +170,7 @@ def validate_rule_subject(rule_name, config):
     try:
         validate_values(
             values=config.keys(),
-            allowed_values={"type", "tags"},
+            allowed_values={"type", "tags", "package", "materialized"},
             required_values={},
         )
     except ParserAllowedValueError as err:
@@ -197,6 +192,11 @@ def validate_rule_must(rule_name, config):
             allowed_values={
                 "have-child-relationship",
                 "have-parent-relationship",
+                "have-descendant-relationship",
+                "have-ancestor-relationship",
+                "max-depth",
+                "max-fan-in",
+                "max-fan-out",
                 "match-name",
                 "have-tags-any",
             },
@@ -212,155 +212,232 @@ def validate_rule_must(rule_name, config):
         ) from err
 
 
-def check(config, manifest):
-    "Checks whether any dagrules rules specified are violated"
+def check(  # pylint: disable=too-many-arguments
+    config,
+    manifest,
+    jobs=1,
+    max_violations=None,
+    fail_fast=False,
+    state=None,
+    results=None,
+    timings=None,
+    output_format="text",
+    output=None,
+):
+    """
+    Checks whether any dagrules rules specified are violated, reporting every violation
 
-    version = config["version"]
-    if str(version) != "1":
-        raise ParserAllowedValueError("dagrules.yml config version must be '1'")
+    Args:
+        config (dict): Validated dagrules.yml configuration
+        manifest (dict, ManifestIndex): The dbt manifest, or an index already built from it
+        jobs (int): Number of worker processes to check rules in (default: 1, serially)
+        max_violations (int): Stop checking after this many violations (default: no limit)
+        fail_fast (bool): Stop checking at the first violation
+        state (dict, ManifestIndex): A previous manifest (or its index); the subjects that may
+            have changed since are checked again, instead of reusing their recorded `results`
+        results (ResultStore): Rule results of previous runs to reuse, and record this run in
+        timings (Timings): Records the time and resources each phase and rule take (see
+            `dagrules.timings`)
+        output_format (str): `text` to print a colourized report, or a machine-readable
+            format of `dagrules.formats` (`jsonl`, `junit` or `sarif`)
+        output: Text stream to write the results to (default: stdout)
+    """
 
-    has_error = False
-    for rule in config["rules"]:
-        subject_config = rule.get("subject", {})
-        subjects = rule_subjects(
-            manifest, node_type=subject_config.get("type", "model"), tags=subject_config.get("tags")
-        )
+    limit = violation_limit(max_violations, fail_fast)
+    checked = _check_rules(config, manifest, jobs, limit, state, results, timings)
+    if output_format == "text":
+        report(checked, limit, output)
+        return
 
-        try:
-            print(f'Checking rule {rule["name"]}', end=" ... ")
-            check_rule(rule, subjects)
-            print(Fore.GREEN + "PASSED" + Style.RESET_ALL)
+    from dagrules.formats import write_results  # pylint: disable=import-outside-toplevel
+
+    n_violations = write_results(checked, output_format, output or sys.stdout, limit)
+    if n_violations > 0:
+        raise RuleError(f"There were {n_violations} dagrule rule error(s), see the results")
+
+
+def report(checked, max_violations=None, stream=None):
+    """
+    Prints the results of checking rules, raising a `RuleError` if any rule was violated
 
-        except RuleError as err:
-            print(Fore.RED + "FAILED")
-            print(err)
-            print(Style.RESET_ALL)
-            has_error = True
+    Args:
+        checked: `(rule, violations)` pairs, as yielded by `dagrules.parallel.check_rules`
+        max_violations (int): The limit checking stopped at, if any
+        stream: Text stream to print to (default: stdout)
+    """
 
-    if has_error:
+    from colorama import Fore, Style  # pylint: disable=import-outside-toplevel
+
+    n_violations = 0
+    for rule, violations in checked:
+        print(f"Checking rule {rule.name}", end=" ... ", file=stream)
+        if len(violations) == 0:
+            print(Fore.GREEN + "PASSED" + Style.RESET_ALL, file=stream)
+        else:
+            print(Fore.RED + "FAILED", file=stream)
+            for violation in violations:
+                print(violation.detail, file=stream)
+            print(Style.RESET_ALL, file=stream)
+            n_violations += len(violations)
+
+    if max_violations is not None and n_violations >= max_violations:
+        print(f"Stopped checking after {n_violations} violation(s)", file=stream)
+    if n_violations > 0:
         raise RuleError("There were dagrule rule errors, see log")
 
 
+def find_violations(  # pylint: disable=too-many-arguments
+    config,
+    manifest,
+    jobs=1,
+    max_violations=None,
+    fail_fast=False,
+    state=None,
+    results=None,
+    timings=None,
+):
+    """
+    Checks dagrules rules, yielding a `Violation` record (rule, node, must, detail) for every
+    violation found, in rule order
+
+    Args:
+        config (dict): Validated dagrules.yml configuration
+        manifest (dict, ManifestIndex): The dbt manifest, or an index already built from it
+        jobs (int): Number of worker processes to check rules in (default: 1, serially)
+        max_violations (int): Stop checking after this many violations (default: no limit)
+        fail_fast (bool): Stop checking at the first violation
+        state (dict, ManifestIndex): A previous manifest (or its index); the subjects that may
+            have changed since are checked again, instead of reusing their recorded `results`
+        results (ResultStore): Rule results of previous runs to reuse, and record this run in
+        timings (Timings): Records the time and resources each phase and rule take (see
+            `dagrules.timings`)
+    """
+
+    limit = violation_limit(max_violations, fail_fast)
+    for _, violations in _check_rules(config, manifest, jobs, limit, state, results, timings):
+        yield from violations
+
+
+def violation_limit(max_violations=None, fail_fast=False):
+    "Returns the number of violations to stop checking at (None for no limit)"
+
+    if fail_fast:
+        return 1
+    if max_violations is not None and max_violations < 1:
+        raise ValueError("max_violations must be at least 1")
+    return max_violations
+
+
+def validate_version(config):
+    "Validates that the dagrules.yml configuration is of a version this dagrules can check"
+
+    version = config["version"]
+    if str(version) != "1":
+        raise ParserAllowedValueError("dagrules.yml config version must be '1'")
+
+
+def _check_rules(  # pylint: disable=too-many-arguments
+    config, manifest, jobs, max_violations, state=None, results=None, timings=None
+):
+    if timings is None:
+        timings = NullTimings()
+
+    with timings.phase("validate"):
+        validate_version(config)
+        rules = compile_rules(config)
+    with timings.phase("read manifest"):
+        index = manifest_index(manifest)
+
+    # Without recorded results to reuse for the unmodified subjects, every subject is checked,
+    # and results recorded for this very manifest are all reused without comparing it to state
+    positions = None
+    if state is not None and results is not None and not results.recorded_for(rules, index):
+        transitive = any(
+            relationship in TRANSITIVE_RELATIONSHIPS
+            for rule in rules
+            for relationship in rule.relationships
+        )
+        with timings.phase("select"):
+            positions = modified_positions(index, state, transitive)
+
+    yield from check_rules(
+        index,
+        rules,
+        jobs=jobs,
+        max_violations=max_violations,
+        positions=positions,
+        results=results,
+        timings=timings,
+    )
+    if results is not None:
+        results.save(rules)
+
+
 def check_rule(rule, subjects):
     "Checks whether a specific rule is violated."
 
-    if "match-name" in rule["must"]:
-        rule_match_name(subjects, rule["must"]["match-name"])
+    for must in compile_rule(rule).musts:
+        _check_must(must, subjects)
+
 
-    if "have-tags-any" in rule["must"]:
-        rule_have_tags_any(subjects, rule["must"]["have-tags-any"])
+def _check_must(must, subjects):
+    "Checks a compiled must against subjects selected by `rule_subjects`"
 
-    if "have-child-relationship" in rule["must"]:
-        kwargs = {
-            k.replace("-", "_"): v for k, v in rule["must"]["have-child-relationship"].items()
-        }
-        rule_have_relationship(subjects, "child", **kwargs)
+    if isinstance(subjects, SubjectView):
+        if len(subjects) > 0:
+            must.check(subjects.index, subjects.positions)
+        return True
 
-    if "have-parent-relationship" in rule["must"]:
-        kwargs = {
-            k.replace("-", "_"): v for k, v in rule["must"]["have-parent-relationship"].items()
-        }
-        rule_have_relationship(subjects, "parent", **kwargs)
+    # A mapping of node ids to `NodeView`s put together by the caller
+    views = list(subjects.values())
+    if len(views) > 0:
+        must.check(views[0].index, [view.position for view in views])
+    return True
 
 
-def rule_subjects(manifest, node_type="model", tags=None):
-    "Finds all of the dbt nodes specified by a dagrules subject."
+def manifest_index(manifest):
+    "Returns a `ManifestIndex` for a manifest, building one unless it is already an index"
 
-    flat_nodes = {**manifest.get("sources", {}), **manifest["nodes"]}
+    if isinstance(manifest, ManifestIndex):
+        return manifest
+    return ManifestIndex(manifest)
 
-    selected_nodes = {
-        node: {**params, **{"children": manifest.get("child_map", {}).get(node, [])}}
-        for node, params in flat_nodes.items()
-        if params["resource_type"] == node_type and match_tags_any(params.get("tags", []), tags)
-    }
 
-    for node, params in selected_nodes.items():
-        selected_nodes[node]["child_params"] = {
-            child: flat_nodes[child] for child in selected_nodes[node]["children"]
-        }
+def rule_subjects(manifest, node_type="model", tags=None, package=None, materialized=None):
+    """
+    Finds all of the dbt nodes specified by a dagrules subject.
 
-        selected_nodes[node]["parent_params"] = {
-            parent: flat_nodes[parent]
-            for parent in selected_nodes[node].get("depends_on", {}).get("nodes", [])
-        }
+    Args:
+        manifest (dict, ManifestIndex): The dbt manifest, or an index already built from it
+        node_type (str): Resource type of the nodes to select
+        tags (str, list, dict): Tag selector the nodes must match
+        package (str, list): Package name(s) the nodes must belong to
+        materialized (str, list): Materialization(s) the nodes must have
+
+    Returns a read-only mapping of node ids to `NodeView`s of the selected nodes, which are
+    only created as they are accessed (see `SubjectView`).
+    """
 
-    return selected_nodes
+    index = manifest_index(manifest)
+    return SubjectView(index, Subject(node_type, tags, package, materialized).select(index))
 
 
 def rule_match_name(subjects, match_name):
     "Checks whether subjects match the name required"
 
-    is_regex_match = re.fullmatch("/.*/", match_name) is not None
-    if is_regex_match:
-        match_name_regex = re.fullmatch("/(.*)/", match_name).group(1)
-        has_match = lambda name: re.fullmatch(match_name_regex, name) is not None
-    else:
-        raise RuleError("I don't know how to handle anything other that regex matchers")
-
-    for node, params in subjects.items():
-        if not has_match(params["name"]):
-            raise RuleError(
-                f"For node \"{node}\", \"{params['name']}\" does not match pattern {match_name}"
-            )
-    return True
+    return _check_must(MatchName(match_name), subjects)
 
 
 def rule_have_tags_any(subjects, tags):
     "Checks whehter subjects have the tags specified"
 
-    for node, params in subjects.items():
-        if not match_tags_any(params["tags"], tags):
-            raise RuleError(
-                f"For node \"{node}\", tags {params['tags']} do not match expected tags {tags}"
-            )
-    return True
+    return _check_must(HaveTagsAny(tags), subjects)
 
 
-def rule_have_relationship(subjects, relationship, **kwargs):  # pylint: disable=too-many-locals
+def rule_have_relationship(subjects, relationship, **kwargs):
     "Checks whether subjects have the specified relationships"
 
-    unknown_kwargs = set(kwargs.keys()) - {
-        "cardinality",
-        "required",
-        "select_node_type",
-        "require_node_type",
-        "select_tags_any",
-        "require_tags_any",
-    }
-    unknown_kwargs = {v.replace("_", "-") for v in unknown_kwargs}
-    if len(unknown_kwargs) > 0:
-        raise ParserAllowedValueError(
-            f"Unknown argument to have-{relationship}-relationship: {unknown_kwargs}"
-        )
-
-    cardinality = kwargs.get("cardinality", "one_to_many")
-    required = kwargs.get("required", True)
-    select_node_type = kwargs.get("select_node_type", None)
-    require_node_type = kwargs.get("require_node_type", None)
-    select_tags_any = kwargs.get("select_tags_any", None)
-    require_tags_any = kwargs.get("require_tags_any", None)
-
-    for node, params in subjects.items():
-        selected_deps = {
-            dep: dep_params
-            for dep, dep_params in params[f"{relationship}_params"].items()
-            if match_tags_any(dep_params.get("tags"), select_tags_any)
-            and (select_node_type is None or select_node_type == dep_params["resource_type"])
-        }
-
-        n_deps = len(selected_deps)
-        if required and n_deps == 0:
-            raise RuleError(f'{relationship} relationship required, not found for node "{node}"')
-        if cardinality == "one_to_one" and n_deps > 1:
-            raise RuleError(f'Expecting only one {relationship}, found {n_deps} for node "{node}"')
-        for dep, dep_params in selected_deps.items():
-            if not match_tags_any(dep_params.get("tags"), require_tags_any):
-                raise RuleError(
-                    f'Expecting all {relationship} relations of "{node}" to have tags {require_tags_any}, '
-                    f'however {relationship} "{dep}" had tags {dep_params["tags"]}'
-                )
-            if require_node_type is not None and dep_params["resource_type"] != require_node_type:
-                raise RuleError(
-                    f'Expecting all {relationship} relations of "{node}" to be of node type "{require_node_type}", '
-                    f'however {relationship} "{dep}" had type "{dep_params["resource_type"]}"'
-                )
+    must = HaveRelationship.from_config(
+        relationship, {k.replace("_", "-"): v for k, v in kwargs.items()}
+    )
+    return _check_must(must, subjects)
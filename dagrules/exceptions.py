@@ -0,0 +1,19 @@
+"""
+dagrules exceptions.
+"""
+
+
+class ParseError(BaseException):
+    "Indicates a dagrules.yml parsing error"
+
+
+class ParserAllowedValueError(ParseError):
+    "Indicates when a non-allowed value is found in a dagrules.yml config file"
+
+
+class ParserRequiredValueError(ParseError):
+    "Indicates when a required value is not found in a dagrules.yml config file"
+
+
+class RuleError(BaseException):
+    "Indicates that a specified dagrules rule was violated"
@@ -0,0 +1,139 @@
+"""
+Machine-readable output of rule check results.
+
+Each writer consumes the `(rule, violations)` pairs yielded by
+`dagrules.parallel.check_rules` and writes them to a stream as each rule finishes, so that
+output starts before the last rule is checked and memory does not grow with the number of
+violations:
+
+* `jsonl` writes a JSON object per line: one per violation, one per rule (after its
+  violations) and a final summary
+* `junit` writes JUnit XML, with a test suite per rule, failing with its violations
+* `sarif` writes a SARIF 2.1.0 log, with a result per violation
+"""
+
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from dagrules.version import __version__
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+
+def write_jsonl(checked, stream, max_violations=None):
+    "Writes check results as JSON lines, returning the number of violations"
+
+    n_rules = n_failed = n_violations = 0
+    for rule, violations in checked:
+        for violation in violations:
+            stream.write(json.dumps({"type": "violation", **violation._asdict()}) + "\n")
+        status = "failed" if violations else "passed"
+        stream.write(
+            json.dumps(
+                {"type": "rule", "rule": rule.name, "status": status, "violations": len(violations)}
+            )
+            + "\n"
+        )
+        stream.flush()
+        n_rules += 1
+        n_failed += bool(violations)
+        n_violations += len(violations)
+
+    summary = {
+        "type": "summary",
+        "rules": n_rules,
+        "failed": n_failed,
+        "violations": n_violations,
+        "stopped": max_violations is not None and n_violations >= max_violations,
+    }
+    stream.write(json.dumps(summary) + "\n")
+    return n_violations
+
+
+def write_junit(checked, stream, max_violations=None):  # pylint: disable=unused-argument
+    "Writes check results as JUnit XML, returning the number of violations"
+
+    n_violations = 0
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites name="dagrules">\n')
+    for rule, violations in checked:
+        name = quoteattr(rule.name)
+        stream.write(
+            f'  <testsuite name={name} tests="1" failures="{int(bool(violations))}">\n'
+            f'    <testcase classname="dagrules" name={name}>\n'
+        )
+        if violations:
+            message = quoteattr(f"{len(violations)} violation(s)")
+            stream.write(f'      <failure message={message} type="RuleError">')
+            for violation in violations:
+                stream.write(escape(violation.detail) + "\n")
+            stream.write("</failure>\n")
+        stream.write("    </testcase>\n  </testsuite>\n")
+        stream.flush()
+        n_violations += len(violations)
+    stream.write("</testsuites>\n")
+    return n_violations
+
+
+def _sarif_result(violation):
+    result = {
+        "ruleId": violation.rule,
+        "level": "error",
+        "message": {"text": violation.detail},
+        "properties": {"must": violation.must},
+    }
+    if violation.node is not None:
+        result["locations"] = [
+            {"logicalLocations": [{"fullyQualifiedName": violation.node, "kind": "dbtNode"}]}
+        ]
+    return result
+
+
+def write_sarif(checked, stream, max_violations=None):  # pylint: disable=unused-argument
+    "Writes check results as a SARIF log, returning the number of violations"
+
+    # The results are written before the tool's rule descriptions, which are only known once
+    # every rule has been checked
+    stream.write(f'{{"$schema": "{SARIF_SCHEMA}", "version": "2.1.0", "runs": [{{"results": [')
+    n_violations = 0
+    rules = []
+    for rule, violations in checked:
+        for violation in violations:
+            separator = ",\n" if n_violations > 0 else "\n"
+            stream.write(separator + json.dumps(_sarif_result(violation)))
+            n_violations += 1
+        rules.append({"id": rule.name, "name": rule.name, "shortDescription": {"text": rule.name}})
+        stream.flush()
+
+    tool = {
+        "driver": {
+            "name": "dagrules",
+            "version": __version__,
+            "informationUri": "https://github.com/gnilrets/dagrules",
+            "rules": rules,
+        }
+    }
+    stream.write(f'\n], "tool": {json.dumps(tool)}}}]}}\n')
+    return n_violations
+
+
+WRITERS = {
+    "jsonl": write_jsonl,
+    "junit": write_junit,
+    "sarif": write_sarif,
+}
+
+
+def write_results(checked, output_format, stream, max_violations=None):
+    """
+    Writes check results in a machine-readable format, returning the number of violations
+
+    Args:
+        checked: `(rule, violations)` pairs, as yielded by `dagrules.parallel.check_rules`
+        output_format (str): One of `WRITERS` (`jsonl`, `junit` or `sarif`)
+        stream: Text stream to write to
+        max_violations (int): The limit checking stopped at, if any
+    """
+
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return WRITERS[output_format](checked, stream, max_violations)
@@ -0,0 +1,153 @@
+"""
+Graph algorithms over the manifest DAG.
+
+`GraphMetrics` runs a single Kahn topological sort over the DAG, and derives per-node
+metrics from it: the longest and shortest path from a root (depth), and the number of
+parents and children (fan-in and fan-out).
+
+`Reachability` computes the transitive closure of the DAG once per run: every node's
+ancestors and descendants are held as bitsets (Python ints, with bit `pos` set for the node
+at position `pos`), built in a single pass in topological order.  Membership tests and
+filtering a node's ancestors down to selected nodes are then single integer operations,
+instead of a graph traversal per subject.
+
+Both are built on first use by the `ManifestIndex`, once per run.
+"""
+
+from collections import deque
+
+
+class GraphCycleError(ValueError):
+    "Indicates that the manifest's parent/child graph is not acyclic"
+
+
+def dependants(index):
+    """
+    Returns the positions of the nodes depending on each node, derived from the parents of
+    each node (`depends_on` in the manifest), which every node has, unlike `child_map`
+    """
+
+    node_dependants = [[] for _ in range(len(index))]
+    for pos in range(len(index)):
+        for parent in index.parents(pos):
+            node_dependants[parent].append(pos)
+    return node_dependants
+
+
+def topological_order(index, node_dependants=None):
+    "Returns the positions of the nodes of `index` in topological order (parents first)"
+
+    if node_dependants is None:
+        node_dependants = dependants(index)
+
+    in_degrees = [0] * len(index)
+    for children in node_dependants:
+        for child in children:
+            in_degrees[child] += 1
+
+    ready = deque(pos for pos, in_degree in enumerate(in_degrees) if in_degree == 0)
+    order = []
+    while ready:
+        pos = ready.popleft()
+        order.append(pos)
+        for child in node_dependants[pos]:
+            in_degrees[child] -= 1
+            if in_degrees[child] == 0:
+                ready.append(child)
+
+    if len(order) != len(index):
+        cycle = [index.node_ids[pos] for pos, in_degree in enumerate(in_degrees) if in_degree > 0]
+        raise GraphCycleError(f"The dbt DAG has a cycle through nodes: {cycle}")
+    return order
+
+
+def iter_bits(bits):
+    "Yields the positions of the bits set in `bits`, in ascending order"
+
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def count_bits(bits):
+    "Returns the number of bits set in `bits`"
+    return bin(bits).count("1")
+
+
+def bitset(positions, size):
+    "Returns a bitset with the bits of `positions` set, for a graph of `size` nodes"
+
+    bits = bytearray((size + 7) // 8)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, "little")
+
+
+class GraphMetrics:  # pylint: disable=too-few-public-methods
+    """
+    Per-node metrics of the DAG of a `ManifestIndex`, from a single topological sort
+
+    * `order` lists the node positions in topological order (parents first)
+    * `dependants[pos]` lists the positions of the nodes depending on `pos`
+    * `depth[pos]` is the length of the longest path from a root (a node without parents)
+    * `min_depth[pos]` is the length of the shortest path from a root
+    * `fan_in[pos]` and `fan_out[pos]` are the numbers of parents and children of `pos`
+
+    Raises a `GraphCycleError` if the graph has a cycle.
+    """
+
+    def __init__(self, index):
+        self.dependants = dependants(index)
+        self.order = topological_order(index, self.dependants)
+        self.fan_in = [len(index.parents(pos)) for pos in range(len(index))]
+        self.fan_out = [len(index.children(pos)) for pos in range(len(index))]
+
+        self.depth = [0] * len(index)
+        self.min_depth = [0] * len(index)
+        for pos in self.order:
+            parents = index.parents(pos)
+            if len(parents) > 0:
+                self.depth[pos] = 1 + max(self.depth[parent] for parent in parents)
+                self.min_depth[pos] = 1 + min(self.min_depth[parent] for parent in parents)
+
+    def metric(self, name):
+        "Returns the per-node values of a metric by its name in dagrules.yml (e.g. `fan-in`)"
+        return getattr(self, name.replace("-", "_"))
+
+
+class Reachability:  # pylint: disable=too-few-public-methods
+    """
+    Ancestor and descendant bitsets of every node in a `ManifestIndex`
+
+    * `ancestors[pos]` has the bits of all nodes `pos` (transitively) depends on
+    * `descendants[pos]` has the bits of all nodes that (transitively) depend on `pos`
+
+    Raises a `GraphCycleError` if the graph has a cycle.
+    """
+
+    def __init__(self, index):
+        metrics = index.metrics
+        order, node_dependants = metrics.order, metrics.dependants
+
+        self.ancestors = [0] * len(index)
+        for pos in order:
+            bits = 0
+            for parent in index.parents(pos):
+                bits |= self.ancestors[parent] | (1 << parent)
+            self.ancestors[pos] = bits
+
+        self.descendants = [0] * len(index)
+        for pos in reversed(order):
+            bits = 0
+            for child in node_dependants[pos]:
+                bits |= self.descendants[child] | (1 << child)
+            self.descendants[pos] = bits
+
+    def related(self, pos, relationship):
+        "Returns the bitset of the `ancestor` or `descendant` relations of the node at `pos`"
+        if relationship == "ancestor":
+            return self.ancestors[pos]
+        if relationship == "descendant":
+            return self.descendants[pos]
+        raise ValueError(f"Unknown transitive relationship: {relationship}")
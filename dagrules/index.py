@@ -0,0 +1,299 @@
+"""
+An index over the dbt manifest that is built once per dagrules run.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from dagrules.columnar import NodeTable
+from dagrules.graph import GraphMetrics, Reachability, iter_bits
+from dagrules.loader import NODE_SECTIONS
+from dagrules.parsers import gc_paused
+from dagrules.records import Node
+from dagrules.tags import TagVocabulary
+
+ADJACENCY_FIELDS = ("parent_offsets", "parent_targets", "child_offsets", "child_targets")
+
+
+class ManifestIndex:  # pylint: disable=too-many-instance-attributes
+    """
+    Interns every dbt node id (of sources, nodes and exposures) to an integer position so
+    that rules can be evaluated without copying the manifest dicts.
+
+    * `node_ids[pos]` is the dbt unique id of the node at position `pos`
+    * `positions[node_id]` is the position of a node id
+    * `nodes[pos]` is the compact `Node` record of the node's attributes (see
+      `dagrules.records`), which also behaves like its slimmed manifest dict
+    * `by_type[resource_type]` lists the positions of all nodes of that resource type
+    * `tag_masks[pos]` is the bitmask of the node's tags, with bits assigned by `tags`
+
+    Parent and child adjacency is held in compressed sparse row form: the parents of the
+    node at `pos` are `parent_targets[parent_offsets[pos]:parent_offsets[pos + 1]]` (and
+    likewise for children).  Edges to nodes that are not in the index are dropped.  The
+    adjacency arrays are int64 `memoryview`s, either over in-memory arrays or over a mapped
+    adjacency file (see `dagrules.adjacency`), so slicing them never copies.
+    """
+
+    def __init__(self, manifest):
+        flat_nodes = {}
+        for section in NODE_SECTIONS:
+            flat_nodes.update(manifest.get(section, {}))
+
+        self.node_ids = list(flat_nodes.keys())
+        self.positions = {node: pos for pos, node in enumerate(self.node_ids)}
+        shared_tags = {}
+        with gc_paused():
+            self.nodes = [
+                Node.from_params(node, params, shared_tags) for node, params in flat_nodes.items()
+            ]
+
+        self.by_type = {}
+        for pos, node in enumerate(self.nodes):
+            self.by_type.setdefault(node.resource_type, []).append(pos)
+
+        self.tags = TagVocabulary()
+        self.tag_masks = [self.tags.add(node.tags or ()) for node in self.nodes]
+
+        self.parent_offsets, self.parent_targets = self._adjacency(
+            (params.get("depends_on") or {}).get("nodes", []) for params in flat_nodes.values()
+        )
+
+        child_map = manifest.get("child_map", {})
+        self.child_offsets, self.child_targets = self._adjacency(
+            child_map.get(node, []) for node in self.node_ids
+        )
+
+        self._table = None
+        self._metrics = None
+        self._reachability = None
+        self._adjacency_source = None
+
+    def _adjacency(self, neighbours):
+        offsets = array("q", [0])
+        targets = array("q")
+        for node_neighbours in neighbours:
+            targets.extend(
+                self.positions[neighbour]
+                for neighbour in node_neighbours
+                if neighbour in self.positions
+            )
+            offsets.append(len(targets))
+        return memoryview(offsets), memoryview(targets)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __getstate__(self):
+        # The columnar table is cheap to rebuild, and depends on whether NumPy is installed
+        state = {
+            **self.__dict__,
+            "_table": None,
+            "_metrics": None,
+            "_reachability": None,
+            "_adjacency_source": None,
+        }
+        for field in ADJACENCY_FIELDS:
+            if state[field] is not None:
+                state[field] = array("q", state[field])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for field in ADJACENCY_FIELDS:
+            if state[field] is not None:
+                setattr(self, field, memoryview(state[field]))
+
+    def without_adjacency(self):
+        "Returns a shallow copy of the index without its adjacency, e.g. to store it separately"
+
+        index = ManifestIndex.__new__(ManifestIndex)
+        index.__dict__.update(self.__dict__)
+        for field in ADJACENCY_FIELDS:
+            setattr(index, field, None)
+        index._table = None  # pylint: disable=protected-access
+        index._metrics = None  # pylint: disable=protected-access
+        index._reachability = None  # pylint: disable=protected-access
+        index._adjacency_source = None  # pylint: disable=protected-access
+        return index
+
+    def attach_adjacency(self, adjacency):
+        """
+        Uses the adjacency arrays of `adjacency` (e.g. a `MappedAdjacency`), which is kept
+        alive for as long as the index uses them
+        """
+
+        if len(adjacency.parent_offsets) != len(self) + 1:
+            raise ValueError("Adjacency does not match the number of indexed nodes")
+        for field in ADJACENCY_FIELDS:
+            setattr(self, field, getattr(adjacency, field))
+        self._metrics = None
+        self._reachability = None
+        self._adjacency_source = adjacency
+
+    @property
+    def table(self):
+        "Columnar `NodeTable` of node attributes, built on first use"
+        if self._table is None:
+            self._table = NodeTable(self)
+        return self._table
+
+    @property
+    def metrics(self):
+        "Depth and degree `GraphMetrics` of every node (see `dagrules.graph`), built on first use"
+        if self._metrics is None:
+            self._metrics = GraphMetrics(self)
+        return self._metrics
+
+    @property
+    def reachability(self):
+        "Ancestor and descendant bitsets of every node (see `dagrules.graph`), built on first use"
+        if self._reachability is None:
+            self._reachability = Reachability(self)
+        return self._reachability
+
+    def of_type(self, resource_type):
+        "Returns the positions of all nodes with the given resource type"
+        return self.by_type.get(resource_type, [])
+
+    def parents(self, pos):
+        "Returns the positions of the parents of the node at `pos`"
+        return self.parent_targets[self.parent_offsets[pos] : self.parent_offsets[pos + 1]]
+
+    def children(self, pos):
+        "Returns the positions of the children of the node at `pos`"
+        return self.child_targets[self.child_offsets[pos] : self.child_offsets[pos + 1]]
+
+    def ancestors(self, pos):
+        "Returns the (ascending) positions of all nodes the node at `pos` transitively depends on"
+        return list(iter_bits(self.reachability.ancestors[pos]))
+
+    def descendants(self, pos):
+        "Returns the (ascending) positions of all nodes that transitively depend on `pos`"
+        return list(iter_bits(self.reachability.descendants[pos]))
+
+    def related(self, pos, relationship):
+        """
+        Returns the positions of the `parent`, `child`, `ancestor` or `descendant` relations of
+        the node at `pos`
+        """
+        if relationship == "parent":
+            return self.parents(pos)
+        if relationship == "child":
+            return self.children(pos)
+        if relationship == "ancestor":
+            return self.ancestors(pos)
+        if relationship == "descendant":
+            return self.descendants(pos)
+        raise ValueError(f"Unknown relationship: {relationship}")
+
+    def view(self, pos):
+        "Returns a read-only view of the node at `pos`"
+        return NodeView(self, pos)
+
+
+class NodeView(Mapping):
+    """
+    Read-only view of an indexed node.
+
+    Behaves like the (slimmed) manifest dict for the node, with the additional keys
+    `children`, `child_params` and `parent_params`.  Neighbours are only resolved when asked for.
+    """
+
+    __slots__ = ("index", "position")
+
+    _DERIVED_KEYS = ("children", "child_params", "parent_params")
+
+    def __init__(self, index, position):
+        self.index = index
+        self.position = position
+
+    @property
+    def params(self):
+        "The `Node` record of the node, which behaves like its (slimmed) manifest dict"
+        return self.index.nodes[self.position]
+
+    @property
+    def tag_mask(self):
+        "Bitmask of the node's tags"
+        return self.index.tag_masks[self.position]
+
+    def __getitem__(self, key):
+        if key == "children":
+            return [self.index.node_ids[child] for child in self.index.children(self.position)]
+        if key == "child_params":
+            return NeighbourView(self.index, self.index.children(self.position))
+        if key == "parent_params":
+            return NeighbourView(self.index, self.index.parents(self.position))
+        return self.params[key]
+
+    def __iter__(self):
+        yield from self.params
+        yield from self._DERIVED_KEYS
+
+    def __len__(self):
+        return len(self.params) + len(self._DERIVED_KEYS)
+
+    def __repr__(self):
+        return f"NodeView({self.index.node_ids[self.position]!r})"
+
+
+class NeighbourView(Mapping):
+    "Read-only mapping of neighbour node ids to their `Node` records"
+
+    __slots__ = ("index", "positions")
+
+    def __init__(self, index, positions):
+        self.index = index
+        self.positions = positions
+
+    def __getitem__(self, key):
+        pos = self.index.positions.get(key)
+        if pos is None or pos not in self.positions:
+            raise KeyError(key)
+        return self.index.nodes[pos]
+
+    def __iter__(self):
+        return (self.index.node_ids[pos] for pos in self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def items(self):
+        return ((self.index.node_ids[pos], self.index.nodes[pos]) for pos in self.positions)
+
+
+class SubjectView(Mapping):
+    """
+    Read-only mapping of the node ids of selected subjects to `NodeView`s of them.
+
+    Only the (ascending) positions of the subjects are held; views are created as they are
+    iterated over or looked up, and their neighbours only resolved when asked for.
+    """
+
+    __slots__ = ("index", "positions")
+
+    def __init__(self, index, positions):
+        self.index = index
+        self.positions = positions
+
+    def __getitem__(self, key):
+        pos = self.index.positions.get(key)
+        if pos is None:
+            raise KeyError(key)
+        idx = bisect_left(self.positions, pos)
+        if idx == len(self.positions) or self.positions[idx] != pos:
+            raise KeyError(key)
+        return NodeView(self.index, pos)
+
+    def __iter__(self):
+        return (self.index.node_ids[pos] for pos in self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def values(self):
+        return (NodeView(self.index, pos) for pos in self.positions)
+
+    def items(self):
+        return ((self.index.node_ids[pos], NodeView(self.index, pos)) for pos in self.positions)
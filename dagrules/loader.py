@@ -0,0 +1,267 @@
+"""
+Streaming loader for the dbt manifest.json file.
+
+dbt manifests are dominated by compiled SQL, docs, macros and column metadata, none of which
+dagrules looks at.  Rather than `json.load`-ing the whole document, the loader walks the
+top level of the manifest incrementally, decodes one node at a time and keeps only the
+fields dagrules uses.  Sections that are not needed at all are skipped without being decoded.
+
+When a faster JSON library is installed, `load_manifest` parses the whole document with it
+instead, and slims it down afterwards (see `dagrules.parsers`).  msgspec decodes the manifest
+straight into its slimmed form, skipping the unused fields as it parses.
+"""
+
+import json
+import re
+import sys
+from functools import lru_cache
+
+from dagrules.parsers import gc_paused, json_parser, typed_manifest_decoder
+
+# Dotted paths of the node fields that dagrules rules can reference
+MANIFEST_FIELDS = (
+    "resource_type",
+    "name",
+    "tags",
+    "package_name",
+    "path",
+    "config.materialized",
+    "depends_on.nodes",
+)
+
+# Top level manifest sections holding nodes
+NODE_SECTIONS = ("sources", "nodes", "exposures")
+
+# Top level manifest sections that are kept whole
+KEPT_SECTIONS = ("child_map",)
+
+# Fields whose (string) values are repeated across many nodes
+_INTERNED_FIELDS = ("resource_type", "package_name")
+
+CHUNK_SIZE = 1 << 20
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_TOKEN = re.compile(r'[\[\]{}]|"([^"\\]*(?:\\.[^"\\]*)*)(")?')
+
+
+class ManifestDecodeError(ValueError):
+    "Indicates that the manifest file is not valid JSON"
+
+
+class _Reader:
+    "Incremental reader over a stream of JSON text"
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+
+    def fill(self):
+        """
+        Discards the consumed part of the buffer and appends more data from the stream (at
+        least doubling the unconsumed part).  Returns false at the end of the stream.
+        """
+
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        chunk = self.stream.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self):
+        "Skips whitespace and returns the next character"
+
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ManifestDecodeError("Unexpected end of manifest")
+
+    def expect(self, char):
+        "Consumes the next (non-whitespace) character, which must be `char`"
+
+        found = self.peek()
+        if found != char:
+            raise ManifestDecodeError(f"Expecting {char!r}, found {found!r}")
+        self.pos += 1
+
+    def decode(self):
+        "Decodes and returns the next JSON value"
+
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as err:
+                if self.fill():
+                    continue
+                raise ManifestDecodeError(str(err)) from err
+
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def skip(self):
+        "Skips over the next JSON value without decoding it"
+
+        if self.peek() not in "{[":
+            self.decode()
+            return
+
+        depth = 0
+        while True:
+            match = _TOKEN.search(self.buffer, self.pos)
+            incomplete = match is None or (match.group(1) is not None and match.group(2) is None)
+            if incomplete:
+                self.pos = len(self.buffer) if match is None else match.start()
+                if not self.fill():
+                    raise ManifestDecodeError("Unexpected end of manifest")
+                continue
+
+            self.pos = match.end()
+            token = match.group()
+            if token in ("{", "["):
+                depth += 1
+            elif token in ("}", "]"):
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def keys(self):
+        """
+        Iterates over the keys of the JSON object at the current position.  After each key is
+        yielded, the caller must consume its value (with `decode`, `skip` or `keys`).
+        """
+
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+@lru_cache(maxsize=None)
+def _field_paths(fields):
+    "Returns `(parents, leaf)` for each dotted path in `fields`"
+    return tuple((tuple(field.split(".")[:-1]), field.split(".")[-1]) for field in fields)
+
+
+def slim_node(params, fields=MANIFEST_FIELDS):
+    """
+    Returns a copy of the manifest dict `params` holding only the dotted paths in `fields`
+    (nested dicts are preserved, e.g. "depends_on.nodes" keeps `{"depends_on": {"nodes": ...}}`)
+    """
+
+    slim = {}
+    for parents, leaf in _field_paths(tuple(fields)):
+        source, target = params, slim
+        for parent in parents:
+            source = source.get(parent)
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(parent, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+
+    for field in _INTERNED_FIELDS:
+        if isinstance(slim.get(field), str):
+            slim[field] = sys.intern(slim[field])
+    if isinstance(slim.get("tags"), list):
+        slim["tags"] = [sys.intern(tag) for tag in slim["tags"]]
+    return slim
+
+
+def read_manifest(stream, fields=MANIFEST_FIELDS, chunk_size=CHUNK_SIZE):
+    """
+    Reads a slimmed manifest from a text stream of manifest.json
+
+    Args:
+        stream: Text stream to read the manifest from
+        fields (list): Dotted paths of the node fields to keep
+        chunk_size (int): Number of characters to read from the stream at a time
+
+    Returns a dict holding the node sections (with each node reduced to `fields`) and the
+    `child_map`.  All other sections are skipped.
+    """
+
+    reader = _Reader(stream, chunk_size)
+
+    manifest = {}
+    for section in reader.keys():
+        if section in NODE_SECTIONS:
+            manifest[section] = {node: slim_node(reader.decode(), fields) for node in reader.keys()}
+        elif section in KEPT_SECTIONS:
+            manifest[section] = reader.decode()
+        else:
+            reader.skip()
+    return manifest
+
+
+def slim_manifest(document, fields=MANIFEST_FIELDS):
+    """
+    Returns the slimmed manifest `read_manifest` would read, given the whole manifest
+    `document` already parsed
+    """
+
+    if not isinstance(document, dict):
+        raise ManifestDecodeError("Expecting the manifest to be a JSON object")
+
+    manifest = {}
+    for section, value in document.items():
+        if section in NODE_SECTIONS:
+            manifest[section] = {node: slim_node(params, fields) for node, params in value.items()}
+        elif section in KEPT_SECTIONS:
+            manifest[section] = value
+    return manifest
+
+
+def load_manifest(path, fields=MANIFEST_FIELDS, chunk_size=CHUNK_SIZE, parser="auto"):
+    """
+    Reads a slimmed manifest from the manifest.json file at `path`, see `read_manifest`
+
+    Args:
+        path (str): Path to manifest.json
+        fields (list): Dotted paths of the node fields to keep
+        chunk_size (int): Number of characters to read at a time (`stdlib` parser only)
+        parser (str): JSON parser to use, see `dagrules.parsers.PARSERS`
+    """
+
+    name, loads, error = json_parser(parser)
+    with gc_paused():
+        if loads is None:
+            with open(path, encoding="utf-8") as manifest_file:
+                return read_manifest(manifest_file, fields=fields, chunk_size=chunk_size)
+
+        with open(path, "rb") as manifest_file:
+            data = manifest_file.read()
+        if name == "msgspec":
+            decode = typed_manifest_decoder(NODE_SECTIONS, KEPT_SECTIONS, tuple(fields))
+            try:
+                return decode(data)
+            except error:
+                # Invalid JSON, or nodes that do not fit the types: decoded generically below
+                pass
+        try:
+            document = loads(data)
+        except error as err:
+            raise ManifestDecodeError(str(err)) from err
+        del data
+        return slim_manifest(document, fields)
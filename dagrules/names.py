@@ -0,0 +1,138 @@
+"""
+Name matching for the `match-name` must.
+
+Patterns are parsed once, when rules are compiled.  A pattern enclosed in slashes (`/.../`)
+is a regular expression that names must fully match.  Any other pattern is a glob (`*`
+matches any characters, `?` a single one): exact names, prefixes (`stg_*`), suffixes
+(`*_snapshot`) and substrings (`*finance*`) are matched with plain string operations, and
+only other globs are translated to a regular expression.
+
+Rules often select the same subjects, so `batch_name_patterns` combines the regular
+expressions of all `match-name` musts sharing a subject selector into a single regular
+expression, with one named group per pattern, so each subject's name is scanned by one
+regex call instead of one per rule.
+"""
+
+import fnmatch
+import re
+import weakref
+
+_REGEX_PATTERN = re.compile("/(.*)/")
+_GLOB_SPECIAL = re.compile(r"[*?\[]")
+
+# Patterns using backreferences (or named groups) change meaning once combined with others
+_UNBATCHABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?[aiLmsux]")
+
+# The batches registered for each index, by pattern
+_BATCHES = weakref.WeakKeyDictionary()
+
+
+def compile_name_pattern(pattern):  # pylint: disable=too-many-return-statements
+    """
+    Returns `(regex, predicate)` for a `match-name` pattern: the compiled regular expression
+    names must fully match (None for globs that do not need one), and a function returning
+    whether a name matches
+    """
+
+    regex_match = _REGEX_PATTERN.fullmatch(pattern)
+    if regex_match is not None:
+        regex = re.compile(regex_match.group(1))
+        return regex, lambda name: regex.fullmatch(name) is not None
+
+    wildcards = _GLOB_SPECIAL.findall(pattern)
+    literal = pattern.strip("*")
+    if len(wildcards) == 0:
+        return None, pattern.__eq__
+    if set(wildcards) == {"*"} and not _GLOB_SPECIAL.search(literal):
+        if pattern == "*" * len(pattern):
+            return None, lambda name: True
+        if pattern.startswith("*") and pattern.endswith("*"):
+            return None, lambda name: literal in name
+        if pattern.endswith("*"):
+            return None, lambda name: name.startswith(literal)
+        if pattern.startswith("*"):
+            return None, lambda name: name.endswith(literal)
+
+    regex = re.compile(fnmatch.translate(pattern))
+    return regex, lambda name: regex.match(name) is not None
+
+
+class PatternBatch:  # pylint: disable=too-few-public-methods
+    """
+    Several regular expressions combined into one, with a lookahead per pattern in a named
+    group, so that a single regex call on a name tells which of the patterns fully match it.
+    The results of a scan are kept for the other patterns, by the positions scanned.
+
+    Args:
+        patterns (list): Regular expression strings (without slashes)
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self.regex = re.compile(
+            "".join(
+                f"(?:(?=(?P<p{idx}>(?:{pattern})\\Z)))?"
+                for idx, pattern in enumerate(self.patterns)
+            )
+        )
+        self.groups = [self.regex.groupindex[f"p{idx}"] for idx in range(len(self.patterns))]
+        self._scans = {}
+
+    def mismatches(self, index, positions, pattern_idx):
+        """
+        Returns the positions (in the order of `positions`) of the nodes whose names do not
+        match the pattern at `pattern_idx`
+        """
+
+        key = tuple(positions)
+        if key not in self._scans:
+            self._scans.clear()
+            mismatches = tuple([] for _ in self.patterns)
+            match, groups, nodes = self.regex.match, self.groups, index.nodes
+            for pos in key:
+                for pattern_mismatches, group in zip(
+                    mismatches, match(nodes[pos].name).group(*groups)
+                ):
+                    if group is None:
+                        pattern_mismatches.append(pos)
+            self._scans[key] = mismatches
+        return self._scans[key][pattern_idx]
+
+
+def batch_name_patterns(index, rules):
+    """
+    Combines the regular expressions of the `match-name` musts of `rules` that share a
+    subject selector, for checking them against `index`
+    """
+
+    by_subject = {}
+    for rule in rules:
+        for must in rule.musts:
+            if must.must_type != "match-name" or must.regex is None:
+                continue
+            pattern = must.regex.pattern
+            patterns = by_subject.setdefault(rule.subject.key, [])
+            if is_batchable(pattern) and pattern not in patterns:
+                patterns.append(pattern)
+
+    batches = {}
+    for patterns in by_subject.values():
+        if len(patterns) < 2:
+            continue
+        try:
+            batch = PatternBatch(patterns)
+        except re.error:
+            continue
+        for pattern_idx, pattern in enumerate(patterns):
+            batches.setdefault(pattern, (batch, pattern_idx))
+    _BATCHES[index] = batches
+
+
+def batched(index, pattern):
+    "Returns the `(batch, pattern_idx)` `pattern` was batched in for `index`, or None"
+    return _BATCHES.get(index, {}).get(pattern)
+
+
+def is_batchable(pattern):
+    "Returns whether a regular expression string can be combined with others"
+    return _UNBATCHABLE.search(pattern) is None
@@ -0,0 +1,287 @@
+"""
+Parallel rule evaluation across a pool of worker processes.
+
+Where the platform supports it, workers are forked after the manifest index and compiled
+rules are set up, so they inherit both (and share the pages of a memory-mapped adjacency)
+instead of each receiving a pickled copy.  Elsewhere, the index and rules are pickled once
+per worker.
+
+Rules with many subjects are split into shards of subject nodes that are checked
+concurrently, so that a single heavy rule also scales with the number of workers.
+"""
+
+import time
+from itertools import islice
+
+from dagrules.names import batch_name_patterns
+from dagrules.planner import fused_violations, plan
+from dagrules.timings import NullTimings, visited
+
+# Rules are only split into shards of at least this many subject nodes
+MIN_SHARD_SIZE = 1000
+
+# The index, compiled rules and selected subjects that workers evaluate
+_WORKER_STATE = {}
+
+
+def _init_worker(index, rules, subjects):
+    _WORKER_STATE.update(index=index, rules=rules, subjects=subjects)
+
+
+def select_subjects(rule, index, positions=None, results=None):
+    """
+    Returns `(subjects, stale, cached)` for a compiled rule: the positions of its subjects,
+    the positions of the subjects that need to be checked, and the violations recorded for
+    the others in the `ResultStore` `results`.  Subjects at `positions` (e.g. the nodes
+    modified since a previous manifest, see `dagrules.state`) are always checked; without
+    `results`, every subject is.
+    """
+
+    subjects = rule.subject.select(index)
+    if results is None:
+        return subjects, subjects, {}
+    return (subjects, *results.partition(rule, index, subjects, positions))
+
+
+def complete_violations(rule, index, selected, violations, limit=None, results=None):
+    """
+    Returns the violations of a compiled rule, given the subjects `selected` by
+    `select_subjects` and the (at most `limit`) `violations` found for the stale ones, and
+    records them in `results` unless they might have been cut short by the limit
+    """
+
+    if results is None:
+        return violations
+
+    subjects, _, cached = selected
+    if limit is None or len(violations) < limit:
+        results.record(rule, index, subjects, cached, violations)
+    return results.merge(rule, index, cached, violations)[:limit]
+
+
+def shard_violations(rule, index, positions, limit=None):
+    """
+    Checks the musts of a compiled rule against some of its subjects, returning a list of (at
+    most `limit`) `(must_idx, violation)` pairs, must by must
+    """
+
+    violations = (
+        (must_idx, violation)
+        for must_idx, must in enumerate(rule.musts)
+        for violation in rule.violations(index, positions, musts=(must,))
+    )
+    return list(islice(violations, limit))
+
+
+def merge_shard_violations(shard_violations_list, limit=None):
+    """
+    Returns the violations a serial check of the rule would have found, given the results of
+    `shard_violations` for each shard of its subjects (in order): must by must, and in subject
+    order for each must.  Violations of the rule as a whole (without a node) are only reported
+    once.
+    """
+
+    merged = sorted(
+        (item for violations in shard_violations_list for item in violations),
+        key=lambda item: item[0],
+    )
+    seen_rule_level = set()
+    violations = []
+    for must_idx, violation in merged:
+        if violation.node is None:
+            if must_idx in seen_rule_level:
+                continue
+            seen_rule_level.add(must_idx)
+        violations.append(violation)
+    return violations[:limit]
+
+
+def shard_bounds(n_subjects, jobs, min_shard_size=MIN_SHARD_SIZE):
+    "Returns the `(start, stop)` bounds of the shards to split `n_subjects` subjects into"
+
+    n_shards = max(1, min(jobs, n_subjects // min_shard_size))
+    bounds = [n_subjects * shard // n_shards for shard in range(n_shards + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _select_all(index, rules, positions, results, timings):
+    "Returns the subjects `select_subjects` selects for each of the compiled rules"
+
+    selected = []
+    for rule in rules:
+        with timings.rule(rule.name), timings.phase("select"):
+            selected.append(select_subjects(rule, index, positions, results))
+    return selected
+
+
+def _check_shard(task):
+    rule_idx, start, stop, limit = task
+    started = time.perf_counter()
+    violations = shard_violations(
+        _WORKER_STATE["rules"][rule_idx],
+        _WORKER_STATE["index"],
+        _WORKER_STATE["subjects"][rule_idx][start:stop],
+        limit,
+    )
+    return violations, time.perf_counter() - started
+
+
+def _check_fused(index, rules, positions, results, timings):  # pylint: disable=too-many-locals
+    """
+    Checks rules serially, evaluating the rules that share their subjects in a single pass
+    (see `dagrules.planner`), and yields `(rule, violations)` pairs in rule order
+    """
+
+    selected = _select_all(index, rules, positions, results, timings)
+    groups = {}
+    for group in plan([stale for _, stale, _ in selected]):
+        groups.update((rule_idx, group) for rule_idx in group)
+
+    checked = {}
+    for rule_idx, rule in enumerate(rules):
+        if rule_idx not in checked:
+            group, stale = groups[rule_idx], selected[rule_idx][1]
+            with timings.phase("evaluate"):
+                started = time.perf_counter()
+                if stale or results is None:
+                    group_violations = fused_violations(index, [rules[idx] for idx in group], stale)
+                else:
+                    # The recorded results of every subject are reused
+                    group_violations = [[] for _ in group]
+                for idx, violations in zip(group, group_violations):
+                    checked[idx] = complete_violations(
+                        rules[idx], index, selected[idx], violations, results=results
+                    )
+                # The rules of a group share the time of their pass evenly
+                seconds = (time.perf_counter() - started) / len(group)
+                counts = [timings.visit(index, rules[idx], stale) for idx in group]
+            for idx, (nodes, edges) in zip(group, counts):
+                timings.add("rule", rules[idx].name, seconds, nodes, edges)
+        yield rule, checked.pop(rule_idx)
+
+
+def _pool(jobs, index, rules, subjects):
+    import multiprocessing  # pylint: disable=import-outside-toplevel
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        _init_worker(index, rules, subjects)
+        return multiprocessing.get_context("fork").Pool(jobs)
+    return multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(index, rules, subjects))
+
+
+def _check_serial(index, rules, remaining, positions, results, timings):
+    "Checks `rules` one after the other, stopping once `remaining` violations have been found"
+
+    for rule in rules:
+        with timings.rule(rule.name):
+            with timings.phase("select"):
+                selected = select_subjects(rule, index, positions, results)
+            with timings.phase("evaluate"):
+                violations = []
+                if selected[1] or results is None:
+                    violations = list(islice(rule.violations(index, selected[1]), remaining))
+                violations = complete_violations(
+                    rule, index, selected, violations, remaining, results
+                )
+                timings.visit(index, rule, selected[1])
+        yield rule, violations
+        if remaining is not None:
+            remaining -= len(violations)
+            if remaining <= 0:
+                return
+
+
+def check_rules(  # pylint: disable=too-many-arguments,too-many-locals,too-many-branches
+    index,
+    rules,
+    jobs=1,
+    min_shard_size=MIN_SHARD_SIZE,
+    max_violations=None,
+    positions=None,
+    results=None,
+    timings=None,
+):
+    """
+    Checks compiled rules against a manifest index, yielding `(rule, violations)` pairs in
+    rule order as soon as each rule has been checked, where `violations` is a list of the
+    rule's `Violation`s (empty when it passes).  Without a violation limit, serial checks
+    evaluate the rules that share their subjects together, in a single pass over them.
+
+    Args:
+        index (ManifestIndex): Index of the manifest to check
+        rules (list): Compiled rules to check
+        jobs (int): Number of worker processes to check rules in (1 checks them serially)
+        min_shard_size (int): Rules with at least twice this many subjects are split into
+            shards checked concurrently
+        max_violations (int): Stop checking once this many violations have been found in
+            total; rules after the one that reached the limit are not yielded
+        positions: Positions of the nodes modified since the previous run (e.g. since a
+            previous manifest, see `dagrules.state`), whose recorded results are not reused
+        results (ResultStore): Rule results of previous runs; subjects whose inputs are
+            unchanged are not checked again, and the results of this run are recorded
+        timings (Timings): Records the time spent selecting the subjects of and evaluating
+            each rule (see `dagrules.timings`)
+    """
+
+    rules = tuple(rules)
+    remaining = max_violations
+    if positions is not None:
+        positions = frozenset(positions)
+    if timings is None:
+        timings = NullTimings()
+    with timings.phase("select"):
+        batch_name_patterns(index, rules)
+
+    if jobs <= 1 and remaining is None:
+        yield from _check_fused(index, rules, positions, results, timings)
+        return
+
+    if jobs <= 1 or len(rules) == 0:
+        yield from _check_serial(index, rules, remaining, positions, results, timings)
+        return
+
+    # Subjects are selected up front (which also builds the columnar table), and the graph
+    # metrics and reachability the musts read are built, so that forked workers inherit them
+    selected = _select_all(index, rules, positions, results, timings)
+    for rule in rules:
+        with timings.rule(rule.name), timings.phase("evaluate"):
+            for must in rule.musts:
+                must.prepare(index)
+    subjects = [stale for _, stale, _ in selected]
+    tasks = [
+        (rule_idx, start, stop, max_violations)
+        for rule_idx, stale in enumerate(subjects)
+        for start, stop in shard_bounds(len(stale), jobs, min_shard_size)
+    ]
+
+    pool = _pool(min(jobs, len(tasks)), index, rules, subjects)
+    try:
+        shard_violations_iter = pool.imap(_check_shard, tasks)
+        shard_results = {rule_idx: [] for rule_idx in range(len(rules))}
+        shard_seconds = [0.0] * len(rules)
+        for (rule_idx, _, stop, _), (violations, seconds) in zip(tasks, shard_violations_iter):
+            shard_results[rule_idx].append(violations)
+            shard_seconds[rule_idx] += seconds
+            if stop == len(subjects[rule_idx]):
+                rule = rules[rule_idx]
+                if timings.enabled:
+                    nodes, edges = visited(index, rule, subjects[rule_idx])
+                    timings.add("phase", "evaluate", shard_seconds[rule_idx], nodes, edges)
+                    timings.add("rule", rule.name, shard_seconds[rule_idx], nodes, edges)
+                violations = complete_violations(
+                    rule,
+                    index,
+                    selected[rule_idx],
+                    merge_shard_violations(shard_results.pop(rule_idx), remaining),
+                    remaining,
+                    results,
+                )
+                yield rule, violations
+                if remaining is not None:
+                    remaining -= len(violations)
+                    if remaining <= 0:
+                        return
+    finally:
+        pool.terminate()
+        pool.join()
+        _WORKER_STATE.clear()
@@ -0,0 +1,168 @@
+"""
+Pluggable parsers for manifest.json and dagrules.yml.
+
+By default (`auto`), manifest.json is decoded with msgspec when it is installed, and
+dagrules.yml with libyaml (`yaml.CSafeLoader`) when PyYAML was built with it.  Without them,
+or with the `stdlib` parser, the manifest is read by the streaming loader of
+`dagrules.loader`, which only holds one node in memory at a time, and dagrules.yml by the
+pure-Python `yaml.SafeLoader`.
+
+msgspec decodes the manifest into typed dicts, skipping the fields dagrules does not read
+while parsing.  orjson and pysimdjson parse the whole manifest at once, so they need as much
+memory as the full document takes as Python objects (several times the streaming loader's on
+large manifests), without being much faster: they are only used when `--parser` names them.
+"""
+
+import gc
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, TypedDict
+
+
+def _msgspec():
+    # pylint: disable=import-outside-toplevel,import-error
+    import msgspec
+    import msgspec.json
+
+    return msgspec.json.decode, msgspec.DecodeError
+
+
+def _orjson():
+    import orjson  # pylint: disable=import-outside-toplevel
+
+    return orjson.loads, orjson.JSONDecodeError  # pylint: disable=no-member
+
+
+def _simdjson():
+    import simdjson  # pylint: disable=import-outside-toplevel,import-error
+
+    return simdjson.loads, ValueError
+
+
+# Importers of the fast JSON parsers, returning `(loads, error)`: a function parsing JSON
+# bytes, and the exception it raises on invalid JSON
+JSON_PARSERS = {
+    "msgspec": _msgspec,
+    "orjson": _orjson,
+    "simdjson": _simdjson,
+}
+
+# Parser names accepted by `--parser`
+PARSERS = ("auto", *JSON_PARSERS, "stdlib")
+
+# The JSON parser `auto` uses when it is installed, instead of the streaming loader
+AUTO_JSON_PARSER = "msgspec"
+
+
+def json_parser(parser="auto"):
+    """
+    Returns `(name, loads, error)` for the JSON parser to read manifests with: its name,
+    and the function and exception of `JSON_PARSERS` (both None for the `stdlib` streaming
+    loader)
+
+    Args:
+        parser (str): One of `PARSERS`; `auto` picks `AUTO_JSON_PARSER` if it is installed
+    """
+
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser: {parser}")
+    if parser == "stdlib":
+        return "stdlib", None, None
+
+    for name in (AUTO_JSON_PARSER,) if parser == "auto" else (parser,):
+        try:
+            loads, error = JSON_PARSERS[name]()
+        except ImportError:
+            if parser == name:
+                raise ImportError(f"The {name} parser requires {name} to be installed") from None
+            continue
+        return name, loads, error
+    return "stdlib", None, None
+
+
+@lru_cache(maxsize=None)
+def typed_manifest_decoder(node_sections, kept_sections, fields):
+    """
+    Returns a function decoding manifest.json bytes straight into a slimmed manifest (see
+    `dagrules.loader.slim_manifest`) with msgspec, which skips every other section and node
+    field while parsing, or None if msgspec is not installed.  The function raises
+    `msgspec.DecodeError` for invalid JSON, and for nodes it cannot type (e.g. whose `config`
+    is not an object).
+
+    Args:
+        node_sections (tuple): Top level sections holding nodes
+        kept_sections (tuple): Top level sections kept whole
+        fields (tuple): Dotted paths of the node fields to keep
+    """
+
+    try:
+        import msgspec  # pylint: disable=import-outside-toplevel,import-error
+        import msgspec.json  # pylint: disable=import-outside-toplevel,import-error
+    except ImportError:
+        return None
+
+    tree = {}
+    for field in fields:
+        *parents, leaf = field.split(".")
+        branch = tree
+        for parent in parents:
+            branch = branch.setdefault(parent, {})
+        branch[leaf] = None
+
+    def typed_dict(name, branch):
+        return TypedDict(  # pylint: disable=invalid-name
+            name,
+            {
+                key: Any if value is None else typed_dict(f"{name}_{key}", value)
+                for key, value in branch.items()
+            },
+            total=False,
+        )
+
+    node = typed_dict("Node", tree)
+    manifest = TypedDict(
+        "Manifest",
+        {
+            **{section: Dict[str, node] for section in node_sections},
+            **{section: Any for section in kept_sections},
+        },
+        total=False,
+    )
+    return msgspec.json.Decoder(manifest).decode
+
+
+def yaml_loader(parser="auto"):
+    "Returns the PyYAML loader class to read dagrules.yml with (see `PARSERS`)"
+
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser: {parser}")
+    if parser == "stdlib":
+        return yaml.SafeLoader
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(stream, parser="auto"):
+    "Parses the YAML document in `stream`, as `yaml.safe_load` would (see `yaml_loader`)"
+
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    return yaml.load(stream, Loader=yaml_loader(parser))
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pauses the cyclic garbage collector while parsing: parsed documents hold no reference
+    cycles, yet the many containers they allocate would trigger collection after collection
+    of everything allocated so far
+    """
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,67 @@
+"""
+Execution planning: fusing the rules that check the same subjects into a single pass.
+
+Rules often share a subject selector, and so check the same nodes.  `plan` groups such rules,
+and `fused_violations` evaluates every must of every rule in a group on one node before moving
+on to the next, fetching the node's parents and children once for all of the musts that read
+them, instead of looping over the subjects once per must and rule.  Violations are gathered
+per must, so that each rule's violations are still returned in the order `Rule.violations`
+yields them: must by must, and in subject order for each must.
+"""
+
+from dagrules.rules import Violation
+
+
+def plan(subjects):
+    """
+    Returns the groups of rules to evaluate together, as lists of rule indices (in rule
+    order), given the positions of the subjects each rule is checked against
+    """
+
+    groups = {}
+    for rule_idx, positions in enumerate(subjects):
+        groups.setdefault(tuple(positions), []).append(rule_idx)
+    return list(groups.values())
+
+
+def fused_violations(index, rules, positions):  # pylint: disable=too-many-locals
+    """
+    Checks compiled rules against the nodes at `positions` in `index` in a single pass over
+    the nodes, returning a list of the `Violation`s of each rule
+
+    Args:
+        index (ManifestIndex): Index of the manifest to check
+        rules (list): Compiled rules that are all checked against `positions`
+        positions: Positions of the subject nodes
+    """
+
+    checks = []
+    rule_buckets = []
+    for rule in rules:
+        buckets = []
+        for must in rule.musts:
+            bucket = []
+            check = must.checker(index, positions)
+            if check is None:
+                bucket.extend(
+                    Violation(rule.name, node, must.must_type, detail)
+                    for node, detail in must.violations(index, positions)
+                )
+            else:
+                checks.append((check, bucket.append, rule.name, must.must_type))
+            buckets.append(bucket)
+        rule_buckets.append(buckets)
+
+    relationships = {rel for rule in rules for rel in rule.relationships}
+    parents = index.parents if "parent" in relationships else lambda pos: None
+    children = index.children if "child" in relationships else lambda pos: None
+    node_ids = index.node_ids
+
+    if checks:
+        for pos in positions:
+            node_parents, node_children = parents(pos), children(pos)
+            for check, add, rule_name, must_type in checks:
+                for detail in check(pos, node_parents, node_children):
+                    add(Violation(rule_name, node_ids[pos], must_type, detail))
+
+    return [[violation for bucket in buckets for violation in bucket] for buckets in rule_buckets]
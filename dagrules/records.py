@@ -0,0 +1,122 @@
+"""
+Compact records of the dbt nodes held by a `ManifestIndex`.
+
+Manifest dicts carry many keys dagrules never reads, and nested `config` and `depends_on`
+dicts.  The index keeps a `Node` record per node instead: a `__slots__` object holding only
+the attributes rules read, with its repeated strings interned and its tags in a tuple shared
+by every node tagged alike.  Edges are not part of the records; the index holds them as
+integer positions (see `ManifestIndex`).
+
+Records still behave like the slimmed manifest dict of their node (see
+`dagrules.loader.slim_node`), for code written against manifest dicts:
+`node["name"]`, `node.get("tags")` or `node.get("config", {}).get("materialized")`.
+"""
+
+import sys
+from collections.abc import Mapping
+
+# The record attributes that are read as the manifest keys of the same name
+_MANIFEST_KEYS = ("resource_type", "name", "tags", "package_name", "path")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Node(Mapping):
+    """
+    Record of the attributes of a dbt node that dagrules rules read.  Attributes missing
+    from the manifest are None.
+
+    Args:
+        unique_id (str): dbt unique id of the node
+        resource_type (str): Resource type (`model`, `source`, `snapshot`...)
+        name (str): Name of the node
+        tags (tuple): Tags of the node
+        package_name (str): Name of the dbt package the node belongs to
+        path (str): Path of the node's file, relative to its package
+        materialized (str): Materialization, from the node's config
+    """
+
+    __slots__ = ("unique_id", *_MANIFEST_KEYS, "materialized")
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        unique_id,
+        resource_type=None,
+        name=None,
+        tags=None,
+        package_name=None,
+        path=None,
+        materialized=None,
+    ):
+        self.unique_id = unique_id
+        self.resource_type = resource_type
+        self.name = name
+        self.tags = tags
+        self.package_name = package_name
+        self.path = path
+        self.materialized = materialized
+
+    @classmethod
+    def from_params(cls, unique_id, params, shared_tags=None):
+        """
+        Returns the record of a node, given its manifest dict
+
+        Args:
+            unique_id (str): dbt unique id of the node
+            params (dict): Manifest dict of the node (whole or slimmed)
+            shared_tags (dict): Tag tuples already in use, to share equal ones between records
+        """
+
+        tags = params.get("tags")
+        if tags is not None:
+            tags = tuple(map(sys.intern, tags))
+            if shared_tags is not None:
+                tags = shared_tags.setdefault(tags, tags)
+        config = params.get("config")
+        return cls(
+            unique_id,
+            _intern(params.get("resource_type")),
+            params.get("name"),
+            tags,
+            _intern(params.get("package_name")),
+            params.get("path"),
+            _intern(config.get("materialized")) if isinstance(config, dict) else None,
+        )
+
+    def __reduce__(self):
+        return (
+            Node,
+            (
+                self.unique_id,
+                self.resource_type,
+                self.name,
+                self.tags,
+                self.package_name,
+                self.path,
+                self.materialized,
+            ),
+        )
+
+    def __getitem__(self, key):
+        if key == "config" and self.materialized is not None:
+            return {"materialized": self.materialized}
+        if key in _MANIFEST_KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                return list(value) if key == "tags" else value
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key in _MANIFEST_KEYS:
+            if getattr(self, key) is not None:
+                yield key
+        if self.materialized is not None:
+            yield "config"
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Node({self.unique_id!r})"
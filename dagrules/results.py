@@ -0,0 +1,337 @@
+"""
+Persistent cache of rule results.
+
+For every compiled rule and subject node, the store records a hash of the inputs the rule
+read for that node (the node's own attributes, plus those of its parents and/or children
+for rules with relationship musts) together with the violations found.  On the next run,
+subjects whose input hash is unchanged reuse their recorded violations, and only the others
+are checked.  Rules are keyed on a fingerprint of the compiled rule, so editing dagrules.yml
+only re-runs the edited rules.
+
+Input hashes are computed once per index for each node and set of relationships rules read,
+and shared by all the rules reading the same relationships.  The store also records a hash
+of the whole manifest index, so that re-running rules on an unchanged manifest reuses all of
+their results without hashing each subject.  When the nodes modified since the previous
+manifest are known (see `dagrules.state`), the other subjects reuse their recorded results
+and input hashes without being hashed either.
+"""
+
+import hashlib
+import os
+import pickle
+import weakref
+from operator import itemgetter
+
+from dagrules.cache import _write_atomic, default_cache_dir
+from dagrules.graph import GraphCycleError
+from dagrules.index import ADJACENCY_FIELDS
+from dagrules.rules import TRANSITIVE_RELATIONSHIPS, Violation
+from dagrules.state import node_state
+from dagrules.version import __version__
+
+RESULTS_FILE = "results.pickle"
+RESULTS_FORMAT = 2
+
+# Size of the input hashes, in bytes
+HASH_SIZE = 16
+
+
+def rule_fingerprint(rule):
+    "Returns a hex digest identifying the compiled rule (and the dagrules version checking it)"
+    return hashlib.sha256(f"{__version__}:{rule!r}".encode("utf-8")).hexdigest()
+
+
+# Per-node keys and hashes of an index, per index and key (see `_memoized`)
+_HASHES = weakref.WeakKeyDictionary()
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=HASH_SIZE).digest()
+
+
+def _memoized(index, key, compute):
+    per_index = _HASHES.setdefault(index, {})
+    if key not in per_index:
+        per_index[key] = compute(index)
+    return per_index[key]
+
+
+def node_keys(index):
+    "Returns the id and attributes (see `node_state`) of every node in `index`, as bytes"
+
+    def compute(index):
+        return [
+            "\x1f".join(
+                (node, resource_type or "", name or "", "\x1c".join(tags), package or "", mat or "")
+            ).encode("utf-8")
+            for node, (resource_type, name, tags, package, mat) in zip(
+                index.node_ids, map(node_state, index.nodes)
+            )
+        ]
+
+    return _memoized(index, "keys", compute)
+
+
+def index_fingerprint(index):
+    "Returns a hash of the ids, attributes and edges of all the nodes in `index`"
+
+    def compute(index):
+        digest = hashlib.blake2b(b"\x1e".join(node_keys(index)), digest_size=HASH_SIZE)
+        for field in ADJACENCY_FIELDS:
+            digest.update(getattr(index, field))
+        return digest.digest()
+
+    return _memoized(index, "index", compute)
+
+
+def closure_hashes(index, relationship):
+    """
+    Returns a hash of the `ancestor` or `descendant` relations of every node in `index`
+    (their ids, attributes and edges).  The hashes are chained along the DAG, so that the
+    hash of a node's ancestors is built from the hashes of its parents' ancestors.
+    """
+
+    def compute(index):
+        order = index.metrics.order
+        if relationship == "ancestor":
+            related = index.parents
+        else:
+            order = reversed(order)
+            related = index.metrics.dependants.__getitem__
+
+        keys = node_keys(index)
+        hashes = [None] * len(index)
+        for pos in order:
+            hashes[pos] = _digest(
+                b"\x1e".join([keys[dep] + b"\x1d" + hashes[dep] for dep in related(pos)])
+            )
+        return hashes
+
+    return _memoized(index, relationship, compute)
+
+
+def input_hashes(index, relationships, positions):
+    """
+    Returns the list of the hashes of the inputs that rules reading `relationships` (see
+    `Rule.relationships`) read when checking each node in `index`, with those of the nodes at
+    `positions` filled in.  Each hash is computed once per index, and shared by every rule
+    reading the same relationships.
+    """
+
+    hashes = _memoized(index, tuple(relationships), lambda index: [None] * len(index))
+    missing = [pos for pos in positions if hashes[pos] is None]
+    if not missing:
+        return hashes
+
+    keys = node_keys(index)
+    related = []
+    for relationship in relationships:
+        if relationship in TRANSITIVE_RELATIONSHIPS:
+            related.append(closure_hashes(index, relationship).__getitem__)
+        else:
+            neighbours = index.parents if relationship == "parent" else index.children
+            related.append(
+                lambda pos, neighbours=neighbours: b"\x1e".join(
+                    [keys[dep] for dep in neighbours(pos)]
+                )
+            )
+
+    for pos in missing:
+        hashes[pos] = _digest(b"\x1d".join([keys[pos], *(inputs(pos) for inputs in related)]))
+    return hashes
+
+
+def input_hash(rule, index, pos):
+    "Returns a hash of the inputs `rule` reads when checking the node at `pos` in `index`"
+    return input_hashes(index, rule.relationships, (pos,))[pos]
+
+
+class ResultStore:
+    """
+    Rule results recorded by previous runs, read from and saved to a pickle file
+
+    Args:
+        path (str): Path of the results file (None to only keep results in memory)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rules = {} if path is None else self._load()
+        self._updated = False
+
+    @classmethod
+    def for_manifest(cls, manifest_path):
+        "Returns the store kept in the default cache directory of a manifest"
+        return cls(os.path.join(default_cache_dir(manifest_path), RESULTS_FILE))
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as results_file:
+                stored = pickle.load(results_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return {}
+
+        if not isinstance(stored, dict) or stored.get("format") != RESULTS_FORMAT:
+            return {}
+        return stored["rules"]
+
+    def recorded_for(self, rules, index):
+        "Returns whether the results of all of `rules` were recorded for the manifest `index`"
+
+        entries = [self.rules.get(rule_fingerprint(rule)) for rule in rules]
+        return all(entry is not None for entry in entries) and all(
+            entry[0] == index_fingerprint(index) for entry in entries
+        )
+
+    def partition(self, rule, index, subjects, modified=None):  # pylint: disable=too-many-locals
+        """
+        Splits the subject positions of `rule` into those that need to be checked and those
+        whose recorded results are still valid: those whose inputs hash the same as when their
+        results were recorded.  When the positions of the nodes `modified` since the manifest
+        the results were recorded for are given (even empty), only their subjects are hashed,
+        and the recorded hashes of the others are reused.
+
+        Returns `(stale, cached)`, where `stale` lists the positions to check and `cached` maps
+        the other positions with recorded violations to their `(must_idx, detail)` pairs.
+        When no subject needs to be checked, `cached` also maps None to the recorded
+        violations of the rule as a whole (e.g. a cycle in the graph).
+        """
+
+        entry = self.rules.get(rule_fingerprint(rule))
+        if entry is None:
+            return list(subjects), {}
+
+        recorded_index, recorded_nodes, recorded_hashes, recorded_violations = entry
+        if recorded_index == index_fingerprint(index):
+            # Re-running on the same manifest: the subjects and their inputs are the same too
+            cached = {
+                index.positions[node]: node_violations
+                for node, node_violations in recorded_violations.items()
+                if node is not None
+            }
+            cached[None] = recorded_violations.get(None, ())
+            return [], cached
+
+        hashed = subjects if modified is None else [pos for pos in subjects if pos in modified]
+        try:
+            hashes = input_hashes(index, rule.relationships, hashed)
+        except GraphCycleError:
+            # Transitive relations cannot be hashed, and checking the rule reports the cycle
+            return list(subjects), {}
+
+        offsets = {node: offset for offset, node in enumerate(recorded_nodes)}
+        stale, cached = [], {}
+        for pos in subjects:
+            node = index.node_ids[pos]
+            offset = offsets.get(node)
+            if offset is None:
+                stale.append(pos)
+                continue
+            recorded_hash = recorded_hashes[offset * HASH_SIZE : (offset + 1) * HASH_SIZE]
+            if hashes[pos] is None:
+                # Unmodified: also reused by `record`, and by the rules reading the same inputs
+                hashes[pos] = recorded_hash
+            elif hashes[pos] != recorded_hash:
+                stale.append(pos)
+                continue
+            if node in recorded_violations:
+                cached[pos] = recorded_violations[node]
+        if not stale:
+            cached[None] = recorded_violations.get(None, ())
+        return stale, cached
+
+    @staticmethod
+    def merge(rule, index, cached, violations):
+        """
+        Merges recorded violations of the `cached` subjects with the `violations` found for
+        the stale ones, in the order a full check of the rule would have found them
+        """
+
+        must_indexes = {must.must_type: must_idx for must_idx, must in enumerate(rule.musts)}
+        keyed = [
+            ((must_indexes[violation.must], index.positions.get(violation.node, -1)), violation)
+            for violation in violations
+        ]
+        if any(violation.node is None for violation in violations):
+            # Violations of the rule as a whole were found again
+            cached = {pos: recorded for pos, recorded in cached.items() if pos is not None}
+        keyed.extend(
+            (
+                (must_idx, -1 if pos is None else pos),
+                Violation(
+                    rule.name,
+                    None if pos is None else index.node_ids[pos],
+                    rule.musts[must_idx].must_type,
+                    detail,
+                ),
+            )
+            for pos, recorded in cached.items()
+            for must_idx, detail in recorded
+        )
+        keyed.sort(key=itemgetter(0))
+        return [violation for _, violation in keyed]
+
+    def record(self, rule, index, subjects, cached, violations):
+        """
+        Records the results of checking `rule`: the `cached` results of the subjects that were
+        not checked, and the complete `violations` found for the others.  Nothing is recorded
+        when no subject was checked on the manifest the results were recorded for.
+        """
+
+        fingerprint = rule_fingerprint(rule)
+        entry = self.rules.get(fingerprint)
+        if None in cached and entry is not None and entry[0] == index_fingerprint(index):
+            return
+        try:
+            hashes = input_hashes(index, rule.relationships, subjects)
+        except GraphCycleError:
+            return
+
+        # Violations of the rule as a whole are recorded for the node None
+        must_indexes = {must.must_type: must_idx for must_idx, must in enumerate(rule.musts)}
+        recorded = {}
+        for violation in violations:
+            recorded.setdefault(violation.node, []).append(
+                (must_indexes[violation.must], violation.detail)
+            )
+        recorded = {node: tuple(node_violations) for node, node_violations in recorded.items()}
+        recorded.update(
+            (index.node_ids[pos], node_violations)
+            for pos, node_violations in cached.items()
+            if pos is not None
+        )
+
+        self.rules[fingerprint] = (
+            index_fingerprint(index),
+            tuple(index.node_ids[pos] for pos in subjects),
+            b"".join([hashes[pos] for pos in subjects]),
+            recorded,
+        )
+        self._updated = True
+
+    def save(self, rules):
+        "Saves the recorded results, dropping those of rules not in `rules`"
+
+        fingerprints = {rule_fingerprint(rule) for rule in rules}
+        self.rules = {
+            fingerprint: entries
+            for fingerprint, entries in self.rules.items()
+            if fingerprint in fingerprints
+        }
+        if self.path is None or not self._updated:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            _write_atomic(
+                self.path,
+                lambda results_file: pickle.dump(
+                    {"format": RESULTS_FORMAT, "rules": self.rules},
+                    results_file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                ),
+            )
+        except OSError:
+            # Like the manifest cache, the results are only an optimization
+            return
+        self._updated = False
@@ -0,0 +1,618 @@
+"""
+Compiled dagrules rules.
+
+`compile_rules` turns a validated dagrules.yml configuration into immutable rule objects,
+with regular expressions and tag matchers compiled once.  Checking a manifest then only
+runs the compiled objects against a `ManifestIndex`.  Compiled rules can be pickled, so a
+compiled ruleset can be cached or handed to other processes.
+"""
+
+import re
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from functools import partial
+
+from dagrules.columnar import selection_key
+from dagrules.exceptions import ParserAllowedValueError, RuleError
+from dagrules.names import batched, compile_name_pattern
+from dagrules.graph import GraphCycleError, bitset, count_bits, iter_bits
+from dagrules.tags import TagMatcher
+
+RELATIONSHIP_ARGUMENTS = (
+    "cardinality",
+    "required",
+    "select-node-type",
+    "require-node-type",
+    "select-tags-any",
+    "require-tags-any",
+)
+
+# Relationships to immediate neighbours, and to all transitively related nodes
+DIRECT_RELATIONSHIPS = ("child", "parent")
+TRANSITIVE_RELATIONSHIPS = ("ancestor", "descendant")
+
+
+Violation = namedtuple("Violation", ["rule", "node", "must", "detail"])
+Violation.__doc__ = """
+A single rule violation
+
+Args:
+    rule (str): Name of the violated rule
+    node (str): Unique id of the violating node
+    must (str): Name of the violated must in dagrules.yml (e.g. "match-name")
+    detail (str): Description of the violation
+"""
+
+
+class Compiled:
+    """
+    Base class of the immutable compiled objects.  Subclasses assign each of their
+    attributes once, in `__init__`, and list their constructor arguments in `_fields`, which
+    is how they are pickled.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"{type(self).__name__} objects are immutable")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} objects are immutable")
+
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, field) for field in self._fields))
+
+    def __repr__(self):
+        args = ", ".join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({args})"
+
+
+class Subject(Compiled):
+    """
+    Compiled subject selector
+
+    Args:
+        node_type (str): Resource type of the nodes to select
+        tags (str, list, dict, TagMatcher): Tag selector the nodes must match
+        package (str, list): Package name(s) the nodes must belong to
+        materialized (str, list): Materialization(s) the nodes must have
+    """
+
+    __slots__ = ("node_type", "tags", "package", "materialized")
+    _fields = __slots__
+
+    def __init__(self, node_type="model", tags=None, package=None, materialized=None):
+        self.node_type = node_type
+        self.tags = TagMatcher.compile(tags)
+        self.package = package
+        self.materialized = materialized
+
+    @classmethod
+    def from_config(cls, config):
+        "Compiles the `subject` section of a rule"
+
+        return cls(
+            node_type=config.get("type", "model"),
+            tags=config.get("tags"),
+            package=config.get("package"),
+            materialized=config.get("materialized"),
+        )
+
+    @property
+    def key(self):
+        "Canonical, hashable form of the selector (see `dagrules.columnar.selection_key`)"
+        return selection_key(self.node_type, self.tags, self.package, self.materialized)
+
+    def select(self, index):
+        "Returns the positions of the subject nodes in `index`"
+        return index.table.select(self.node_type, self.tags, self.package, self.materialized)
+
+
+class Must(Compiled, ABC):
+    "Base class of compiled musts; `must_type` is the name of the must in dagrules.yml"
+
+    __slots__ = ()
+    must_type = None
+
+    # The relationships whose nodes the must reads: `parent`, `child`, `ancestor` and/or
+    # `descendant`
+    relationships = ()
+
+    @abstractmethod
+    def violations(self, index, positions):
+        """
+        Yields a `(node_id, detail)` pair for every violation of the must by the nodes at
+        `positions` in `index`
+        """
+
+    def prepare(self, index):
+        """
+        Builds the structures of `index` that are built on first use and read by the must, e.g.
+        before forking workers, so that they inherit them instead of each building them
+        """
+
+    def checker(self, index, positions):  # pylint: disable=unused-argument
+        """
+        Returns a function `check(pos, parents, children)` returning the details of the
+        violations of the must by the node at `pos`, for evaluating the must node by node
+        together with others (see `dagrules.planner`).  `parents` and `children` are the
+        positions of the node's neighbours, or None if no must being evaluated reads them.
+
+        Returns None if the must can only be evaluated over all of `positions` at once.
+        """
+        return None
+
+    def check(self, index, positions):
+        "Raises a `RuleError` if any of the nodes at `positions` in `index` violate the must"
+
+        for _, detail in self.violations(index, positions):
+            raise RuleError(detail)
+
+
+class MatchName(Must):  # pylint: disable=too-few-public-methods
+    """
+    Compiled `match-name` must
+
+    Args:
+        pattern (str): Name pattern, either a regular expression enclosed in slashes (`/.../`)
+            or a glob (see `dagrules.names`)
+    """
+
+    __slots__ = ("pattern", "regex", "matches")
+    _fields = ("pattern",)
+    must_type = "match-name"
+
+    def __init__(self, pattern):
+        regex, matches = compile_name_pattern(pattern)
+        self.pattern = pattern
+        self.regex = regex
+        self.matches = matches
+
+    def _detail(self, index, pos):
+        node, name = index.node_ids[pos], index.nodes[pos]["name"]
+        return f'For node "{node}", "{name}" does not match pattern {self.pattern}'
+
+    def violations(self, index, positions):
+        nodes = index.nodes
+        batch = None if self.regex is None else batched(index, self.regex.pattern)
+        if batch is None:
+            matches = self.matches
+            mismatches = (pos for pos in positions if not matches(nodes[pos].name))
+        else:
+            mismatches = batch[0].mismatches(index, positions, batch[1])
+
+        for pos in mismatches:
+            yield (index.node_ids[pos], self._detail(index, pos))
+
+    def checker(self, index, positions):
+        batch = None if self.regex is None else batched(index, self.regex.pattern)
+        if batch is not None:
+            mismatches = frozenset(batch[0].mismatches(index, positions, batch[1]))
+            return lambda pos, parents, children: (
+                (self._detail(index, pos),) if pos in mismatches else ()
+            )
+
+        nodes, matches = index.nodes, self.matches
+        return lambda pos, parents, children: (
+            () if matches(nodes[pos].name) else (self._detail(index, pos),)
+        )
+
+
+class HaveTagsAny(Must):  # pylint: disable=too-few-public-methods
+    """
+    Compiled `have-tags-any` must
+
+    Args:
+        tags (str, list, dict, TagMatcher): Tag selector the nodes must match
+    """
+
+    __slots__ = ("tags",)
+    _fields = __slots__
+    must_type = "have-tags-any"
+
+    def __init__(self, tags):
+        self.tags = TagMatcher.compile(tags)
+
+    def _detail(self, index, pos):
+        return (
+            f'For node "{index.node_ids[pos]}", tags {index.nodes[pos]["tags"]} '
+            f"do not match expected tags {self.tags}"
+        )
+
+    def violations(self, index, positions):
+        has_tags = self.tags.bind(index.tags)
+        tag_masks = index.tag_masks
+        for pos in positions:
+            if not has_tags(tag_masks[pos]):
+                yield (index.node_ids[pos], self._detail(index, pos))
+
+    def checker(self, index, positions):
+        has_tags = self.tags.bind(index.tags)
+        tag_masks = index.tag_masks
+        return lambda pos, parents, children: (
+            () if has_tags(tag_masks[pos]) else (self._detail(index, pos),)
+        )
+
+
+class HaveRelationship(Must):  # pylint: disable=too-many-instance-attributes
+    """
+    Compiled `have-child-relationship`, `have-parent-relationship`,
+    `have-descendant-relationship` or `have-ancestor-relationship` must
+
+    Args:
+        relationship (str): One of "child", "parent", "descendant" or "ancestor"
+        cardinality (str): Either "one_to_one" or "one_to_many"
+        required (bool): Whether each subject must have at least one selected relation
+        select_node_type (str): Only consider relations of this resource type
+        require_node_type (str): Resource type all selected relations must have
+        select_tags_any (str, list, dict, TagMatcher): Only consider relations matching these tags
+        require_tags_any (str, list, dict, TagMatcher): Tags all selected relations must match
+    """
+
+    __slots__ = (
+        "relationship",
+        "cardinality",
+        "required",
+        "select_node_type",
+        "require_node_type",
+        "select_tags_any",
+        "require_tags_any",
+    )
+    _fields = __slots__
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        relationship,
+        cardinality="one_to_many",
+        required=True,
+        select_node_type=None,
+        require_node_type=None,
+        select_tags_any=None,
+        require_tags_any=None,
+    ):
+        if relationship not in DIRECT_RELATIONSHIPS + TRANSITIVE_RELATIONSHIPS:
+            raise ParserAllowedValueError(f"Unknown relationship: {relationship}")
+
+        self.relationship = relationship
+        self.cardinality = cardinality
+        self.required = required
+        self.select_node_type = select_node_type
+        self.require_node_type = require_node_type
+        self.select_tags_any = TagMatcher.compile(select_tags_any)
+        self.require_tags_any = TagMatcher.compile(require_tags_any)
+
+    @property
+    def must_type(self):
+        "Name of the must in dagrules.yml"
+        return f"have-{self.relationship}-relationship"
+
+    @property
+    def relationships(self):
+        "The relationships whose nodes the must reads"
+        return (self.relationship,)
+
+    @classmethod
+    def from_config(cls, relationship, config):
+        "Compiles the arguments of a `have-<relationship>-relationship` must"
+
+        unknown_arguments = set(config.keys()) - set(RELATIONSHIP_ARGUMENTS)
+        if len(unknown_arguments) > 0:
+            raise ParserAllowedValueError(
+                f"Unknown argument to have-{relationship}-relationship: {unknown_arguments}"
+            )
+        return cls(relationship, **{k.replace("-", "_"): v for k, v in config.items()})
+
+    def prepare(self, index):
+        if self.relationship in TRANSITIVE_RELATIONSHIPS:
+            try:
+                index.reachability  # pylint: disable=pointless-statement
+            except GraphCycleError:
+                # Reported by `violations`
+                pass
+
+    def _selected_relations(self, index):
+        """
+        Returns a function that, given the position of a subject, returns the number of its
+        selected relations, and the positions of the selected relations that need to be
+        checked against the requirements
+        """
+
+        select_tags = self.select_tags_any.bind(index.tags)
+        select_node_type = self.select_node_type
+        nodes, tag_masks = index.nodes, index.tag_masks
+
+        if self.relationship in DIRECT_RELATIONSHIPS:
+            related = index.parents if self.relationship == "parent" else index.children
+
+            def selected_relations(pos, neighbours=None):
+                deps = [
+                    dep
+                    for dep in (related(pos) if neighbours is None else neighbours)
+                    if select_tags(tag_masks[dep])
+                    and (select_node_type is None or select_node_type == nodes[dep].resource_type)
+                ]
+                return len(deps), deps
+
+            return selected_relations
+
+        # Transitive relations are filtered by intersecting bitsets: the relations of a node
+        # with the bitsets of all selectable nodes and of all nodes meeting the requirements,
+        # so only the relations that violate the requirements are visited
+        reachability, relationship = index.reachability, self.relationship
+        require_tags = self.require_tags_any.bind(index.tags)
+        require_node_type = self.require_node_type
+        selectable = bitset(
+            (
+                pos
+                for pos in (
+                    range(len(index))
+                    if select_node_type is None
+                    else index.of_type(select_node_type)
+                )
+                if select_tags(tag_masks[pos])
+            ),
+            len(index),
+        )
+        valid = bitset(
+            (
+                pos
+                for pos in range(len(index))
+                if require_tags(tag_masks[pos])
+                and (require_node_type is None or nodes[pos].resource_type == require_node_type)
+            ),
+            len(index),
+        )
+
+        def selected_transitive_relations(pos, _neighbours=None):
+            deps = reachability.related(pos, relationship) & selectable
+            return count_bits(deps), iter_bits(deps & ~valid)
+
+        return selected_transitive_relations
+
+    def _details(self, index):
+        """
+        Returns a function yielding the details of the violations by the node at `pos`, given
+        the positions of its parents or children if already at hand
+        """
+
+        relationship = self.relationship
+        require_tags = self.require_tags_any.bind(index.tags)
+        require_node_type = self.require_node_type
+        selected_relations = self._selected_relations(index)
+        nodes, tag_masks = index.nodes, index.tag_masks
+
+        def details(pos, neighbours=None):
+            n_deps, selected_deps = selected_relations(pos, neighbours)
+
+            node = index.node_ids[pos]
+            if self.required and n_deps == 0:
+                yield f'{relationship} relationship required, not found for node "{node}"'
+            if self.cardinality == "one_to_one" and n_deps > 1:
+                yield f'Expecting only one {relationship}, found {n_deps} for node "{node}"'
+            for dep_pos in selected_deps:
+                dep, dep_params = index.node_ids[dep_pos], nodes[dep_pos]
+                if not require_tags(tag_masks[dep_pos]):
+                    yield (
+                        f'Expecting all {relationship} relations of "{node}" to have tags '
+                        f"{self.require_tags_any}, however {relationship} "
+                        f'"{dep}" had tags {dep_params["tags"]}'
+                    )
+                if require_node_type is not None and dep_params.resource_type != require_node_type:
+                    yield (
+                        f'Expecting all {relationship} relations of "{node}" to be of node type '
+                        f'"{require_node_type}", however {relationship} "{dep}" had type '
+                        f'"{dep_params["resource_type"]}"'
+                    )
+
+        return details
+
+    def violations(self, index, positions):
+        try:
+            details = self._details(index)
+        except GraphCycleError as err:
+            # Ancestors and descendants are only defined on a DAG
+            yield (None, str(err))
+            return
+
+        for pos in positions:
+            for detail in details(pos):
+                yield (index.node_ids[pos], detail)
+
+    def checker(self, index, positions):
+        try:
+            details = self._details(index)
+        except GraphCycleError:
+            # Reported once for the whole rule by `violations`
+            return None
+
+        if self.relationship == "parent":
+            return lambda pos, parents, children: tuple(details(pos, parents))
+        if self.relationship == "child":
+            return lambda pos, parents, children: tuple(details(pos, children))
+        return lambda pos, parents, children: tuple(details(pos))
+
+
+class MaxGraphMetric(Must):
+    """
+    Compiled `max-depth`, `max-fan-in` or `max-fan-out` must
+
+    Args:
+        metric (str): One of "depth" (longest path from a root), "fan-in" (number of parents)
+            or "fan-out" (number of children)
+        limit (int): Maximum value of the metric
+    """
+
+    __slots__ = ("metric", "limit")
+    _fields = __slots__
+
+    # The relationships whose nodes each metric depends on.  Depth depends on all ancestors,
+    # but is computed (and its modified subjects found, see `dagrules.state`) by walking parent
+    # edges, without building the transitive closure of the graph
+    METRIC_RELATIONSHIPS = {"depth": ("ancestor",), "fan-in": ("parent",), "fan-out": ("child",)}
+
+    def __init__(self, metric, limit):
+        if metric not in self.METRIC_RELATIONSHIPS:
+            raise ParserAllowedValueError(f"Unknown graph metric: {metric}")
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+            raise ParserAllowedValueError(
+                f"max-{metric} must be a non-negative integer, got {limit!r}"
+            )
+        self.metric = metric
+        self.limit = limit
+
+    @property
+    def must_type(self):
+        "Name of the must in dagrules.yml"
+        return f"max-{self.metric}"
+
+    @property
+    def relationships(self):
+        "The relationships whose nodes the must reads"
+        return self.METRIC_RELATIONSHIPS[self.metric]
+
+    def prepare(self, index):
+        try:
+            index.metrics  # pylint: disable=pointless-statement
+        except GraphCycleError:
+            # Reported by `violations`
+            pass
+
+    def violations(self, index, positions):
+        try:
+            values = index.metrics.metric(self.metric)
+        except GraphCycleError as err:
+            yield (None, str(err))
+            return
+
+        for pos in positions:
+            if values[pos] > self.limit:
+                yield (index.node_ids[pos], self._detail(index, pos, values[pos]))
+
+    def _detail(self, index, pos, value):
+        return (
+            f'For node "{index.node_ids[pos]}", {self.metric} {value} exceeds the maximum of '
+            f"{self.limit}"
+        )
+
+    def checker(self, index, positions):
+        try:
+            values = index.metrics.metric(self.metric)
+        except GraphCycleError:
+            # Reported once for the whole rule by `violations`
+            return None
+
+        limit = self.limit
+        return lambda pos, parents, children: (
+            (self._detail(index, pos, values[pos]),) if values[pos] > limit else ()
+        )
+
+
+# Compile functions of each must, by its name in dagrules.yml
+MUST_COMPILERS = {
+    "match-name": MatchName,
+    "have-tags-any": HaveTagsAny,
+    "have-child-relationship": partial(HaveRelationship.from_config, "child"),
+    "have-parent-relationship": partial(HaveRelationship.from_config, "parent"),
+    "have-descendant-relationship": partial(HaveRelationship.from_config, "descendant"),
+    "have-ancestor-relationship": partial(HaveRelationship.from_config, "ancestor"),
+    "max-depth": partial(MaxGraphMetric, "depth"),
+    "max-fan-in": partial(MaxGraphMetric, "fan-in"),
+    "max-fan-out": partial(MaxGraphMetric, "fan-out"),
+}
+
+
+def compile_must(must_type, config):
+    "Compiles a single must, given its name in dagrules.yml and its configuration"
+
+    if must_type not in MUST_COMPILERS:
+        raise ParserAllowedValueError(f"Unknown must: {must_type}")
+    return MUST_COMPILERS[must_type](config)
+
+
+# Musts are always checked in this order, regardless of the order in dagrules.yml
+MUST_ORDER = (
+    "match-name",
+    "have-tags-any",
+    "have-child-relationship",
+    "have-parent-relationship",
+    "have-descendant-relationship",
+    "have-ancestor-relationship",
+    "max-depth",
+    "max-fan-in",
+    "max-fan-out",
+)
+
+
+class Rule(Compiled):  # pylint: disable=too-few-public-methods
+    """
+    A compiled dagrules rule
+
+    Args:
+        name (str): Name of the rule
+        subject (Subject): Compiled subject selector
+        musts (tuple): Compiled musts, in the order they are checked
+    """
+
+    __slots__ = ("name", "subject", "musts")
+    _fields = __slots__
+
+    def __init__(self, name, subject, musts):
+        self.name = name
+        self.subject = subject
+        self.musts = tuple(musts)
+
+    @property
+    def relationships(self):
+        """
+        The relationships whose nodes the rule's musts read: `parent`, `child`, `ancestor` and/or
+        `descendant`
+        """
+        return tuple(sorted({rel for must in self.musts for rel in must.relationships}))
+
+    def violations(self, index, positions=None, musts=None):
+        """
+        Yields every `Violation` of the rule by the subject nodes in `index`, must by must.
+        `positions` restricts the check to some of the subjects, and `musts` to some of the
+        rule's musts.
+        """
+
+        if positions is None:
+            positions = self.subject.select(index)
+        for must in self.musts if musts is None else musts:
+            for node, detail in must.violations(index, positions):
+                yield Violation(self.name, node, must.must_type, detail)
+
+    def check(self, index):
+        "Raises a `RuleError` if any subject node in `index` violates the rule"
+
+        for violation in self.violations(index):
+            raise RuleError(violation.detail)
+
+
+def compile_rule(config):
+    "Compiles a single (validated) rule from dagrules.yml"
+
+    musts = config["must"]
+    try:
+        return Rule(
+            name=config["name"],
+            subject=Subject.from_config(config.get("subject", {})),
+            musts=[
+                compile_must(must_type, musts[must_type])
+                for must_type in MUST_ORDER
+                if must_type in musts
+            ],
+        )
+    except (AttributeError, TypeError, ValueError, re.error) as err:
+        # Parameters of the wrong type, or invalid regular expressions
+        raise ParserAllowedValueError(
+            f'Invalid parameters for rule "{config["name"]}": {err}'
+        ) from err
+
+
+def compile_rules(config):
+    "Compiles all of the rules in a (validated) dagrules.yml configuration"
+    return tuple(compile_rule(rule) for rule in config["rules"])
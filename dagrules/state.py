@@ -0,0 +1,148 @@
+"""
+State comparison against a previous manifest, in the spirit of dbt's `state:modified`.
+
+Rules only look at a subject's own attributes and at the attributes of its parents and
+children, so a subject can only have started violating a rule if its own attributes, its
+edges, or the attributes of one of its neighbours changed since the previous manifest.
+`modified_positions` finds those subjects, and only they need to be checked again.  Rules
+on ancestors or descendants (or on graph depth) also depend on nodes further away, so for
+those, all the ancestors and descendants of changed nodes are included too.  They are found
+by walking the parent and child edges from the changed nodes, which visits every edge at
+most once, rather than from the (quadratic) transitive closure of the graph.
+
+The previous manifest is only read for the attributes and edges of its nodes, without
+building a `ManifestIndex` of it.
+"""
+
+from dagrules.index import ManifestIndex
+from dagrules.loader import NODE_SECTIONS
+
+# The node attributes rules can depend on
+STATE_ATTRIBUTES = ("resource_type", "name", "tags", "package_name", "materialized")
+
+
+def node_state(node):
+    "Returns a hashable summary of the attributes of a `Node` record that rules depend on"
+    return (node.resource_type, node.name, node.tags or (), node.package_name, node.materialized)
+
+
+def _params_state(params):
+    # `node_state` of the manifest dict of a node, without decoding a `Node` record from it
+    config = params.get("config")
+    return (
+        params.get("resource_type"),
+        params.get("name"),
+        tuple(params.get("tags") or ()),
+        params.get("package_name"),
+        config.get("materialized") if isinstance(config, dict) else None,
+    )
+
+
+def _neighbour_ids(index, positions):
+    return frozenset(map(index.node_ids.__getitem__, positions))
+
+
+def _reachable(positions, neighbours):
+    "Returns the positions reachable from `positions` along the `neighbours` edges"
+
+    reached = set(positions)
+    frontier = list(reached)
+    while frontier:
+        pos = frontier.pop()
+        for neighbour in neighbours(pos):
+            if neighbour not in reached:
+                reached.add(neighbour)
+                frontier.append(neighbour)
+    return reached
+
+
+def _index_states(index):
+    "Returns `{node_id: (state, parent_ids, child_ids)}` for the nodes of an index"
+
+    return {
+        node: (
+            node_state(index.nodes[pos]),
+            _neighbour_ids(index, index.parents(pos)),
+            _neighbour_ids(index, index.children(pos)),
+        )
+        for pos, node in enumerate(index.node_ids)
+    }
+
+
+def _manifest_states(manifest):
+    """
+    Returns `{node_id: (state, parent_ids, child_ids)}` for the nodes of a manifest dict,
+    where the parent and child ids may include nodes that are not in the manifest
+    """
+
+    flat_nodes = {}
+    for section in NODE_SECTIONS:
+        flat_nodes.update(manifest.get(section, {}))
+    child_map = manifest.get("child_map", {})
+    return {
+        node: (
+            _params_state(params),
+            (params.get("depends_on") or {}).get("nodes", ()),
+            child_map.get(node, ()),
+        )
+        for node, params in flat_nodes.items()
+    }
+
+
+def _same_neighbours(ids, previous_ids, previous_states):
+    """
+    Returns whether the neighbour `ids` of a node are those it had in the previous manifest,
+    ignoring edges to nodes that were not in it (as `ManifestIndex` does)
+    """
+
+    previous_ids = frozenset(previous_ids)
+    if ids == previous_ids:
+        return True
+    return ids == {node for node in previous_ids if node in previous_states}
+
+
+def modified_positions(index, previous, transitive=False):
+    """
+    Returns the (ascending) positions of the nodes in `index` whose rule results may differ
+    from those in the `previous` manifest: nodes that are new, whose attributes or edges
+    changed, or that are a parent or child of a node whose attributes changed
+
+    Args:
+        index (ManifestIndex): Index of the current manifest
+        previous (dict, ManifestIndex): The previous manifest, or an index built from it
+        transitive (bool): Also include all ancestors and descendants of changed nodes, for
+            rules on ancestor or descendant relationships
+    """
+
+    if isinstance(previous, ManifestIndex):
+        previous_states = _index_states(previous)
+    else:
+        previous_states = _manifest_states(previous)
+
+    changed = set()
+    modified = set()
+    for pos, node in enumerate(index.node_ids):
+        previous_state = previous_states.get(node)
+        if previous_state is None:
+            changed.add(pos)
+            continue
+
+        state, parent_ids, child_ids = previous_state
+        if node_state(index.nodes[pos]) != state:
+            # Relationship musts of the neighbours look at this node's attributes
+            changed.add(pos)
+            modified.update(index.parents(pos))
+            modified.update(index.children(pos))
+        elif not (
+            _same_neighbours(_neighbour_ids(index, index.parents(pos)), parent_ids, previous_states)
+            and _same_neighbours(
+                _neighbour_ids(index, index.children(pos)), child_ids, previous_states
+            )
+        ):
+            changed.add(pos)
+
+    modified.update(changed)
+    if transitive:
+        modified.update(_reachable(changed, index.parents))
+        modified.update(_reachable(changed, index.children))
+    return sorted(modified)
@@ -0,0 +1,179 @@
+"""
+Compiled tag selectors backed by integer bitsets.
+"""
+
+
+class TagVocabulary:
+    """
+    Assigns every distinct tag a bit position, so that a set of tags can be held as a single
+    integer bitmask.
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self):
+        self.bits = {}
+
+    def __len__(self):
+        return len(self.bits)
+
+    def add(self, tags):
+        "Returns the bitmask of `tags`, assigning a bit to any tag not yet in the vocabulary"
+
+        if isinstance(tags, str):
+            tags = (tags,)
+
+        mask = 0
+        for tag in tags:
+            bit = self.bits.get(tag)
+            if bit is None:
+                bit = self.bits[tag] = len(self.bits)
+            mask |= 1 << bit
+        return mask
+
+    def mask(self, tags):
+        "Returns the bitmask of `tags`, ignoring any tag that is not in the vocabulary"
+
+        mask = 0
+        for tag in tags:
+            bit = self.bits.get(tag)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def knows(self, tags):
+        "Returns true if every tag in `tags` is in the vocabulary"
+        return all(tag in self.bits for tag in tags)
+
+
+def _as_set(tags):
+    if tags is None:
+        return frozenset()
+    if isinstance(tags, str):
+        return frozenset({tags})
+    return frozenset(tags)
+
+
+def _compile_clause(matcher):
+    "Compiles a single string or include/exclude dict to a pair of (include, exclude) sets"
+
+    if isinstance(matcher, str):
+        return (frozenset({matcher}), frozenset())
+    if isinstance(matcher, dict):
+        # A missing include matches everything, regardless of any exclude
+        if matcher.get("include") is None:
+            return (frozenset(), frozenset())
+        return (_as_set(matcher["include"]), _as_set(matcher.get("exclude")))
+    raise TypeError(f"Unable to compile tag matcher: {matcher!r}")
+
+
+def _match_all(_mask):
+    return True
+
+
+class TagMatcher:
+    """
+    A tag selector (as written in dagrules.yml) compiled once into a list of clauses.  The
+    matcher matches a set of tags when ANY of its clauses does, and a clause matches when ALL
+    of its include tags and NONE of its exclude tags are present.
+
+    Matching against bitmasks requires binding the matcher to the `TagVocabulary` used to
+    build the masks; the bound predicate is kept so that binding happens once per vocabulary.
+
+    Args:
+        selector (str, list, dict): Tag selector, see `dagrules.core.match_tags_any`
+    """
+
+    __slots__ = ("selector", "clauses", "_bound")
+
+    def __init__(self, selector=None):
+        self.selector = selector
+        self._bound = (None, 0, None)
+
+        if selector is None:
+            self.clauses = None
+        elif isinstance(selector, (str, dict)):
+            self.clauses = (_compile_clause(selector),)
+        else:
+            self.clauses = tuple(_compile_clause(matcher) for matcher in selector)
+
+    @classmethod
+    def compile(cls, selector):
+        "Returns `selector` compiled to a `TagMatcher`, unless it already is one"
+
+        if isinstance(selector, TagMatcher):
+            return selector
+        return cls(selector)
+
+    def __reduce__(self):
+        return (TagMatcher, (self.selector,))
+
+    def __str__(self):
+        return str(self.selector)
+
+    def __repr__(self):
+        return f"TagMatcher({self.selector!r})"
+
+    @property
+    def key(self):
+        """
+        Canonical, hashable form of the selector: selectors that match the same tags (whatever
+        the order or repetition of their clauses and tags) have equal keys, and selectors that
+        match everything have a key of None
+        """
+
+        if self.clauses is None or (frozenset(), frozenset()) in self.clauses:
+            return None
+        return tuple(
+            sorted(
+                {
+                    (tuple(sorted(include)), tuple(sorted(exclude)))
+                    for include, exclude in self.clauses
+                }
+            )
+        )
+
+    def match(self, tags):
+        "Returns true if the tag names in `tags` match"
+
+        if self.clauses is None:
+            return True
+
+        tags = _as_set(tags)
+        return any(
+            include.issubset(tags) and exclude.isdisjoint(tags) for include, exclude in self.clauses
+        )
+
+    def bind(self, vocabulary):
+        "Returns a predicate that tests whether a tag bitmask built from `vocabulary` matches"
+
+        bound_vocabulary, bound_size, predicate = self._bound
+        if bound_vocabulary is vocabulary and bound_size == len(vocabulary):
+            return predicate
+
+        predicate = self._predicate(vocabulary)
+        self._bound = (vocabulary, len(vocabulary), predicate)
+        return predicate
+
+    def _predicate(self, vocabulary):
+        if self.clauses is None:
+            return _match_all
+
+        # Clauses including a tag no node has can never match, and are dropped
+        masks = tuple(
+            (vocabulary.mask(include), vocabulary.mask(exclude))
+            for include, exclude in self.clauses
+            if vocabulary.knows(include)
+        )
+
+        if len(masks) == 1:
+            include, exclude = masks[0]
+            return lambda mask: mask & include == include and not mask & exclude
+
+        def predicate(mask):
+            for include, exclude in masks:
+                if mask & include == include and not mask & exclude:
+                    return True
+            return False
+
+        return predicate
@@ -0,0 +1,246 @@
+"""
+Timing instrumentation for dagrules runs.
+
+A `Timings` object passed to `dagrules.core.check` (or `dagrules.parallel.check_rules`)
+records the wall time, the nodes and edges visited, and the peak (Python) memory of each
+phase of a run (`read config`, `read manifest`, `validate`, `select` and `evaluate`) and of
+each rule.  Phases that happen once per rule (selecting subjects and evaluating musts) are
+added up over all rules.
+
+Hooks are called with a `Timing` record as each phase or rule finishes, e.g. to forward them
+to a metrics system:
+
+    timings = Timings(hooks=[lambda timing: statsd.timing(timing.name, timing.seconds)])
+    core.check(config, manifest, timings=timings)
+    print(timings.table())
+
+When rules are checked in worker processes, their evaluation times are measured in the
+workers and added up, and their peak memory is not recorded.  Rules evaluated together in a
+single pass (see `dagrules.planner`) share the time of the pass evenly.
+"""
+
+import json
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+PHASES = ("read config", "read manifest", "validate", "select", "evaluate")
+
+Timing = namedtuple("Timing", ["kind", "name", "seconds", "nodes", "edges", "peak_memory"])
+Timing.__doc__ = """
+Time and resources spent in a phase or rule of a dagrules run
+
+Args:
+    kind (str): "phase" or "rule"
+    name (str): Name of the phase (see `PHASES`) or rule
+    seconds (float): Wall time
+    nodes (int): Number of subject nodes evaluated
+    edges (int): Number of parent and child edges read (or walked) by the musts
+    peak_memory (int): Peak memory allocated by Python, in bytes (None if not traced)
+"""
+
+
+def visited(index, rule, positions):
+    """
+    Returns `(nodes, edges)`: the number of subjects at `positions` and of the edges to their
+    relations the musts of a compiled rule read.  Ancestors and descendants are counted as
+    the parent and child edges walked to find them, and no graph structure is ever built.
+    """
+
+    edges = 0
+    for relationship in rule.relationships:
+        if relationship in ("parent", "ancestor"):
+            offsets = index.parent_offsets
+        elif relationship in ("child", "descendant"):
+            offsets = index.child_offsets
+        else:
+            continue
+        edges += sum(offsets[pos + 1] - offsets[pos] for pos in positions)
+    return len(positions), edges
+
+
+class _Span:  # pylint: disable=too-few-public-methods
+    __slots__ = ("nodes", "edges", "peak", "overhead")
+
+    def __init__(self):
+        self.nodes = 0
+        self.edges = 0
+        self.peak = 0
+        self.overhead = 0.0
+
+
+class Timings:
+    """
+    Records the `Timing` of each phase and rule of a run
+
+    Args:
+        hooks (list): Functions called with each `Timing` record as it is made
+        trace_memory (bool): Whether to trace peak memory (with `tracemalloc`, which slows
+            the run down)
+    """
+
+    enabled = True
+
+    def __init__(self, hooks=(), trace_memory=True):
+        # Only imported when timing a run, as importing it slows down every run's startup
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        self._tracemalloc = tracemalloc
+        self.hooks = list(hooks)
+        self.trace_memory = trace_memory
+        self.records = {}
+        self._spans = []
+        self._started_tracing = False
+
+    def add_hook(self, hook):
+        "Calls `hook` with each `Timing` record from now on"
+        self.hooks.append(hook)
+
+    def phase(self, name):
+        "Returns a context manager recording the `Timing` of a phase"
+        return self._span("phase", name)
+
+    def rule(self, name):
+        "Returns a context manager recording the `Timing` of a rule"
+        return self._span("rule", name)
+
+    def visit(self, index, rule, positions):
+        """
+        Counts the nodes and edges (see `visited`) evaluated by a rule in the open phases and
+        rules, leaving the time spent counting them out of their times, and returns them
+        """
+
+        start = time.perf_counter()
+        nodes, edges = visited(index, rule, positions)
+        overhead = time.perf_counter() - start
+        for span in self._spans:
+            span.nodes += nodes
+            span.edges += edges
+            span.overhead += overhead
+        return nodes, edges
+
+    def add(self, kind, name, seconds, nodes=0, edges=0, peak_memory=None):
+        "Records a `Timing` measured elsewhere (e.g. in a worker process)"
+
+        timing = Timing(kind, name, seconds, nodes, edges, peak_memory)
+        for hook in self.hooks:
+            hook(timing)
+
+        total = self.records.get((kind, name))
+        if total is not None:
+            peaks = [peak for peak in (total.peak_memory, peak_memory) if peak is not None]
+            timing = Timing(
+                kind,
+                name,
+                total.seconds + seconds,
+                total.nodes + nodes,
+                total.edges + edges,
+                max(peaks) if peaks else None,
+            )
+        self.records[(kind, name)] = timing
+
+    @contextmanager
+    def _span(self, kind, name):
+        tracemalloc = self._tracemalloc
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            # The enclosing span's peak so far, before the peak is reset for this one
+            if self._spans:
+                self._spans[-1].peak = max(self._spans[-1].peak, tracemalloc.get_traced_memory()[1])
+            if hasattr(tracemalloc, "reset_peak"):
+                # Before Python 3.9, peaks include those of the earlier spans
+                tracemalloc.reset_peak()
+
+        span = _Span()
+        self._spans.append(span)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start - span.overhead
+            self._spans.pop()
+            peak = None
+            if self.trace_memory:
+                peak = max(span.peak, tracemalloc.get_traced_memory()[1])
+                if self._spans:
+                    self._spans[-1].peak = max(self._spans[-1].peak, peak)
+            self.add(kind, name, seconds, span.nodes, span.edges, peak)
+
+    def close(self):
+        "Stops tracing memory, if these timings started it"
+
+        if self._started_tracing:
+            self._tracemalloc.stop()
+            self._started_tracing = False
+
+    def timings(self, kind=None):
+        "Returns the `Timing` totals of the phases and rules (or only those of `kind`)"
+        return [timing for timing in self.records.values() if kind in (None, timing.kind)]
+
+    def as_dict(self):
+        "Returns the timings as a JSON-serializable dict of phase and rule timing lists"
+
+        return {
+            f"{kind}s": [
+                {field: value for field, value in timing._asdict().items() if field != "kind"}
+                for timing in self.timings(kind)
+            ]
+            for kind in ("phase", "rule")
+        }
+
+    def json(self):
+        "Returns the timings as a JSON string (see `as_dict`)"
+        return json.dumps(self.as_dict(), indent=2)
+
+    def table(self):
+        "Returns the timings as a plain text table, phases first"
+
+        rows = [("Phase / rule", "Seconds", "Nodes", "Edges", "Peak memory")]
+        for timing in self.timings("phase") + self.timings("rule"):
+            name = timing.name if timing.kind == "phase" else f"rule: {timing.name}"
+            rows.append(
+                (
+                    name,
+                    f"{timing.seconds:.3f}",
+                    str(timing.nodes),
+                    str(timing.edges),
+                    "-" if timing.peak_memory is None else format_bytes(timing.peak_memory),
+                )
+            )
+
+        width = min(60, max(len(row[0]) for row in rows))
+        return "\n".join(
+            f"{row[0][:width]:<{width}} {row[1]:>9} {row[2]:>9} {row[3]:>11} {row[4]:>12}"
+            for row in rows
+        )
+
+
+class NullTimings:
+    "Stands in for `Timings` when a run is not timed, recording nothing"
+
+    enabled = False
+
+    def phase(self, name):  # pylint: disable=unused-argument
+        "Returns a context manager that does nothing"
+        return nullcontext()
+
+    rule = phase
+
+    def visit(self, index, rule, positions):  # pylint: disable=unused-argument
+        "Counts nothing, returning `(0, 0)`"
+        return 0, 0
+
+    def add(self, kind, name, seconds, nodes=0, edges=0, peak_memory=None):
+        "Does nothing"
+
+
+def format_bytes(size):
+    "Returns a number of bytes in human readable form (e.g. `1.5 MB`)"
+
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -0,0 +1,141 @@
+"""
+Watch mode: keep the manifest index and compiled rules in memory and re-check on changes.
+
+`Watcher` polls the size and mtime of manifest.json and dagrules.yml.  When the manifest
+changes, only it is re-read and re-indexed; when dagrules.yml changes, only it is parsed,
+validated and compiled again.  Rule results are kept in a `ResultStore` between checks, so a
+re-check only evaluates the subjects whose inputs (or rules) changed.
+"""
+
+import os
+import time
+
+import yaml
+
+from dagrules import core
+from dagrules.cache import load_index
+from dagrules.exceptions import ParseError, RuleError
+from dagrules.loader import load_manifest
+from dagrules.parallel import check_rules
+from dagrules.parsers import load_yaml
+from dagrules.results import ResultStore
+from dagrules.rules import compile_rules
+
+# Seconds between checks for changes to the watched files
+POLL_INTERVAL = 0.25
+
+
+def file_stamp(path):
+    "Returns the `(size, mtime_ns)` of a file, or None if it does not exist"
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class Watcher:  # pylint: disable=too-many-instance-attributes
+    """
+    Re-checks the rules in `config_path` against `manifest_path` whenever either changes
+
+    Args:
+        config_path (str): Path to dagrules.yml
+        manifest_path (str): Path to manifest.json
+        use_cache (bool): Whether to use the on-disk manifest and rule result caches
+        jobs (int): Number of worker processes to check rules in
+        max_violations (int): Stop each check after this many violations (default: no limit)
+        parser (str): Parser to read the files with, see `dagrules.parsers.PARSERS`
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        config_path,
+        manifest_path,
+        use_cache=True,
+        jobs=1,
+        max_violations=None,
+        parser="auto",
+    ):
+        self.config_path = config_path
+        self.manifest_path = manifest_path
+        self.use_cache = use_cache
+        self.jobs = jobs
+        self.max_violations = max_violations
+        self.parser = parser
+
+        self.rules = None
+        self.index = None
+        self.results = ResultStore.for_manifest(manifest_path) if use_cache else ResultStore()
+        self._config_stamp = None
+        self._manifest_stamp = None
+
+    def poll(self):
+        "Reloads whichever of the watched files changed, returning whether any did"
+
+        changed = False
+
+        # A file that cannot be loaded (e.g. because it is still being written) is loaded again
+        # once its stamp changes
+        config_stamp = file_stamp(self.config_path)
+        if config_stamp is not None and config_stamp != self._config_stamp:
+            self._config_stamp = config_stamp
+            with open(self.config_path, encoding="utf-8") as rules_file:
+                config = load_yaml(rules_file, self.parser)
+            core.validate(config)
+            core.validate_version(config)
+            self.rules = compile_rules(config)
+            changed = True
+
+        manifest_stamp = file_stamp(self.manifest_path)
+        if manifest_stamp is not None and manifest_stamp != self._manifest_stamp:
+            self._manifest_stamp = manifest_stamp
+            if self.use_cache:
+                self.index = load_index(self.manifest_path, parser=self.parser)
+            else:
+                self.index = core.manifest_index(
+                    load_manifest(self.manifest_path, parser=self.parser)
+                )
+            changed = True
+
+        return changed
+
+    def check(self):
+        "Checks the rules against the manifest, raising a `RuleError` on violations"
+
+        checked = check_rules(
+            self.index,
+            self.rules,
+            jobs=self.jobs,
+            max_violations=self.max_violations,
+            results=self.results,
+        )
+        try:
+            core.report(checked, self.max_violations)
+        finally:
+            self.results.save(self.rules)
+
+    def run(self, interval=POLL_INTERVAL):
+        "Checks the rules and re-checks them whenever a watched file changes, until interrupted"
+
+        print(f"Watching {self.config_path} and {self.manifest_path} (press Ctrl+C to stop)")
+        try:
+            while True:
+                self._run_once()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def _run_once(self):
+        start = time.perf_counter()
+        try:
+            if not self.poll() or self.rules is None or self.index is None:
+                return
+            self.check()
+        except RuleError as err:
+            print(err)
+        except (ParseError, yaml.YAMLError, ValueError, OSError) as err:
+            # Keep watching: the next change to the files may fix the error
+            print(err)
+            return
+        print(f"Checked in {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -70,7 +70,7 @@ setup(
 
     # You can just specify the packages manually here if your project is
     # simple. Or you can use find_packages().
-    packages=find_packages(exclude=['contrib', 'docs', 'tests', 'jobs', 'docker', 'dist']),
+    packages=find_packages(exclude=['contrib', 'docs', 'tests', 'benchmarks', 'jobs', 'docker', 'dist']),
 
     # Alternatively, if you want to distribute just a my_module.py, uncomment
     # this:
@@ -94,6 +94,8 @@ setup(
     extras_require={
         'dev': [],
         'test': ['pytest'],
+        'columnar': ['numpy'],
+        'fast': ['msgspec'],
     },
 
     # If there are data files included in your packages that need to be
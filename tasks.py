@@ -15,6 +15,20 @@ def test(ctx):
     ctx.run(cmd)
 
 
+@task(
+    help={
+        "sizes": "Comma-separated numbers of manifest nodes to benchmark (default: 1000,10000)",
+    }
+)
+def bench(ctx, sizes="1000,10000"):
+    """
+    Runs the benchmarks on synthetic manifests, saving the results for comparison
+    """
+
+    cmd = f"pytest --color=yes benchmarks --bench-sizes={sizes} --benchmark-autosave"
+    ctx.run(cmd)
+
+
 @task(
     help={
         "check": "Only runs a check, does not reformat (default: False)",
@@ -25,7 +39,7 @@ def lint_black(ctx, check=False):
     Runs the black linter.
     """
 
-    for path in ["dagrules", "tests", "tasks.py"]:
+    for path in ["dagrules", "tests", "benchmarks", "tasks.py"]:
         check_cmd = "--check" if check else ""
         cmd = f"black --line-length=100 {check_cmd} {path}"
         ctx.run(cmd)
@@ -37,7 +51,7 @@ def lint_pylint(ctx):
     Runs the pylint linter.
     """
 
-    for path in ["dagrules", "tests", "tasks.py"]:
+    for path in ["dagrules", "tests", "benchmarks", "tasks.py"]:
         cmd = f"pylint {path}"
         ctx.run(cmd)
 
@@ -0,0 +1,50 @@
+"""
+Manifest and config factories shared by the tests
+"""
+
+# A rule every model named m<digit> passes
+NAMES_RULE = {"name": "names", "must": {"match-name": "/m[0-9]/"}}
+
+
+def node(resource_type, name, tags=(), parents=()):
+    "Returns the manifest dict of a node depending on the `parents` node ids"
+    return {
+        "resource_type": resource_type,
+        "name": name,
+        "tags": list(tags),
+        "depends_on": {"nodes": list(parents)},
+    }
+
+
+def model(name, parents=(), tags=("a",)):
+    "Returns the manifest dict of a model depending on the models named `parents`"
+    return node("model", name, tags, [f"model.{parent}" for parent in parents])
+
+
+def model_manifest(count, chained=False, names=None, tags=None):
+    """
+    Returns a manifest of `count` models `model.m0`, `model.m1`, ... named like their ids and
+    tagged `a`, where each model depends on the previous one if `chained`.  `names` and `tags`
+    map the indexes of some models to other names or tags.
+    """
+
+    names = names or {}
+    tags = tags or {}
+    nodes = {
+        f"model.m{idx}": model(
+            names.get(idx, f"m{idx}"),
+            [f"m{idx - 1}"] if chained and idx > 0 else [],
+            tags.get(idx, ["a"]),
+        )
+        for idx in range(count)
+    }
+    child_map = {
+        f"model.m{idx}": [f"model.m{idx + 1}"] if chained and idx + 1 < count else []
+        for idx in range(count)
+    }
+    return {"nodes": nodes, "child_map": child_map}
+
+
+def rules_config(*rules):
+    "Returns a dagrules.yml configuration of `rules`"
+    return {"version": "1", "rules": list(rules)}
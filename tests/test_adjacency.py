@@ -0,0 +1,83 @@
+"""
+Tests related to the memory-mapped adjacency file
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import mmap
+import pickle
+
+import pytest
+
+from dagrules.adjacency import AdjacencyFormatError, MappedAdjacency, write_adjacency
+from dagrules.index import ManifestIndex
+
+DIGEST = "ab" * 32
+
+
+@pytest.fixture
+def index():
+    return ManifestIndex(
+        {
+            "nodes": {
+                "model.a": {"resource_type": "model"},
+                "model.b": {"resource_type": "model", "depends_on": {"nodes": ["model.a"]}},
+                "model.c": {
+                    "resource_type": "model",
+                    "depends_on": {"nodes": ["model.a", "model.b"]},
+                },
+            },
+            "child_map": {"model.a": ["model.b", "model.c"], "model.b": ["model.c"]},
+        }
+    )
+
+
+@pytest.fixture
+def adjacency_path(index, tmp_path):
+    path = tmp_path / "adjacency.csr"
+    with open(path, "wb") as adjacency_file:
+        write_adjacency(index, adjacency_file, DIGEST)
+    return str(path)
+
+
+def _edges(index):
+    return [(list(index.parents(pos)), list(index.children(pos))) for pos in range(len(index))]
+
+
+def test_mapped_adjacency_matches_index(index, adjacency_path):
+    expected = _edges(index)
+
+    mapped = index.without_adjacency()
+    mapped.attach_adjacency(MappedAdjacency(adjacency_path, DIGEST))
+
+    assert _edges(mapped) == expected
+    assert isinstance(mapped.parents(2).obj, mmap.mmap)
+
+
+def test_mapped_adjacency_wrong_digest(adjacency_path):
+    with pytest.raises(AdjacencyFormatError):
+        MappedAdjacency(adjacency_path, "cd" * 32)
+
+
+def test_mapped_adjacency_truncated(adjacency_path):
+    with open(adjacency_path, "rb") as adjacency_file:
+        data = adjacency_file.read()
+    with open(adjacency_path, "wb") as adjacency_file:
+        adjacency_file.write(data[:-8])
+
+    with pytest.raises(AdjacencyFormatError):
+        MappedAdjacency(adjacency_path, DIGEST)
+
+
+def test_attach_mismatched_adjacency(adjacency_path):
+    index = ManifestIndex({"nodes": {"model.a": {"resource_type": "model"}}})
+
+    with pytest.raises(ValueError):
+        index.attach_adjacency(MappedAdjacency(adjacency_path, DIGEST))
+
+
+def test_pickle_mapped_index(index, adjacency_path):
+    expected = _edges(index)
+    index.attach_adjacency(MappedAdjacency(adjacency_path, DIGEST))
+
+    assert _edges(pickle.loads(pickle.dumps(index))) == expected
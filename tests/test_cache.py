@@ -0,0 +1,86 @@
+"""
+Tests related to caching the manifest index
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import json
+import mmap
+import os
+import shutil
+
+import pytest
+
+import dagrules.cache
+from dagrules.cache import ManifestCache
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    path = tmp_path / "manifest.json"
+    shutil.copy(os.path.join(TEST_DIR, "manifest.json"), path)
+    return str(path)
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    "Counts the number of times the manifest is read to build the index"
+
+    calls = []
+    load_manifest = dagrules.cache.load_manifest
+
+    def counting_load_manifest(path, **kwargs):
+        calls.append(path)
+        return load_manifest(path, **kwargs)
+
+    monkeypatch.setattr(dagrules.cache, "load_manifest", counting_load_manifest)
+    return calls
+
+
+def test_cache_hit(manifest_path, builds):
+    first = ManifestCache(manifest_path).load_index()
+    second = ManifestCache(manifest_path).load_index()
+
+    assert len(builds) == 1
+    assert second.node_ids == first.node_ids
+    assert list(second.child_targets) == list(first.child_targets)
+    assert isinstance(second.child_targets.obj, mmap.mmap)
+    assert os.path.isdir(os.path.join(os.path.dirname(manifest_path), ".dagrules_cache"))
+
+
+def test_cache_hit_when_only_mtime_changes(manifest_path, builds):
+    ManifestCache(manifest_path).load_index()
+    stat = os.stat(manifest_path)
+    os.utime(manifest_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    ManifestCache(manifest_path).load_index()
+
+    assert len(builds) == 1
+
+
+def test_cache_invalidated_when_manifest_changes(manifest_path, builds):
+    ManifestCache(manifest_path).load_index()
+
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    manifest["nodes"]["model.db.new"] = {"resource_type": "model", "name": "new"}
+    with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+    index = ManifestCache(manifest_path).load_index()
+
+    assert len(builds) == 2
+    assert "model.db.new" in index.positions
+
+
+def test_corrupt_cache_is_rebuilt(manifest_path, builds, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    ManifestCache(manifest_path, cache_dir).load_index()
+    with open(os.path.join(cache_dir, "index.pickle"), "wb") as index_file:
+        index_file.write(b"not a pickle")
+
+    index = ManifestCache(manifest_path, cache_dir).load_index()
+
+    assert len(builds) == 2
+    assert len(index) > 0
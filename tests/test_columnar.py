@@ -0,0 +1,130 @@
+"""
+Tests related to the columnar subject selection engine
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from dagrules.columnar import NodeTable, SubjectMemo, selection_key
+from dagrules.index import ManifestIndex
+from dagrules.tags import TagMatcher
+
+
+@pytest.fixture(params=[False, True], ids=["python", "numpy"])
+def use_numpy(request):
+    if request.param:
+        pytest.importorskip("numpy")
+    return request.param
+
+
+@pytest.fixture
+def index():
+    # More than 64 distinct tags, so tag bitmasks span several words
+    nodes = {
+        f"model.m{idx}": {
+            "resource_type": "model",
+            "package_name": "core" if idx % 2 else "finance",
+            "config": {"materialized": ["view", "table", "incremental"][idx % 3]},
+            "tags": [f"t{idx % 100}", "staging" if idx % 5 else "base"],
+        }
+        for idx in range(300)
+    }
+    nodes["seed.s"] = {"resource_type": "seed", "package_name": "core", "tags": ["t1"]}
+    return ManifestIndex({"sources": {"source.x": {"resource_type": "source"}}, "nodes": nodes})
+
+
+def _select(index, use_numpy, **kwargs):
+    if "tags" in kwargs:
+        kwargs["tags"] = TagMatcher(kwargs["tags"])
+    table = NodeTable(index, use_numpy=use_numpy)
+    return [index.node_ids[pos] for pos in table.select(**kwargs)]
+
+
+SELECTORS = [
+    {},
+    {"node_type": "seed"},
+    {"node_type": "source"},
+    {"node_type": "exposure"},
+    {"tags": "base"},
+    {"tags": ["t1", "t99"]},
+    {"tags": {"include": "staging", "exclude": ["t2", "t3"]}},
+    {"tags": [{"include": ["t70", "base"]}, "t71"]},
+    {"tags": "not-a-tag"},
+    {"tags": []},
+    {"package": "core"},
+    {"package": ["core", "finance"], "materialized": "view"},
+    {"materialized": ["table", "incremental"], "tags": "base"},
+    {"package": "unknown"},
+]
+
+
+@pytest.mark.parametrize("selector", SELECTORS)
+def test_engines_agree(index, use_numpy, selector):
+    assert _select(index, use_numpy, **selector) == _select(index, False, **selector)
+
+
+def test_select_by_type(index, use_numpy):
+    assert _select(index, use_numpy, node_type="seed") == ["seed.s"]
+    assert len(_select(index, use_numpy)) == 300
+
+
+def test_select_by_tags(index, use_numpy):
+    selected = _select(index, use_numpy, tags=["t1", "t70"])
+    assert selected == [f"model.m{idx}" for idx in (1, 70, 101, 170, 201, 270)]
+
+
+def test_select_by_tags_excluded(index, use_numpy):
+    assert _select(index, use_numpy, tags={"include": "t70", "exclude": "base"}) == []
+    assert _select(index, use_numpy, tags={"include": "t71", "exclude": "base"}) == [
+        "model.m71",
+        "model.m171",
+        "model.m271",
+    ]
+
+
+def test_select_by_package_and_materialized(index, use_numpy):
+    selected = _select(index, use_numpy, package="finance", materialized="view")
+    assert selected == [f"model.m{idx}" for idx in range(0, 300, 6)]
+
+
+def test_equivalent_selectors_share_selection(index, use_numpy):
+    table = NodeTable(index, use_numpy=use_numpy)
+
+    selected = table.select(tags=TagMatcher(["t1", "t70"]), package=["core", "finance"])
+    assert isinstance(selected, tuple)
+    equivalent = table.select(tags=TagMatcher(["t70", "t1", "t1"]), package=("finance", "core"))
+    assert equivalent is selected
+    assert table.select(tags=TagMatcher(["t1"]), package=["core", "finance"]) is not selected
+    assert (table.memo.hits, table.memo.misses) == (1, 2)
+
+
+def test_selection_key():
+    assert selection_key("model", TagMatcher("a"), "core", ["view", "table"]) == selection_key(
+        "model", TagMatcher(["a", "a"]), ["core"], {"table", "view"}
+    )
+    assert selection_key("model") != selection_key("seed")
+    assert selection_key(package="core") != selection_key(materialized="core")
+
+
+def test_memo_evicts_least_recently_used():
+    memo = SubjectMemo(max_size=10)
+
+    memo.get("a", lambda: [1, 2, 3])
+    memo.get("b", lambda: [4, 5, 6])
+    assert memo.get("a", list) == (1, 2, 3)
+    memo.get("c", lambda: [7, 8])
+    # "b" was used least recently, and a, b and c together exceed the size bound
+    assert len(memo) == 2
+    assert memo.size == 7
+    assert memo.get("b", lambda: [0]) == (0,)
+    assert memo.get("a", list) == (1, 2, 3)
+    assert memo.get("c", list) == (7, 8)
+
+
+def test_memo_skips_selections_larger_than_bound():
+    memo = SubjectMemo(max_size=3)
+
+    assert memo.get("a", lambda: range(5)) == (0, 1, 2, 3, 4)
+    assert len(memo) == 0
+    assert memo.size == 0
@@ -8,6 +8,7 @@ Tests related to validating the dagrules config file
 import pytest
 
 from dagrules.core import (
+    validate,
     validate_root,
     validate_rule_name,
     validate_rule,
@@ -88,6 +89,15 @@ def test_validate_rule_subject_pass():
         assert False, str(err)
 
 
+def test_validate_rule_subject_package_materialized_pass():
+    subject = {"package": "my_project", "materialized": ["table", "view"]}
+
+    try:
+        validate_rule_subject("bob", subject)
+    except ParseError as err:
+        assert False, str(err)
+
+
 def test_validate_rule_subject_fail_unknown_keys():
     subject = {"bruh": "sup"}
 
@@ -109,3 +119,19 @@ def test_validate_rule_must_fail_unknown_keys():
 
     with pytest.raises(ParserAllowedValueError):
         validate_rule_must("bob", must)
+
+
+@pytest.mark.parametrize(
+    "dagrules_yaml",
+    [
+        None,
+        ["version", "rules"],
+        {"version": "1", "rules": "bob"},
+        {"version": "1", "rules": ["bob"]},
+        {"version": "1", "rules": [{"name": "bob", "subject": "sup", "must": {}}]},
+        {"version": "1", "rules": [{"name": "bob", "must": ["have-tags-any"]}]},
+    ],
+)
+def test_validate_fail_shape(dagrules_yaml):
+    with pytest.raises(ParserAllowedValueError):
+        validate(dagrules_yaml)
@@ -0,0 +1,141 @@
+"""
+Tests related to machine-readable results output
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import io
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from dagrules.core import RuleError, check
+from dagrules.formats import write_jsonl, write_junit, write_results, write_sarif
+from dagrules.index import ManifestIndex
+from dagrules.parallel import check_rules
+from dagrules.rules import compile_rules
+from tests.conftest import NAMES_RULE, model_manifest, rules_config
+
+
+@pytest.fixture
+def manifest():
+    return model_manifest(4, names={1: "bad<1>", 3: "bad&3"})
+
+
+@pytest.fixture
+def config():
+    return rules_config(NAMES_RULE, {"name": "tags", "must": {"have-tags-any": "a"}})
+
+
+@pytest.fixture
+def checked(manifest, config):
+    return check_rules(ManifestIndex(manifest), compile_rules(config))
+
+
+def test_jsonl(checked):
+    stream = io.StringIO()
+    assert write_jsonl(checked, stream) == 2
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["type"] for line in lines] == ["violation", "violation", "rule", "rule", "summary"]
+    assert lines[0] == {
+        "type": "violation",
+        "rule": "names",
+        "node": "model.m1",
+        "must": "match-name",
+        "detail": 'For node "model.m1", "bad<1>" does not match pattern /m[0-9]/',
+    }
+    assert lines[2] == {"type": "rule", "rule": "names", "status": "failed", "violations": 2}
+    assert lines[3] == {"type": "rule", "rule": "tags", "status": "passed", "violations": 0}
+    assert lines[4] == {
+        "type": "summary",
+        "rules": 2,
+        "failed": 1,
+        "violations": 2,
+        "stopped": False,
+    }
+
+
+def test_jsonl_stopped(manifest, config):
+    stream = io.StringIO()
+    checked = check_rules(ManifestIndex(manifest), compile_rules(config), max_violations=1)
+    write_jsonl(checked, stream, max_violations=1)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[-1]["stopped"] is True
+    assert lines[-1]["violations"] == 1
+
+
+def test_junit(checked):
+    stream = io.StringIO()
+    assert write_junit(checked, stream) == 2
+
+    root = ET.fromstring(stream.getvalue())
+    suites = root.findall("testsuite")
+    assert [(suite.get("name"), suite.get("failures")) for suite in suites] == [
+        ("names", "1"),
+        ("tags", "0"),
+    ]
+    failure = suites[0].find("testcase/failure")
+    assert failure.get("message") == "2 violation(s)"
+    assert failure.text.splitlines() == [
+        'For node "model.m1", "bad<1>" does not match pattern /m[0-9]/',
+        'For node "model.m3", "bad&3" does not match pattern /m[0-9]/',
+    ]
+    assert suites[1].find("testcase/failure") is None
+
+
+def test_sarif(checked):
+    stream = io.StringIO()
+    assert write_sarif(checked, stream) == 2
+
+    log = json.loads(stream.getvalue())
+    assert log["version"] == "2.1.0"
+    run = log["runs"][0]
+    assert [rule["id"] for rule in run["tool"]["driver"]["rules"]] == ["names", "tags"]
+    assert [result["ruleId"] for result in run["results"]] == ["names", "names"]
+    assert run["results"][1]["locations"][0]["logicalLocations"][0] == {
+        "fullyQualifiedName": "model.m3",
+        "kind": "dbtNode",
+    }
+
+
+def test_sarif_without_violations(manifest, config):
+    manifest["nodes"]["model.m1"]["name"] = "m1"
+    manifest["nodes"]["model.m3"]["name"] = "m3"
+    stream = io.StringIO()
+    assert write_sarif(check_rules(ManifestIndex(manifest), compile_rules(config)), stream) == 0
+    assert json.loads(stream.getvalue())["runs"][0]["results"] == []
+
+
+@pytest.mark.parametrize("output_format", ["jsonl", "junit", "sarif"])
+def test_writes_as_rules_finish(checked, output_format):
+    stream = io.StringIO()
+    written = []
+
+    def rule_results():
+        for rule, violations in checked:
+            yield rule, violations
+            written.append(len(stream.getvalue()))
+
+    write_results(rule_results(), output_format, stream)
+    # Each rule's results are written before the next rule is checked
+    assert 0 < written[0] <= written[1] < len(stream.getvalue())
+
+
+def test_unknown_format(checked):
+    with pytest.raises(ValueError):
+        write_results(checked, "csv", io.StringIO())
+
+
+def test_check_output(manifest, config):
+    stream = io.StringIO()
+    with pytest.raises(RuleError):
+        check(config, manifest, output_format="jsonl", output=stream)
+    assert len(stream.getvalue().splitlines()) == 5
+
+    stream = io.StringIO()
+    with pytest.raises(RuleError):
+        check(config, manifest, output=stream)
+    assert "Checking rule names" in stream.getvalue()
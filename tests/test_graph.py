@@ -0,0 +1,230 @@
+"""
+Tests related to graph metrics, transitive relationships and the reachability index
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import copy
+
+import pytest
+
+from dagrules.core import ParserAllowedValueError, RuleError, check, find_violations
+from dagrules.graph import GraphCycleError, bitset, iter_bits, topological_order
+from dagrules.index import ManifestIndex
+from dagrules.rules import compile_rule
+from dagrules.state import modified_positions
+from tests.conftest import node
+
+
+@pytest.fixture
+def manifest():
+    # source.raw -> model.base -> model.stg -> model.mart -> exposure.dash
+    #                              model.other_base ----^
+    return {
+        "sources": {"source.raw": node("source", "raw")},
+        "nodes": {
+            "model.mart": node("model", "mart", ["mart"], ["model.stg", "model.other_base"]),
+            "model.stg": node("model", "stg", ["staging"], ["model.base"]),
+            "model.base": node("model", "base", ["base", "finance"], ["source.raw"]),
+            "model.other_base": node("model", "other_base", ["base", "marketing"]),
+        },
+        "exposures": {"exposure.dash": node("exposure", "dash", parents=["model.mart"])},
+        "child_map": {
+            "source.raw": ["model.base"],
+            "model.base": ["model.stg"],
+            "model.other_base": ["model.mart"],
+            "model.stg": ["model.mart"],
+            "model.mart": ["exposure.dash"],
+            "exposure.dash": [],
+        },
+    }
+
+
+def _ids(index, positions):
+    return sorted(index.node_ids[pos] for pos in positions)
+
+
+def test_reachability(manifest):
+    index = ManifestIndex(manifest)
+    mart = index.positions["model.mart"]
+
+    assert _ids(index, index.ancestors(mart)) == [
+        "model.base",
+        "model.other_base",
+        "model.stg",
+        "source.raw",
+    ]
+    assert _ids(index, index.descendants(mart)) == ["exposure.dash"]
+    assert _ids(index, index.related(index.positions["source.raw"], "descendant")) == [
+        "exposure.dash",
+        "model.base",
+        "model.mart",
+        "model.stg",
+    ]
+    assert not index.ancestors(index.positions["source.raw"])
+
+
+def test_topological_order(manifest):
+    index = ManifestIndex(manifest)
+    order = topological_order(index)
+
+    assert sorted(order) == list(range(len(index)))
+    rank = {pos: idx for idx, pos in enumerate(order)}
+    for pos in range(len(index)):
+        assert all(rank[parent] < rank[pos] for parent in index.parents(pos))
+
+
+def test_cycle(manifest):
+    manifest["nodes"]["model.base"]["depends_on"]["nodes"].append("model.mart")
+    with pytest.raises(GraphCycleError, match="model.mart"):
+        topological_order(ManifestIndex(manifest))
+
+
+def test_bits():
+    assert list(iter_bits(bitset([0, 3, 9, 64], 100))) == [0, 3, 9, 64]
+    assert not list(iter_bits(bitset([], 10)))
+
+
+def test_have_ancestor_relationship(manifest):
+    config = {
+        "version": "1",
+        "rules": [
+            {
+                "name": "Marts must not depend on marketing base models",
+                "subject": {"tags": "mart"},
+                "must": {
+                    "have-ancestor-relationship": {
+                        "required": False,
+                        "select-tags-any": "base",
+                        "require-tags-any": "finance",
+                    }
+                },
+            }
+        ],
+    }
+
+    violations = list(find_violations(config, manifest))
+    assert [(v.node, v.must) for v in violations] == [("model.mart", "have-ancestor-relationship")]
+    assert '"model.other_base"' in violations[0].detail
+
+
+def test_have_descendant_relationship(manifest):
+    config = {
+        "version": "1",
+        "rules": [
+            {
+                "name": "Every source must reach an exposure",
+                "subject": {"type": "source"},
+                "must": {"have-descendant-relationship": {"select-node-type": "exposure"}},
+            },
+            {
+                "name": "Every base model must reach an exposure",
+                "subject": {"tags": "base"},
+                "must": {"have-descendant-relationship": {"select-node-type": "exposure"}},
+            },
+        ],
+    }
+    assert not list(find_violations(config, manifest))
+
+    del manifest["exposures"]
+    manifest["child_map"]["model.mart"] = []
+    assert [v.node for v in find_violations(config, manifest)] == [
+        "source.raw",
+        "model.base",
+        "model.other_base",
+    ]
+
+
+def test_transitive_state(manifest):
+    previous = copy.deepcopy(manifest)
+    manifest["sources"]["source.raw"]["tags"] = ["pii"]
+    index = ManifestIndex(manifest)
+
+    assert _ids(index, modified_positions(index, previous)) == ["model.base", "source.raw"]
+    assert _ids(index, modified_positions(index, previous, transitive=True)) == [
+        "exposure.dash",
+        "model.base",
+        "model.mart",
+        "model.stg",
+        "source.raw",
+    ]
+
+
+def test_graph_metrics(manifest):
+    index = ManifestIndex(manifest)
+    metrics = index.metrics
+
+    def by_id(values):
+        return {node: values[pos] for pos, node in enumerate(index.node_ids)}
+
+    assert by_id(metrics.depth) == {
+        "source.raw": 0,
+        "model.base": 1,
+        "model.other_base": 0,
+        "model.stg": 2,
+        "model.mart": 3,
+        "exposure.dash": 4,
+    }
+    assert by_id(metrics.min_depth)["model.mart"] == 1
+    assert by_id(metrics.fan_in)["model.mart"] == 2
+    assert by_id(metrics.fan_out)["model.mart"] == 1
+    assert metrics.metric("fan-in") is metrics.fan_in
+    assert index.metrics is metrics
+
+
+def test_max_graph_metrics(manifest):
+    config = {
+        "version": "1",
+        "rules": [
+            {
+                "name": "Lineage depth",
+                "subject": {"type": "exposure"},
+                "must": {"max-depth": 3},
+            },
+            {"name": "Fan in", "must": {"max-fan-in": 1, "max-fan-out": 1}},
+        ],
+    }
+
+    violations = list(find_violations(config, manifest))
+    assert [(v.node, v.must) for v in violations] == [
+        ("exposure.dash", "max-depth"),
+        ("model.mart", "max-fan-in"),
+    ]
+    assert violations[0].detail == 'For node "exposure.dash", depth 4 exceeds the maximum of 3'
+
+
+@pytest.mark.parametrize("limit", [-1, "3", True])
+def test_invalid_max_graph_metric(limit):
+    with pytest.raises(ParserAllowedValueError):
+        compile_rule({"name": "r", "must": {"max-depth": limit}})
+
+
+def test_max_depth_cycle(manifest):
+    manifest["nodes"]["model.base"]["depends_on"]["nodes"].append("model.mart")
+    config = {"version": "1", "rules": [{"name": "depth", "must": {"max-depth": 3}}]}
+
+    (violation,) = find_violations(config, manifest)
+    assert violation.node is None
+    assert "cycle" in violation.detail
+
+
+@pytest.mark.parametrize("jobs,max_violations", [(1, None), (1, 10), (2, None)])
+def test_transitive_relationship_cycle(manifest, jobs, max_violations):
+    manifest["nodes"]["model.base"]["depends_on"]["nodes"].append("model.mart")
+    config = {
+        "version": "1",
+        "rules": [
+            {
+                "name": "ancestors",
+                "subject": {"tags": "mart"},
+                "must": {"have-ancestor-relationship": {"require-tags-any": "base"}},
+            }
+        ],
+    }
+
+    (violation,) = find_violations(config, manifest, jobs=jobs, max_violations=max_violations)
+    assert violation.node is None
+    assert violation.must == "have-ancestor-relationship"
+    assert "cycle" in violation.detail
+    with pytest.raises(RuleError):
+        check(config, manifest)
@@ -0,0 +1,92 @@
+"""
+Tests related to indexing the dbt manifest
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from dagrules.index import ManifestIndex
+from dagrules.records import Node
+
+
+@pytest.fixture
+def manifest():
+    return {
+        "sources": {"source.a": {"resource_type": "source", "name": "a"}},
+        "nodes": {
+            "snapshot.b": {
+                "resource_type": "snapshot",
+                "name": "b",
+                "depends_on": {"nodes": ["source.a"]},
+            },
+            "model.c": {
+                "resource_type": "model",
+                "name": "c",
+                "depends_on": {"nodes": ["snapshot.b"]},
+            },
+            "model.d": {
+                "resource_type": "model",
+                "name": "d",
+                "depends_on": {"nodes": ["snapshot.b", "model.c"]},
+            },
+        },
+        "child_map": {
+            "source.a": ["snapshot.b"],
+            "snapshot.b": ["model.c", "model.d"],
+            "model.c": ["model.d", "exposure.not_indexed"],
+        },
+    }
+
+
+def _ids(index, positions):
+    return [index.node_ids[pos] for pos in positions]
+
+
+def test_interns_node_ids(manifest):
+    index = ManifestIndex(manifest)
+
+    assert len(index) == 4
+    assert all(index.node_ids[index.positions[node]] == node for node in index.node_ids)
+
+
+def test_holds_node_records(manifest):
+    index = ManifestIndex(manifest)
+    node = index.nodes[index.positions["model.c"]]
+
+    assert isinstance(node, Node)
+    assert (node.unique_id, node.resource_type, node.name) == ("model.c", "model", "c")
+    assert dict(node) == {"resource_type": "model", "name": "c"}
+
+
+def test_buckets_by_resource_type(manifest):
+    index = ManifestIndex(manifest)
+
+    assert _ids(index, index.of_type("model")) == ["model.c", "model.d"]
+    assert _ids(index, index.of_type("source")) == ["source.a"]
+    assert index.of_type("seed") == []
+
+
+def test_parent_adjacency(manifest):
+    index = ManifestIndex(manifest)
+
+    assert _ids(index, index.parents(index.positions["model.d"])) == ["snapshot.b", "model.c"]
+    assert _ids(index, index.parents(index.positions["source.a"])) == []
+
+
+def test_child_adjacency_drops_unknown_nodes(manifest):
+    index = ManifestIndex(manifest)
+
+    assert _ids(index, index.children(index.positions["model.c"])) == ["model.d"]
+    assert _ids(index, index.children(index.positions["model.d"])) == []
+
+
+def test_node_view(manifest):
+    index = ManifestIndex(manifest)
+    view = index.view(index.positions["snapshot.b"])
+
+    assert view["name"] == "b"
+    assert view["children"] == ["model.c", "model.d"]
+    assert dict(view["parent_params"]) == {"source.a": manifest["sources"]["source.a"]}
+    assert "model.c" in view["child_params"]
+    assert "source.a" not in view["child_params"]
@@ -0,0 +1,94 @@
+"""
+Tests related to streaming the dbt manifest
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import io
+import json
+import os
+
+import pytest
+
+from dagrules.loader import ManifestDecodeError, load_manifest, read_manifest, slim_node
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def manifest():
+    return {
+        "metadata": {"dbt_version": "1.0.0", "env": {}},
+        "nodes": {
+            "model.a": {
+                "resource_type": "model",
+                "name": "a",
+                "tags": ["staging"],
+                "package_name": "db",
+                "config": {"materialized": "view", "enabled": True},
+                "depends_on": {"nodes": ["source.b"], "macros": ["macro.x"]},
+                "compiled_sql": 'select "{[}]" as \\"tricky\\", 1.5e3 as n',
+                "columns": {"id": {"name": "id", "description": 'An "id" \\ {'}},
+            }
+        },
+        "sources": {"source.b": {"resource_type": "source", "name": "b", "tags": []}},
+        "macros": {"macro.x": {"macro_sql": "{% macro x() %} [ { {% endmacro %}", "depth": 12}},
+        "child_map": {"source.b": ["model.a"], "model.a": []},
+        "docs": [],
+        "selectors": {},
+        "generated_at": 1234.5,
+    }
+
+
+def _read(manifest, chunk_size):
+    return read_manifest(io.StringIO(json.dumps(manifest, indent=2)), chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_keeps_only_used_fields(manifest, chunk_size):
+    assert _read(manifest, chunk_size) == {
+        "nodes": {
+            "model.a": {
+                "resource_type": "model",
+                "name": "a",
+                "tags": ["staging"],
+                "package_name": "db",
+                "config": {"materialized": "view"},
+                "depends_on": {"nodes": ["source.b"]},
+            }
+        },
+        "sources": {"source.b": {"resource_type": "source", "name": "b", "tags": []}},
+        "child_map": {"source.b": ["model.a"], "model.a": []},
+    }
+
+
+def test_selected_fields(manifest):
+    slimmed = read_manifest(io.StringIO(json.dumps(manifest)), fields=["name"])
+    assert slimmed["nodes"] == {"model.a": {"name": "a"}}
+
+
+def test_slim_node_missing_fields():
+    assert slim_node({"resource_type": "model", "config": None}) == {"resource_type": "model"}
+
+
+def test_empty_manifest():
+    assert read_manifest(io.StringIO('{"nodes": {}, "child_map": {}}')) == {
+        "nodes": {},
+        "child_map": {},
+    }
+
+
+def test_truncated_manifest(manifest):
+    text = json.dumps(manifest)
+    with pytest.raises(ManifestDecodeError):
+        read_manifest(io.StringIO(text[: len(text) // 2]), chunk_size=16)
+
+
+def test_fixture_manifest_matches_json_load():
+    path = os.path.join(TEST_DIR, "manifest.json")
+    with open(path, encoding="utf-8") as manifest_file:
+        expected = json.load(manifest_file)
+
+    assert load_manifest(path, chunk_size=100, parser="stdlib") == {
+        section: expected[section] for section in ("sources", "nodes", "child_map")
+    }
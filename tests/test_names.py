@@ -0,0 +1,90 @@
+"""
+Tests related to name pattern matching
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from dagrules.core import find_violations
+from dagrules.index import ManifestIndex
+from dagrules.names import PatternBatch, batch_name_patterns, batched, compile_name_pattern
+from dagrules.rules import compile_rules
+
+NAMES = ["stg_orders", "stg_", "base_orders", "orders_snapshot", "my_finance_mart", "x"]
+
+
+@pytest.mark.parametrize(
+    "pattern,expected",
+    [
+        ("/stg_.*/", ["stg_orders", "stg_"]),
+        ("/orders/", []),
+        ("x", ["x"]),
+        ("stg_*", ["stg_orders", "stg_"]),
+        ("*_snapshot", ["orders_snapshot"]),
+        ("*finance*", ["my_finance_mart"]),
+        ("*", NAMES),
+        ("?", ["x"]),
+        ("*_orders", ["stg_orders", "base_orders"]),
+        ("[sb]*_orders", ["stg_orders", "base_orders"]),
+    ],
+)
+def test_compile_name_pattern(pattern, expected):
+    _, matches = compile_name_pattern(pattern)
+    assert [name for name in NAMES if matches(name)] == expected
+
+
+def test_pattern_batch():
+    index = ManifestIndex(
+        {"nodes": {f"model.{name}": {"resource_type": "model", "name": name} for name in NAMES}}
+    )
+    batch = PatternBatch(["stg_.*", "(stg|base)_[a-z]+", "x"])
+    positions = list(range(len(NAMES)))
+
+    assert batch.mismatches(index, positions, 0) == [2, 3, 4, 5]
+    assert batch.mismatches(index, positions, 1) == [1, 3, 4, 5]
+    assert batch.mismatches(index, positions[::-1], 2) == [4, 3, 2, 1, 0]
+
+
+def _config(*patterns, subject=None):
+    return {
+        "version": "1",
+        "rules": [
+            {"name": pattern, "subject": subject or {}, "must": {"match-name": pattern}}
+            for pattern in patterns
+        ],
+    }
+
+
+def test_batches_shared_subjects():
+    index = ManifestIndex({"nodes": {}})
+    rules = compile_rules(_config("/a.*/", "/b.*/", r"/(.)\1/", "c*"))
+    rules += compile_rules(_config("/d.*/", subject={"type": "seed"}))
+    batch_name_patterns(index, rules)
+
+    assert batched(index, "a.*")[0] is batched(index, "b.*")[0]
+    assert batched(index, "b.*")[1] == 1
+    # Backreferences cannot be combined, globs and lone patterns do not need to be
+    assert batched(index, r"(.)\1") is None
+    assert batched(index, "d.*") is None
+
+
+def test_batched_violations_match_unbatched():
+    manifest = {
+        "nodes": {
+            f"model.{name}": {"resource_type": "model", "name": name, "tags": []} for name in NAMES
+        }
+    }
+    config = _config("/stg_.*/", "/(stg|base)_[a-z]+/", "*orders*", "/stg_[a-z]+/")
+    violations = list(find_violations(config, manifest))
+    expected = [
+        (rule["name"], f"model.{name}")
+        for rule in config["rules"]
+        for name in NAMES
+        if not compile_name_pattern(rule["must"]["match-name"])[1](name)
+    ]
+    assert [(v.rule, v.node) for v in violations] == expected
+    assert (
+        violations[0].detail
+        == 'For node "model.base_orders", "base_orders" does not match pattern /stg_.*/'
+    )
@@ -0,0 +1,115 @@
+"""
+Tests related to checking rules in parallel
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import json
+import os
+
+import pytest
+import yaml
+
+from dagrules import parallel
+from dagrules.index import ManifestIndex
+from dagrules.parallel import check_rules, shard_bounds
+from dagrules.rules import compile_rule, compile_rules
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def manifest():
+    with open(os.path.join(TEST_DIR, "manifest.json"), encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+@pytest.fixture
+def index(manifest):
+    return ManifestIndex(manifest)
+
+
+@pytest.fixture
+def rules():
+    with open(os.path.join(TEST_DIR, "dagrules.yml"), encoding="utf-8") as rules_file:
+        config = yaml.safe_load(rules_file)
+
+    # Add some failing rules in between the passing ones
+    config["rules"].insert(2, {"name": "fail name", "must": {"match-name": "/nope_.*/"}})
+    config["rules"].append(
+        {"name": "fail tags", "subject": {"type": "source"}, "must": {"have-tags-any": "x"}}
+    )
+    return compile_rules(config)
+
+
+def _results(index, rules, jobs):
+    return [(rule.name, violations) for rule, violations in check_rules(index, rules, jobs=jobs)]
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_parallel_matches_serial(index, rules, jobs):
+    assert _results(index, rules, jobs) == _results(index, rules, 1)
+
+
+def test_results_in_rule_order(index, rules):
+    results = _results(index, rules, 3)
+
+    assert [name for name, _ in results] == [rule.name for rule in rules]
+    assert [name for name, violations in results if violations] == ["fail name", "fail tags"]
+
+
+@pytest.mark.parametrize("jobs", [2, 3])
+def test_sharded_matches_serial(index, rules, jobs):
+    sharded = [
+        (rule.name, violations)
+        for rule, violations in check_rules(index, rules, jobs, min_shard_size=1)
+    ]
+    assert sharded == _results(index, rules, 1)
+
+
+def test_sharded_reports_violations_must_by_must():
+    nodes = {
+        f"model.m{idx}": {"resource_type": "model", "name": f"m{idx}", "tags": ["a"]}
+        for idx in range(10)
+    }
+    # The last node breaks the first must, the first node breaks the second must
+    nodes["model.m9"]["name"] = "bad"
+    nodes["model.m0"]["tags"] = ["b"]
+    index = ManifestIndex({"nodes": nodes})
+    rule = compile_rule({"name": "r", "must": {"match-name": "/m[0-9]/", "have-tags-any": "a"}})
+
+    ((_, serial),) = check_rules(index, [rule], jobs=1)
+    ((_, sharded),) = check_rules(index, [rule], jobs=4, min_shard_size=1)
+    assert sharded == serial
+    assert [violation.node for violation in sharded] == ["model.m9", "model.m0"]
+
+
+def test_shard_bounds():
+    assert shard_bounds(0, 4) == [(0, 0)]
+    assert shard_bounds(10, 4, min_shard_size=100) == [(0, 10)]
+    assert shard_bounds(10, 4, min_shard_size=5) == [(0, 5), (5, 10)]
+    assert shard_bounds(10, 3, min_shard_size=1) == [(0, 3), (3, 6), (6, 10)]
+
+
+def test_builds_graph_structures_before_forking(manifest, index, monkeypatch):
+    rules = compile_rules(
+        {
+            "rules": [
+                {"name": "a", "must": {"have-ancestor-relationship": {"required": False}}},
+                {"name": "d", "must": {"max-depth": 10}},
+            ]
+        }
+    )
+    built = []
+
+    def pool(jobs, pool_index, *args):
+        # pylint: disable=protected-access
+        built.append((pool_index._reachability is not None, pool_index._metrics is not None))
+        return original_pool(jobs, pool_index, *args)
+
+    original_pool = parallel._pool  # pylint: disable=protected-access
+    monkeypatch.setattr(parallel, "_pool", pool)
+    sharded = list(check_rules(index, rules, jobs=2, min_shard_size=1))
+
+    assert built == [(True, True)]
+    assert sharded == list(check_rules(ManifestIndex(manifest), rules))
@@ -0,0 +1,135 @@
+"""
+Tests related to the pluggable manifest and config parsers
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import gc
+import json
+import os
+
+import pytest
+import yaml
+
+from dagrules import parsers
+from dagrules.loader import ManifestDecodeError, load_manifest, slim_manifest
+from dagrules.parsers import PARSERS, gc_paused, json_parser, load_yaml, yaml_loader
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+MANIFEST_PATH = os.path.join(TEST_DIR, "manifest.json")
+
+
+def _not_installed():
+    raise ImportError("not installed")
+
+
+@pytest.fixture
+def no_fast_parsers(monkeypatch):
+    for name in parsers.JSON_PARSERS:
+        monkeypatch.setitem(parsers.JSON_PARSERS, name, _not_installed)
+
+
+def test_stdlib_parser():
+    assert json_parser("stdlib") == ("stdlib", None, None)
+
+
+def test_auto_picks_msgspec():
+    pytest.importorskip("msgspec")
+    name, loads, _ = json_parser()
+    assert name == "msgspec"
+    assert loads(b'{"a": [1]}') == {"a": [1]}
+
+
+def test_auto_streams_without_msgspec(monkeypatch):
+    # orjson and simdjson hold the whole manifest in memory, so they are only used on request
+    monkeypatch.setitem(parsers.JSON_PARSERS, "msgspec", _not_installed)
+    assert json_parser() == ("stdlib", None, None)
+
+
+def test_auto_falls_back_to_stdlib(no_fast_parsers):  # pylint: disable=unused-argument
+    assert json_parser() == ("stdlib", None, None)
+
+
+def test_missing_parser(no_fast_parsers):  # pylint: disable=unused-argument
+    with pytest.raises(ImportError, match="requires msgspec"):
+        json_parser("msgspec")
+
+
+def test_unknown_parser():
+    with pytest.raises(ValueError):
+        json_parser("ujson")
+    with pytest.raises(ValueError):
+        yaml_loader("ujson")
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_parsers_agree(parser):
+    try:
+        json_parser(parser)
+    except ImportError:
+        pytest.skip(f"{parser} is not installed")
+    assert load_manifest(MANIFEST_PATH, parser=parser) == load_manifest(
+        MANIFEST_PATH, parser="stdlib"
+    )
+
+
+def test_invalid_manifest(tmp_path):
+    pytest.importorskip("orjson")
+    path = tmp_path / "manifest.json"
+    path.write_text('{"nodes": {', encoding="utf-8")
+    with pytest.raises(ManifestDecodeError):
+        load_manifest(str(path), parser="orjson")
+
+    with pytest.raises(ManifestDecodeError):
+        slim_manifest([])
+
+
+def test_slim_manifest():
+    with open(MANIFEST_PATH, encoding="utf-8") as manifest_file:
+        document = json.load(manifest_file)
+    assert slim_manifest(document, fields=["name"])["nodes"] == {
+        node: {"name": params["name"]} for node, params in document["nodes"].items()
+    }
+
+
+def test_yaml_loader():
+    assert yaml_loader("stdlib") is yaml.SafeLoader
+    assert yaml_loader() is getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@pytest.mark.parametrize("parser", ["auto", "stdlib"])
+def test_load_yaml(parser):
+    with open(os.path.join(TEST_DIR, "dagrules.yml"), encoding="utf-8") as rules_file:
+        expected = yaml.safe_load(rules_file)
+        rules_file.seek(0)
+        assert load_yaml(rules_file, parser) == expected
+
+
+def test_gc_paused():
+    assert gc.isenabled()
+    with gc_paused():
+        assert not gc.isenabled()
+    assert gc.isenabled()
+
+    gc.disable()
+    try:
+        with gc_paused():
+            pass
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+
+def test_typed_decoding_falls_back(tmp_path):
+    pytest.importorskip("msgspec")
+    path = tmp_path / "manifest.json"
+    manifest = {
+        "nodes": {
+            "model.a": {"resource_type": "model", "name": "a", "config": None},
+            "model.b": {"resource_type": "model", "name": "b", "config": {"materialized": "view"}},
+        },
+        "docs": {"doc.x": {"block_contents": "skipped"}},
+    }
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    assert load_manifest(str(path), parser="msgspec") == load_manifest(str(path), parser="stdlib")
@@ -0,0 +1,121 @@
+"""
+Tests related to fusing rules that check the same subjects into a single pass
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import json
+import os
+
+import pytest
+import yaml
+
+from dagrules.index import ManifestIndex
+from dagrules.planner import fused_violations, plan
+from dagrules.rules import compile_rules
+from tests.conftest import model
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def index():
+    nodes = {
+        "model.m0": model("m0"),
+        "model.m1": model("m1", ["m0"], tags=["b"]),
+        "model.bad2": model("bad2", ["m0", "m1"]),
+        "model.m3": model("m3", ["bad2"], tags=[]),
+    }
+    child_map = {
+        "model.m0": ["model.m1", "model.bad2"],
+        "model.m1": ["model.bad2"],
+        "model.bad2": ["model.m3"],
+    }
+    return ManifestIndex({"nodes": nodes, "child_map": child_map})
+
+
+def _sequential(index, rules, positions):
+    return [list(rule.violations(index, positions)) for rule in rules]
+
+
+def test_plan():
+    assert plan([[0, 1], [2], [0, 1], [], [2], []]) == [[0, 2], [1, 4], [3, 5]]
+
+
+def test_fused_matches_sequential(index):
+    rules = compile_rules(
+        {
+            "version": "1",
+            "rules": [
+                {
+                    "name": "names and tags",
+                    "must": {"match-name": "/m[0-9]/", "have-tags-any": ["a", "b"]},
+                },
+                {
+                    "name": "relationships",
+                    "must": {
+                        "have-parent-relationship": {"required": False, "require-tags-any": "a"},
+                        "have-child-relationship": {"cardinality": "one_to_one"},
+                        "have-ancestor-relationship": {"required": False, "require-tags-any": "a"},
+                    },
+                },
+                {"name": "metrics", "must": {"max-fan-in": 1}},
+                {"name": "globs", "must": {"match-name": "m*"}},
+            ],
+        }
+    )
+    positions = list(range(len(index.node_ids)))
+
+    fused = fused_violations(index, rules, positions)
+    assert fused == _sequential(index, rules, positions)
+    assert all(fused)
+
+
+def test_batched_names(index):
+    rules = compile_rules(
+        {
+            "version": "1",
+            "rules": [
+                {"name": f"names {idx}", "must": {"match-name": f"/m[0-{idx}]/"}}
+                for idx in range(3)
+            ],
+        }
+    )
+    positions = [0, 2, 3]
+    assert fused_violations(index, rules, positions) == _sequential(index, rules, positions)
+
+
+def test_cycle_falls_back():
+    rules = compile_rules(
+        {
+            "version": "1",
+            "rules": [
+                {"name": "names", "must": {"match-name": "/m[0-9]/"}},
+                {"name": "depth", "must": {"max-depth": 5}},
+            ],
+        }
+    )
+    cyclic = ManifestIndex(
+        {
+            "nodes": {
+                "model.m0": model("m0", ["m1"]),
+                "model.m1": model("m1", ["m0"]),
+            }
+        }
+    )
+
+    fused = fused_violations(cyclic, rules, [0, 1])
+    assert fused == _sequential(cyclic, rules, [0, 1])
+    assert [violation.node for violation in fused[1]] == [None]
+
+
+def test_example_rules():
+    with open(os.path.join(TEST_DIR, "manifest.json"), encoding="utf-8") as manifest_file:
+        index = ManifestIndex(json.load(manifest_file))
+    with open(os.path.join(TEST_DIR, "dagrules.yml"), encoding="utf-8") as rules_file:
+        rules = compile_rules(yaml.safe_load(rules_file))
+
+    for group in plan([rule.subject.select(index) for rule in rules]):
+        grouped = [rules[rule_idx] for rule_idx in group]
+        positions = rules[group[0]].subject.select(index)
+        assert fused_violations(index, grouped, positions) == _sequential(index, grouped, positions)
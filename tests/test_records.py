@@ -0,0 +1,95 @@
+"""
+Tests related to the compact node records
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import pickle
+import sys
+
+import pytest
+
+from dagrules.index import ManifestIndex
+from dagrules.loader import MANIFEST_FIELDS, slim_node
+from dagrules.records import Node
+
+
+@pytest.fixture
+def params():
+    return {
+        "resource_type": "model",
+        "name": "stg_orders",
+        "unique_id": "model.shop.stg_orders",
+        "tags": ["staging", "orders"],
+        "package_name": "shop",
+        "path": "staging/stg_orders.sql",
+        "config": {"materialized": "view", "enabled": True},
+        "depends_on": {"nodes": ["source.shop.orders"], "macros": []},
+        "compiled_sql": "select * from orders",
+        "columns": {"id": {"name": "id"}},
+    }
+
+
+def test_from_params(params):
+    node = Node.from_params("model.shop.stg_orders", params)
+
+    assert node.unique_id == "model.shop.stg_orders"
+    assert node.resource_type == "model"
+    assert node.name == "stg_orders"
+    assert node.tags == ("staging", "orders")
+    assert node.package_name == "shop"
+    assert node.path == "staging/stg_orders.sql"
+    assert node.materialized == "view"
+    assert not hasattr(node, "__dict__")
+
+
+def test_missing_attributes():
+    node = Node.from_params("source.a", {"resource_type": "source", "config": None})
+
+    assert (node.name, node.tags, node.materialized) == (None, None, None)
+    assert dict(node) == {"resource_type": "source"}
+
+
+def test_behaves_like_slimmed_manifest_dict(params):
+    node = Node.from_params("model.shop.stg_orders", params)
+
+    fields = [field for field in MANIFEST_FIELDS if field != "depends_on.nodes"]
+    assert node == slim_node(params, fields)
+    assert node["tags"] == ["staging", "orders"]
+    assert node.get("config", {}).get("materialized") == "view"
+    assert node.get("depends_on") is None
+    with pytest.raises(KeyError):
+        node["compiled_sql"]  # pylint: disable=pointless-statement
+
+
+def test_tags_are_interned_and_shared(params):
+    shared_tags = {}
+    first = Node.from_params("model.a", params, shared_tags)
+    second = Node.from_params("model.b", {"tags": ["staging", "orders"]}, shared_tags)
+
+    assert first.tags is second.tags
+    assert first.tags[0] is sys.intern("".join(["stag", "ing"]))
+
+
+def test_index_shares_tags():
+    index = ManifestIndex(
+        {
+            "nodes": {
+                f"model.m{idx}": {"resource_type": "model", "name": f"m{idx}", "tags": ["a"]}
+                for idx in range(3)
+            }
+        }
+    )
+    assert len({id(node.tags) for node in index.nodes}) == 1
+
+
+def test_pickle(params):
+    node = Node.from_params("model.shop.stg_orders", params)
+    copy = pickle.loads(pickle.dumps(node))
+
+    assert copy == node
+    assert (copy.unique_id, copy.tags, copy.materialized) == (
+        node.unique_id,
+        node.tags,
+        node.materialized,
+    )
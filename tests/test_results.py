@@ -0,0 +1,200 @@
+"""
+Tests related to the persistent rule result cache
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import copy
+
+import pytest
+
+from dagrules import parallel
+from dagrules import results as results_module
+from dagrules.core import find_violations
+from dagrules.index import ManifestIndex
+from dagrules.parallel import check_rules
+from dagrules.planner import fused_violations
+from dagrules.results import ResultStore, input_hash, input_hashes, rule_fingerprint
+from dagrules.rules import Rule, compile_rule, compile_rules
+from tests.conftest import NAMES_RULE, model, model_manifest, rules_config
+
+
+@pytest.fixture
+def manifest():
+    return model_manifest(6, chained=True, names={2: "bad2"}, tags={4: ["b"]})
+
+
+@pytest.fixture
+def config():
+    return rules_config(
+        NAMES_RULE,
+        {
+            "name": "parents",
+            "must": {
+                "have-tags-any": ["a", "b"],
+                "have-parent-relationship": {"required": False, "require-tags-any": "a"},
+            },
+        },
+    )
+
+
+class CountingRule(Rule):
+    "Counts the subjects each check of the rule is evaluated on"
+
+    __slots__ = ()
+    checked = []
+
+    def violations(self, index, positions=None, musts=None):
+        CountingRule.checked.extend(index.node_ids[pos] for pos in positions)
+        return super().violations(index, positions, musts)
+
+
+@pytest.fixture(autouse=True)
+def count_fused(monkeypatch):
+    "Counts the subjects of the rules evaluated together in a single pass too"
+
+    def counting_fused_violations(index, rules, positions):
+        for rule in rules:
+            if isinstance(rule, CountingRule):
+                CountingRule.checked.extend(index.node_ids[pos] for pos in positions)
+        return fused_violations(index, rules, positions)
+
+    monkeypatch.setattr(parallel, "fused_violations", counting_fused_violations)
+
+
+def _counting(rules):
+    return [CountingRule(rule.name, rule.subject, rule.musts) for rule in rules]
+
+
+def _run(manifest, rules, store, **kwargs):
+    CountingRule.checked = []
+    index = ManifestIndex(manifest)
+    checked = list(check_rules(index, rules, results=store, **kwargs))
+    store.save(rules)
+    return [violation for _, violations in checked for violation in violations]
+
+
+def test_reuses_results(tmp_path, manifest, config):
+    path = str(tmp_path / "results.pickle")
+    rules = _counting(compile_rules(config))
+    expected = list(find_violations(config, manifest))
+
+    assert _run(manifest, rules, ResultStore(path)) == expected
+    assert len(CountingRule.checked) == 12
+
+    assert _run(manifest, rules, ResultStore(path)) == expected
+    assert not CountingRule.checked
+
+
+def test_changed_nodes_rechecked(tmp_path, manifest, config):
+    path = str(tmp_path / "results.pickle")
+    rules = _counting(compile_rules(config))
+    _run(manifest, rules, ResultStore(path))
+
+    changed = copy.deepcopy(manifest)
+    changed["nodes"]["model.m2"]["name"] = "m2"
+    changed["nodes"]["model.m0"]["tags"] = ["b"]
+    violations = _run(changed, rules, ResultStore(path))
+
+    assert violations == list(find_violations(config, changed))
+    # The name rule only reads the node itself, the parents rule also reads the parents
+    assert sorted(CountingRule.checked) == [
+        "model.m0",
+        "model.m0",
+        "model.m1",
+        "model.m2",
+        "model.m2",
+        "model.m3",
+    ]
+
+
+def test_only_edited_rules_rerun(tmp_path, manifest, config):
+    path = str(tmp_path / "results.pickle")
+    _run(manifest, _counting(compile_rules(config)), ResultStore(path))
+
+    config["rules"][0]["must"]["match-name"] = "/[a-z]+[0-9]/"
+    rules = _counting(compile_rules(config))
+    violations = _run(manifest, rules, ResultStore(path))
+
+    assert violations == list(find_violations(config, manifest))
+    assert len(CountingRule.checked) == 6
+
+
+@pytest.mark.parametrize("max_violations", [1, 2])
+def test_truncated_results_not_recorded(tmp_path, manifest, config, max_violations):
+    path = str(tmp_path / "results.pickle")
+    rules = _counting(compile_rules(config))
+    violations = _run(manifest, rules, ResultStore(path), max_violations=max_violations)
+    assert violations == list(find_violations(config, manifest))[:max_violations]
+
+    assert _run(manifest, rules, ResultStore(path)) == list(find_violations(config, manifest))
+
+
+def test_parallel_reuses_results(tmp_path, manifest, config):
+    path = str(tmp_path / "results.pickle")
+    rules = compile_rules(config)
+    expected = list(find_violations(config, manifest))
+
+    assert _run(manifest, rules, ResultStore(path), jobs=2, min_shard_size=1) == expected
+    assert _run(manifest, rules, ResultStore(path), jobs=2, min_shard_size=1) == expected
+
+
+def test_unchanged_results_not_saved(tmp_path, manifest, config, monkeypatch):
+    path = str(tmp_path / "results.pickle")
+    rules = compile_rules(config)
+    _run(manifest, rules, ResultStore(path))
+
+    writes = []
+    monkeypatch.setattr(results_module, "_write_atomic", lambda *args: writes.append(args))
+    assert _run(manifest, rules, ResultStore(path)) == list(find_violations(config, manifest))
+    assert not writes
+
+
+def test_cycle_reported_from_results(tmp_path):
+    manifest = {"nodes": {"model.a": model("a", ["b"]), "model.b": model("b", ["a"])}}
+    config = rules_config({"name": "depth", "must": {"max-depth": 3}})
+    path = str(tmp_path / "results.pickle")
+    rules = compile_rules(config)
+    expected = list(find_violations(config, manifest))
+
+    assert [violation.node for violation in expected] == [None]
+    assert _run(manifest, rules, ResultStore(path)) == expected
+    assert _run(manifest, rules, ResultStore(path)) == expected
+
+
+def test_unreadable_store(tmp_path):
+    path = tmp_path / "results.pickle"
+    path.write_bytes(b"garbage")
+    assert not ResultStore(str(path)).rules
+
+
+def test_fingerprints(manifest):
+    index = ManifestIndex(manifest)
+    names = compile_rule({"name": "r", "must": {"match-name": "/m.*/"}})
+    parents = compile_rule({"name": "r", "must": {"have-parent-relationship": {}}})
+
+    assert rule_fingerprint(names) == rule_fingerprint(copy.deepcopy(names))
+    assert rule_fingerprint(names) != rule_fingerprint(parents)
+    assert not names.relationships
+    assert parents.relationships == ("parent",)
+    assert input_hash(names, index, 1) != input_hash(names, index, 2)
+    assert input_hash(names, index, 1) != input_hash(parents, index, 1)
+    # Hashes are computed once per index and relationships, for all the rules reading them
+    assert input_hashes(index, ("parent",), [1]) is input_hashes(index, ("parent",), [2])
+
+
+def test_transitive_input_hash(manifest):
+    index = ManifestIndex(manifest)
+    rule = compile_rule({"name": "r", "must": {"have-ancestor-relationship": {}}})
+    hashes = [input_hash(rule, index, pos) for pos in range(len(index))]
+
+    changed = copy.deepcopy(manifest)
+    changed["nodes"]["model.m0"]["tags"] = ["c"]
+    changed_index = ManifestIndex(changed)
+    changed_hashes = [input_hash(rule, changed_index, pos) for pos in range(len(index))]
+
+    # Every node descends from m0, and its ancestors' hash changed along with m0's tags
+    assert all(old != new for old, new in zip(hashes, changed_hashes))
+
+    changed["nodes"]["model.m0"]["tags"] = ["a"]
+    assert [input_hash(rule, ManifestIndex(changed), pos) for pos in range(6)] == hashes
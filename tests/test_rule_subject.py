@@ -128,3 +128,52 @@ def test_selected_parent_properties():
         "model.b": ["base", "staging"],
     }
     assert actual == expected
+
+
+def test_identify_model_by_package_and_materialized():
+    manifest = {
+        "nodes": {
+            "model.a": {
+                "resource_type": "model",
+                "package_name": "a",
+                "config": {"materialized": "view"},
+            },
+            "model.b": {
+                "resource_type": "model",
+                "package_name": "a",
+                "config": {"materialized": "table"},
+            },
+            "model.c": {
+                "resource_type": "model",
+                "package_name": "c",
+                "config": {"materialized": "table"},
+            },
+        }
+    }
+
+    subjects = rule_subjects(manifest, package="a", materialized=["table", "incremental"])
+
+    actual = sorted(list(subjects.keys()))
+    expected = sorted(["model.b"])
+    assert actual == expected
+
+
+def test_subjects_are_lazy_views():
+    manifest = {
+        "nodes": {
+            "model.a": {"resource_type": "model", "name": "a", "tags": ["staging"]},
+            "model.b": {"resource_type": "model", "name": "b", "tags": []},
+            "model.c": {"resource_type": "model", "name": "c", "tags": ["staging"]},
+        }
+    }
+
+    subjects = rule_subjects(manifest, tags="staging")
+
+    assert list(subjects.positions) == [0, 2]
+    assert len(subjects) == 2
+    assert "model.c" in subjects
+    assert "model.b" not in subjects
+    assert "model.x" not in subjects
+    assert subjects["model.c"]["name"] == "c"
+    assert [view["name"] for view in subjects.values()] == ["a", "c"]
+    assert dict(subjects.items())["model.a"].position == 0
@@ -0,0 +1,124 @@
+"""
+Tests related to compiling dagrules rules
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import os
+import pickle
+
+import pytest
+import yaml
+
+from dagrules.core import ParserAllowedValueError, RuleError
+from dagrules.index import ManifestIndex
+from dagrules.rules import HaveRelationship, MatchName, Must, Rule, compile_rule, compile_rules
+from dagrules.tags import TagMatcher
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def config():
+    with open(os.path.join(TEST_DIR, "dagrules.yml"), encoding="utf-8") as rules_file:
+        return yaml.safe_load(rules_file)
+
+
+@pytest.fixture
+def index():
+    return ManifestIndex(
+        {
+            "nodes": {
+                "model.stg_a": {"resource_type": "model", "name": "stg_a", "tags": ["staging"]},
+                "model.base_b": {"resource_type": "model", "name": "base_b", "tags": ["base"]},
+            }
+        }
+    )
+
+
+def test_compile_rules(config):
+    rules = compile_rules(config)
+
+    assert [rule.name for rule in rules] == [rule["name"] for rule in config["rules"]]
+    assert all(isinstance(rule, Rule) for rule in rules)
+
+
+def test_compile_relationship():
+    rule = compile_rule(
+        {
+            "name": "bob",
+            "subject": {"type": "snapshot"},
+            "must": {"have-child-relationship": {"cardinality": "one_to_one", "required": False}},
+        }
+    )
+
+    (must,) = rule.musts
+    assert isinstance(must, HaveRelationship)
+    assert must.must_type == "have-child-relationship"
+    assert must.cardinality == "one_to_one"
+    assert must.required is False
+    assert rule.subject.node_type == "snapshot"
+
+
+def test_compile_unknown_relationship_argument():
+    with pytest.raises(ParserAllowedValueError):
+        compile_rule({"name": "bob", "must": {"have-parent-relationship": {"monkeys": "not here"}}})
+
+
+@pytest.mark.parametrize(
+    "must",
+    [
+        {"match-name": "/stg_(/"},
+        {"match-name": 5},
+        {"have-tags-any": 5},
+        {"have-parent-relationship": "bruh"},
+    ],
+)
+def test_compile_invalid_parameters(must):
+    with pytest.raises(ParserAllowedValueError, match='rule "bob"'):
+        compile_rule({"name": "bob", "must": must})
+
+
+def test_compile_match_name_regex():
+    must = MatchName("/stg_.*/")
+
+    assert must.regex.pattern == "stg_.*"
+
+
+def test_compiled_rules_are_immutable(config):
+    rule = compile_rules(config)[0]
+
+    with pytest.raises(AttributeError):
+        rule.name = "bob"
+    with pytest.raises(AttributeError):
+        rule.other = "bob"
+    with pytest.raises(AttributeError):
+        rule.musts[0].pattern = "bob"
+
+
+def test_must_is_abstract():
+    with pytest.raises(TypeError):
+        Must()  # pylint: disable=abstract-class-instantiated
+
+
+def test_compiled_rules_pickle(config):
+    rules = compile_rules(config)
+
+    assert repr(pickle.loads(pickle.dumps(rules))) == repr(rules)
+
+
+def test_rule_check(index):
+    passing = compile_rule(
+        {"name": "a", "subject": {"tags": "staging"}, "must": {"match-name": "/stg_.*/"}}
+    )
+    failing = compile_rule({"name": "b", "must": {"match-name": "/stg_.*/"}})
+
+    passing.check(index)
+    with pytest.raises(RuleError):
+        failing.check(index)
+
+
+def test_rule_subject_tags_compiled():
+    rule = compile_rule({"name": "a", "subject": {"tags": ["a", "b"]}, "must": {}})
+
+    assert isinstance(rule.subject.tags, TagMatcher)
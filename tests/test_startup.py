@@ -0,0 +1,104 @@
+"""
+Tests related to the startup time of the cli
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from dagrules import cli
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Cumulative import time budget of the cli module, in microseconds (it takes about 10ms; it
+# took about 200ms when it imported the rest of dagrules and its dependencies up front)
+IMPORT_BUDGET_US = 100000
+
+# Modules that slow startup down, and are only needed on some code paths
+HEAVY_MODULES = ("numpy", "yaml", "colorama", "multiprocessing", "xml", "cProfile", "tracemalloc")
+
+
+def _import_times(code):
+    "Runs `code` in a new interpreter, returning the cumulative import time of each module"
+
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    ).stderr
+
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+def _heavy(times):
+    return sorted(module for module in times if module in HEAVY_MODULES)
+
+
+def test_cli_import_time():
+    times = _import_times("import dagrules.cli")
+    assert _heavy(times) == []
+    assert "dagrules.core" not in times
+    assert times["dagrules.cli"] < IMPORT_BUDGET_US
+
+
+def test_core_imports_lazily():
+    assert _heavy(_import_times("import dagrules.core")) == []
+
+
+def test_help_does_not_import_core():
+    times = _import_times(
+        "import sys; sys.argv = ['dagrules', '--help']\n"
+        "from dagrules.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass"
+    )
+    assert "dagrules.cli" in times
+    assert "dagrules.core" not in times
+
+
+def test_paths_resolved_when_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("DBT_ROOT", raising=False)
+    monkeypatch.delenv("DAGRULES_YAML", raising=False)
+    assert cli.dagrules_yaml() == os.path.join(tmp_path, "dagrules.yml")
+    assert cli.manifest_json() == os.path.join(tmp_path, "target", "manifest.json")
+
+    monkeypatch.setenv("DBT_ROOT", "project")
+    assert cli.dagrules_yaml() == os.path.join("project", "dagrules.yml")
+    assert cli.manifest_json() == os.path.join("project", "target", "manifest.json")
+
+    monkeypatch.setenv("DAGRULES_YAML", "rules.yml")
+    assert cli.dagrules_yaml() == "rules.yml"
+
+
+@pytest.mark.parametrize(
+    "flags", [["--format", "jsonl"], ["--output", "out.txt"], ["--state", "old.json"]]
+)
+def test_watch_rejects_unsupported_flags(monkeypatch, capsys, flags):
+    monkeypatch.setattr(sys, "argv", ["dagrules", "--watch", *flags])
+    with pytest.raises(SystemExit) as exc_info:
+        cli.main()
+    assert exc_info.value.code == 2
+    assert f"--watch cannot be combined with {flags[0]}" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("watch", [[], ["--watch"]])
+@pytest.mark.parametrize("value", ["0", "-1", "many"])
+def test_max_violations_must_be_positive(monkeypatch, capsys, watch, value):
+    monkeypatch.setattr(sys, "argv", ["dagrules", "--check", *watch, "--max-violations", value])
+    with pytest.raises(SystemExit) as exc_info:
+        cli.main()
+    assert exc_info.value.code == 2
+    assert "--max-violations: must be a positive integer" in capsys.readouterr().err
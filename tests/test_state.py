@@ -0,0 +1,166 @@
+"""
+Tests related to incremental checking against a previous manifest
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import copy
+
+import pytest
+
+from dagrules import parallel
+from dagrules.core import find_violations
+from dagrules.index import ManifestIndex
+from dagrules.planner import fused_violations
+from dagrules.results import ResultStore, _digest
+from dagrules.rules import compile_rules
+from dagrules.state import modified_positions
+from tests.conftest import model, rules_config
+
+
+@pytest.fixture
+def previous():
+    nodes = {
+        "model.a": model("a"),
+        "model.b": model("b", parents=["a"]),
+        "model.c": model("c", parents=["b"]),
+        "model.d": model("d"),
+    }
+    child_map = {"model.a": ["model.b"], "model.b": ["model.c"], "model.c": [], "model.d": []}
+    return {"nodes": nodes, "child_map": child_map}
+
+
+def _modified(manifest, previous):
+    index = ManifestIndex(manifest)
+    return [index.node_ids[pos] for pos in modified_positions(index, previous)]
+
+
+def test_unchanged(previous):
+    assert not _modified(copy.deepcopy(previous), previous)
+    assert not _modified(copy.deepcopy(previous), ManifestIndex(previous))
+
+
+def test_attribute_change_includes_neighbours(previous):
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.b"]["tags"] = ["x"]
+    assert _modified(manifest, previous) == ["model.a", "model.b", "model.c"]
+
+
+def test_irrelevant_attributes_ignored(previous):
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.b"]["raw_sql"] = "select 2"
+    assert not _modified(manifest, previous)
+
+
+def test_new_node_and_edges(previous):
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.e"] = model("e", parents=["d"])
+    manifest["child_map"]["model.d"] = ["model.e"]
+    manifest["child_map"]["model.e"] = []
+    assert _modified(manifest, previous) == ["model.d", "model.e"]
+
+
+def test_removed_node(previous):
+    manifest = copy.deepcopy(previous)
+    del manifest["nodes"]["model.c"]
+    del manifest["child_map"]["model.c"]
+    manifest["child_map"]["model.b"] = []
+    assert _modified(manifest, previous) == ["model.b"]
+
+
+def test_transitive_includes_ancestors_and_descendants(previous):
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.e"] = model("e", parents=["c"])
+    manifest["child_map"]["model.c"] = ["model.e"]
+    manifest["child_map"]["model.e"] = []
+    manifest["nodes"]["model.b"]["tags"] = ["x"]
+    index = ManifestIndex(manifest)
+
+    modified = modified_positions(index, previous, transitive=True)
+    assert [index.node_ids[pos] for pos in modified] == [
+        "model.a",
+        "model.b",
+        "model.c",
+        "model.e",
+    ]
+    # The transitive closure of the graph is not built
+    assert index._reachability is None  # pylint: disable=protected-access
+
+
+@pytest.fixture
+def config():
+    return rules_config({"name": "names", "must": {"match-name": "/^[a-z]$/"}})
+
+
+def test_modified_subjects_checked(previous, config, monkeypatch):
+    checked = []
+
+    def counting_fused_violations(index, rules, positions):
+        checked.extend(index.node_ids[pos] for pos in positions)
+        return fused_violations(index, rules, positions)
+
+    monkeypatch.setattr(parallel, "fused_violations", counting_fused_violations)
+    results = ResultStore()
+    assert not list(find_violations(config, previous, results=results))
+    results.save(compile_rules(config))
+
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.d"]["name"] = "bad"
+    checked.clear()
+    violations = find_violations(config, manifest, state=previous, results=results)
+    assert [v.node for v in violations] == ["model.d"]
+    assert checked == ["model.d"]
+
+
+def test_unmodified_violations_reused(previous, config):
+    previous["nodes"]["model.d"]["name"] = "bad"
+    results = ResultStore()
+    assert [v.node for v in find_violations(config, previous, results=results)] == ["model.d"]
+    results.save(compile_rules(config))
+
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.e"] = model("e")
+    violations = find_violations(config, manifest, state=previous, results=results)
+    assert [v.node for v in violations] == ["model.d"]
+
+
+def test_state_skips_hashing_unmodified_subjects(previous, config, monkeypatch):
+    digests = []
+
+    def counting_digest(data):
+        digests.append(data)
+        return _digest(data)
+
+    monkeypatch.setattr("dagrules.results._digest", counting_digest)
+    manifest = copy.deepcopy(previous)
+    manifest["nodes"]["model.d"]["name"] = "bad"
+
+    def digests_of_warm_run(state):
+        results = ResultStore()
+        list(find_violations(config, previous, results=results))
+        digests.clear()
+        violations = list(find_violations(config, manifest, state=state, results=results))
+        n_digests = len(digests)
+        assert [v.node for v in violations] == ["model.d"]
+        # The results (and input hashes) recorded for the unmodified subjects are still valid
+        assert list(find_violations(config, manifest, results=results)) == violations
+        return n_digests
+
+    # The inputs of every subject are hashed, or only those of the modified one
+    assert digests_of_warm_run(state=None) == 4
+    assert digests_of_warm_run(state=previous) == 1
+
+    # Re-running on the manifest the results were recorded for hashes no subject
+    results = ResultStore()
+    list(find_violations(config, previous, results=results))
+    digests.clear()
+    assert not list(find_violations(config, previous, state=previous, results=results))
+    assert not digests
+
+
+def test_without_results_checks_everything(previous, config):
+    previous["nodes"]["model.d"]["name"] = "bad"
+
+    assert [v.node for v in find_violations(config, previous, state=previous)] == ["model.d"]
+    violations = find_violations(config, previous, state=previous, results=ResultStore())
+    assert [v.node for v in violations] == ["model.d"]
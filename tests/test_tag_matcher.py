@@ -0,0 +1,91 @@
+"""
+Tests related to compiled tag matchers
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import pickle
+
+import pytest
+
+from dagrules.core import match_tags_any
+from dagrules.tags import TagMatcher, TagVocabulary
+
+SELECTORS = [
+    None,
+    "aa",
+    "xx",
+    ["bb", "xx"],
+    ["xx", "yy"],
+    {"include": "aa"},
+    {"include": "aa", "exclude": "bb"},
+    {"include": ["aa", "cc"], "exclude": ["xx"]},
+    {"exclude": "aa"},
+    ["xx", {"include": ["aa"], "exclude": "xx"}],
+    ["xx", {"include": ["aa", "yy"], "exclude": "xx"}],
+    [],
+]
+
+TAG_SETS = [[], ["aa"], ["aa", "bb", "cc"], ["bb", "cc"], ["aa", "cc"]]
+
+
+@pytest.fixture
+def vocabulary():
+    vocabulary = TagVocabulary()
+    for tags in TAG_SETS:
+        vocabulary.add(tags)
+    return vocabulary
+
+
+def test_vocabulary_assigns_one_bit_per_tag(vocabulary):
+    assert len(vocabulary) == 3
+    assert vocabulary.add(["aa", "cc"]) == vocabulary.mask(["cc", "aa"])
+    assert vocabulary.mask(["zz"]) == 0
+
+
+@pytest.mark.parametrize("selector", SELECTORS)
+def test_bitmask_matches_names(vocabulary, selector):
+    matcher = TagMatcher(selector)
+    has_tags = matcher.bind(vocabulary)
+
+    for tags in TAG_SETS:
+        assert has_tags(vocabulary.mask(tags)) == matcher.match(tags), tags
+
+
+@pytest.mark.parametrize("selector", SELECTORS)
+def test_match_tags_any_uses_compiled_matcher(selector):
+    for tags in TAG_SETS:
+        assert match_tags_any(tags, selector) == TagMatcher(selector).match(tags)
+
+
+def test_bind_is_reused_per_vocabulary(vocabulary):
+    matcher = TagMatcher(["aa", "bb"])
+
+    assert matcher.bind(vocabulary) is matcher.bind(vocabulary)
+    assert matcher.bind(vocabulary) is not matcher.bind(TagVocabulary())
+
+
+def test_compile_passes_through_matchers():
+    matcher = TagMatcher("aa")
+
+    assert TagMatcher.compile(matcher) is matcher
+
+
+def test_pickle(vocabulary):
+    matcher = TagMatcher({"include": "aa", "exclude": "bb"})
+    matcher.bind(vocabulary)
+
+    unpickled = pickle.loads(pickle.dumps(matcher))
+    assert unpickled.clauses == matcher.clauses
+    assert str(unpickled) == str(matcher)
+
+
+def test_key_is_canonical():
+    assert (
+        TagMatcher(["bb", {"include": ["aa", "cc"]}]).key
+        == TagMatcher([{"include": ["cc", "aa"], "exclude": []}, "bb", "bb"]).key
+    )
+    assert TagMatcher("aa").key != TagMatcher({"include": "aa", "exclude": "bb"}).key
+    assert TagMatcher(None).key is None
+    assert TagMatcher(["aa", {"exclude": "bb"}]).key is None
+    assert TagMatcher([]).key == ()
@@ -0,0 +1,191 @@
+"""
+Tests related to timing instrumentation
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import json
+
+import pytest
+
+from dagrules.core import find_violations
+from dagrules.index import ManifestIndex
+from dagrules.parallel import check_rules
+from dagrules.rules import compile_rules
+from dagrules.timings import NullTimings, Timing, Timings, format_bytes, visited
+from tests.conftest import NAMES_RULE, model, rules_config
+
+
+@pytest.fixture
+def manifest():
+    nodes = {
+        "model.m0": model("m0"),
+        "model.m1": model("m1", ["m0"]),
+        "model.m2": model("m2", ["m0", "m1"], tags=["b"]),
+        "model.bad": model("bad", ["m2"]),
+    }
+    return {"nodes": nodes}
+
+
+@pytest.fixture
+def config():
+    return rules_config(
+        NAMES_RULE,
+        {
+            "name": "parents",
+            "subject": {"tags": "a"},
+            "must": {"have-parent-relationship": {"required": False}},
+        },
+        {"name": "ancestors", "must": {"have-ancestor-relationship": {"required": False}}},
+    )
+
+
+def test_records_phases_and_rules(manifest, config):
+    timings = Timings()
+    violations = list(find_violations(config, manifest, timings=timings))
+    timings.close()
+
+    assert [violation.node for violation in violations] == ["model.bad"]
+    assert [timing.name for timing in timings.timings("phase")] == [
+        "validate",
+        "read manifest",
+        "select",
+        "evaluate",
+    ]
+    assert [timing.name for timing in timings.timings("rule")] == ["names", "parents", "ancestors"]
+    assert all(timing.seconds >= 0 for timing in timings.timings())
+    assert all(timing.peak_memory > 0 for timing in timings.timings())
+
+
+def test_counts_nodes_and_edges(manifest, config):
+    timings = Timings(trace_memory=False)
+    list(find_violations(config, manifest, timings=timings))
+
+    rules = {timing.name: timing for timing in timings.timings("rule")}
+    assert (rules["names"].nodes, rules["names"].edges) == (4, 0)
+    # m0, m1 and bad are tagged a, with 0 + 1 + 1 parents
+    assert (rules["parents"].nodes, rules["parents"].edges) == (3, 2)
+    # Ancestors are counted as the 0 + 1 + 2 + 1 parent edges walked to find them
+    assert (rules["ancestors"].nodes, rules["ancestors"].edges) == (4, 4)
+
+    evaluate = timings.records[("phase", "evaluate")]
+    assert (evaluate.nodes, evaluate.edges) == (11, 6)
+    assert evaluate.peak_memory is None
+
+
+def test_visited(manifest, config):
+    index = ManifestIndex(manifest)
+    rule = compile_rules(config)[1]
+
+    assert visited(index, rule, [1, 2, 3]) == (3, 4)
+    assert visited(index, rule, []) == (0, 0)
+
+
+def test_visited_builds_nothing(manifest):
+    index = ManifestIndex(manifest)
+    rules = compile_rules(
+        {
+            "version": "1",
+            "rules": [
+                {"name": "depth", "must": {"max-depth": 5}},
+                {"name": "descendants", "must": {"have-descendant-relationship": {}}},
+            ],
+        }
+    )
+
+    assert visited(index, rules[0], [1, 2, 3]) == (3, 4)
+    assert visited(index, rules[1], [0]) == (1, 0)
+    assert index._reachability is None  # pylint: disable=protected-access
+    assert index._metrics is None  # pylint: disable=protected-access
+
+
+def test_peak_memory_without_reset_peak(manifest, config):
+    class Python38Tracemalloc:  # pylint: disable=too-few-public-methods
+        "tracemalloc before Python 3.9, without reset_peak"
+
+        def __init__(self, tracemalloc):
+            self.is_tracing = tracemalloc.is_tracing
+            self.start = tracemalloc.start
+            self.stop = tracemalloc.stop
+            self.get_traced_memory = tracemalloc.get_traced_memory
+
+    timings = Timings()
+    timings._tracemalloc = Python38Tracemalloc(  # pylint: disable=protected-access
+        timings._tracemalloc  # pylint: disable=protected-access
+    )
+    list(find_violations(config, manifest, timings=timings))
+    timings.close()
+
+    assert all(timing.peak_memory > 0 for timing in timings.timings())
+
+
+def test_hooks_receive_each_timing(manifest, config):
+    received = []
+    timings = Timings(hooks=[received.append], trace_memory=False)
+    timings.add_hook(lambda timing: received.append(timing.name))
+    list(find_violations(config, manifest, timings=timings))
+
+    records = [item for item in received if isinstance(item, Timing)]
+    assert [item for item in received if isinstance(item, str)] == [
+        record.name for record in records
+    ]
+    # The evaluate phase is reported for each pass over the subjects (names and ancestors share
+    # theirs), and added up in the totals
+    assert len([record for record in records if record.name == "evaluate"]) == 2
+    assert timings.records[("phase", "evaluate")].seconds == pytest.approx(
+        sum(record.seconds for record in records if record.name == "evaluate")
+    )
+
+
+def test_parallel_timings(manifest, config):
+    index = ManifestIndex(manifest)
+    rules = compile_rules(config)
+    timings = Timings(trace_memory=False)
+    list(check_rules(index, rules, jobs=2, min_shard_size=1, timings=timings))
+
+    rule_timings = {timing.name: timing for timing in timings.timings("rule")}
+    assert list(rule_timings) == ["names", "parents", "ancestors"]
+    assert (rule_timings["parents"].nodes, rule_timings["parents"].edges) == (3, 2)
+    assert timings.records[("phase", "evaluate")].nodes == 11
+
+
+def test_table_and_json(manifest, config):
+    timings = Timings()
+    list(find_violations(config, manifest, timings=timings))
+    timings.close()
+
+    lines = timings.table().splitlines()
+    assert lines[0].split() == ["Phase", "/", "rule", "Seconds", "Nodes", "Edges", "Peak", "memory"]
+    assert lines[1].startswith("validate")
+    assert lines[-1].startswith("rule: ancestors")
+
+    data = json.loads(timings.json())
+    assert [phase["name"] for phase in data["phases"]] == [
+        "validate",
+        "read manifest",
+        "select",
+        "evaluate",
+    ]
+    assert data["rules"][2] == {
+        "name": "ancestors",
+        "seconds": data["rules"][2]["seconds"],
+        "nodes": 4,
+        "edges": 4,
+        "peak_memory": data["rules"][2]["peak_memory"],
+    }
+
+
+def test_null_timings(manifest, config):
+    timings = NullTimings()
+    with timings.phase("select"), timings.rule("names"):
+        pass
+
+    assert [violation.node for violation in find_violations(config, manifest)] == ["model.bad"]
+
+
+@pytest.mark.parametrize(
+    "size,expected",
+    [(512, "512 B"), (1536, "1.5 KB"), (5 * 1024 ** 2, "5.0 MB"), (3 * 1024 ** 3, "3.0 GB")],
+)
+def test_format_bytes(size, expected):
+    assert format_bytes(size) == expected
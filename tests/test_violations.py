@@ -0,0 +1,119 @@
+"""
+Tests related to collecting rule violations
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import pytest
+
+from dagrules.core import RuleError, check, find_violations, rule_match_name, rule_subjects
+from dagrules.index import ManifestIndex
+from dagrules.parallel import check_rules
+from dagrules.rules import Violation, compile_rule
+from tests.conftest import model_manifest, rules_config
+
+
+@pytest.fixture
+def manifest():
+    return model_manifest(6, names={1: "bad1", 4: "bad4"}, tags={2: ["b"]})
+
+
+@pytest.fixture
+def config():
+    return rules_config(
+        {"name": "names", "must": {"match-name": "/m[0-9]/", "have-tags-any": "a"}},
+        {"name": "ok", "must": {"have-tags-any": ["a", "b"]}},
+        {"name": "more names", "must": {"match-name": "/m[0-3]/"}},
+    )
+
+
+def test_collects_all_violations(manifest, config):
+    violations = list(find_violations(config, manifest))
+
+    assert [(v.rule, v.node, v.must) for v in violations] == [
+        ("names", "model.m1", "match-name"),
+        ("names", "model.m4", "match-name"),
+        ("names", "model.m2", "have-tags-any"),
+        ("more names", "model.m1", "match-name"),
+        ("more names", "model.m4", "match-name"),
+        ("more names", "model.m5", "match-name"),
+    ]
+    assert violations[0].detail == 'For node "model.m1", "bad1" does not match pattern /m[0-9]/'
+
+
+def test_max_violations(manifest, config):
+    violations = list(find_violations(config, manifest, max_violations=4))
+    assert [(v.rule, v.node) for v in violations] == [
+        ("names", "model.m1"),
+        ("names", "model.m4"),
+        ("names", "model.m2"),
+        ("more names", "model.m1"),
+    ]
+
+
+def test_fail_fast(manifest, config):
+    assert list(find_violations(config, manifest, fail_fast=True)) == [
+        Violation(
+            "names",
+            "model.m1",
+            "match-name",
+            'For node "model.m1", "bad1" does not match pattern /m[0-9]/',
+        )
+    ]
+
+
+def test_limit_stops_checking_rules(manifest, config):
+    rules = [compile_rule(rule) for rule in config["rules"]]
+    checked = [rule.name for rule, _ in check_rules(ManifestIndex(manifest), rules, jobs=1)]
+    assert checked == ["names", "ok", "more names"]
+
+    checked = [
+        rule.name
+        for rule, _ in check_rules(ManifestIndex(manifest), rules, jobs=1, max_violations=3)
+    ]
+    assert checked == ["names"]
+
+
+@pytest.mark.parametrize("max_violations", [None, 1, 2, 4, 5])
+def test_sharded_violations_match_serial(manifest, config, max_violations):
+    index = ManifestIndex(manifest)
+    rules = [compile_rule(rule) for rule in config["rules"]]
+
+    serial = list(check_rules(index, rules, jobs=1, max_violations=max_violations))
+    sharded = list(
+        check_rules(index, rules, jobs=3, min_shard_size=1, max_violations=max_violations)
+    )
+    assert sharded == serial
+
+
+def test_check_reports_every_violation(manifest, config, capsys):
+    with pytest.raises(RuleError):
+        check(config, manifest)
+
+    out = capsys.readouterr().out
+    assert '"model.m1"' in out
+    assert '"model.m4"' in out
+    assert '"model.m5"' in out
+    assert "Stopped checking" not in out
+
+
+def test_check_fail_fast(manifest, config, capsys):
+    with pytest.raises(RuleError):
+        check(config, manifest, fail_fast=True)
+
+    out = capsys.readouterr().out
+    assert '"model.m1"' in out
+    assert '"model.m4"' not in out
+    assert "Checking rule ok" not in out
+    assert "Stopped checking after 1 violation(s)" in out
+
+
+def test_invalid_max_violations(manifest, config):
+    with pytest.raises(ValueError):
+        list(find_violations(config, manifest, max_violations=0))
+
+
+def test_legacy_checks_raise_first_violation(manifest):
+    subjects = rule_subjects(manifest)
+    with pytest.raises(RuleError, match="model.m1"):
+        rule_match_name(subjects, "/m[0-9]/")
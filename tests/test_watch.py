@@ -0,0 +1,109 @@
+"""
+Tests related to watch mode
+"""
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+import json
+import os
+
+import pytest
+import yaml
+
+from dagrules.core import RuleError
+from dagrules.watch import Watcher, file_stamp
+
+
+def _write(path, text):
+    # Bump the mtime explicitly, as writes in quick succession may share a timestamp
+    stamp = file_stamp(path)
+    path.write_text(text, encoding="utf-8")
+    if stamp is not None:
+        os.utime(path, ns=(stamp[1] + 10 ** 9, stamp[1] + 10 ** 9))
+
+
+def _manifest(name):
+    return json.dumps(
+        {"nodes": {"model.m": {"resource_type": "model", "name": name, "tags": ["a"]}}}
+    )
+
+
+def _config(pattern):
+    return yaml.safe_dump(
+        {"version": 1, "rules": [{"name": "names", "must": {"match-name": pattern}}]}
+    )
+
+
+@pytest.fixture
+def files(tmp_path):
+    config_path = tmp_path / "dagrules.yml"
+    manifest_path = tmp_path / "target" / "manifest.json"
+    manifest_path.parent.mkdir()
+    _write(config_path, _config("/m/"))
+    _write(manifest_path, _manifest("m"))
+    return config_path, manifest_path
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_reloads_changed_files(files, use_cache):
+    config_path, manifest_path = files
+    watcher = Watcher(str(config_path), str(manifest_path), use_cache=use_cache)
+
+    assert watcher.poll()
+    watcher.check()
+    rules, index = watcher.rules, watcher.index
+    assert not watcher.poll()
+
+    _write(manifest_path, _manifest("x"))
+    assert watcher.poll()
+    assert watcher.rules is rules
+    assert watcher.index is not index
+    with pytest.raises(RuleError):
+        watcher.check()
+
+    _write(config_path, _config("/[mx]/"))
+    assert watcher.poll()
+    assert watcher.rules is not rules
+    watcher.check()
+
+
+def test_reports_errors_and_keeps_watching(files, capsys):
+    config_path, manifest_path = files
+    watcher = Watcher(str(config_path), str(manifest_path), use_cache=False)
+
+    _write(config_path, "version: 1\nrules:\n  - must: {}\n")
+    watcher._run_once()  # pylint: disable=protected-access
+    assert "No name defined" in capsys.readouterr().out
+
+    _write(config_path, _config("/x/"))
+    watcher._run_once()  # pylint: disable=protected-access
+    out = capsys.readouterr().out
+    assert "FAILED" in out
+    assert "Checked in" in out
+
+    watcher._run_once()  # pylint: disable=protected-access
+    assert not capsys.readouterr().out
+
+
+@pytest.mark.parametrize("config", [_config("/m(/"), "- version\n- rules\n"])
+def test_invalid_config_then_fixed(files, capsys, config):
+    config_path, manifest_path = files
+    watcher = Watcher(str(config_path), str(manifest_path), use_cache=False)
+    watcher._run_once()  # pylint: disable=protected-access
+    assert "Checked in" in capsys.readouterr().out
+
+    _write(config_path, config)
+    watcher._run_once()  # pylint: disable=protected-access
+    out = capsys.readouterr().out
+    assert "must be a mapping" in out or "Invalid parameters" in out
+    assert "Checked in" not in out
+
+    _write(config_path, _config("/m/"))
+    watcher._run_once()  # pylint: disable=protected-access
+    out = capsys.readouterr().out
+    assert "PASSED" in out
+    assert "Checked in" in out
+
+
+def test_file_stamp(tmp_path):
+    assert file_stamp(str(tmp_path / "missing")) is None